@@ -10,6 +10,13 @@
 /*       by Django migrations (see PostOffice_App/models.py).   */
 /*       Run 'python manage.py migrate' BEFORE this DDL.        */
 /*==============================================================*/
+DROP TABLE IF EXISTS MV_REFRESH_STATS CASCADE;
+DROP TABLE IF EXISTS REVENUE_DAILY_ROLLUP CASCADE;
+DROP TABLE IF EXISTS DELIVERY_DAILY_ROLLUP CASCADE;
+DROP TABLE IF EXISTS DELIVERY_PARTY_DAILY CASCADE;
+DROP TABLE IF EXISTS DELIVERY_PARTY_STATS CASCADE;
+DROP TABLE IF EXISTS DASHBOARD_COUNTER CASCADE;
+DROP TABLE IF EXISTS BACKGROUND_JOB CASCADE;
 DROP TABLE IF EXISTS DELIVERY_TRACKING CASCADE;
 DROP TABLE IF EXISTS DELIVERY CASCADE;
 DROP TABLE IF EXISTS INVOICE_ITEM CASCADE;
@@ -260,6 +267,116 @@ create index LOGS_FK on DELIVERY_TRACKING (DEL_ID);
 create index REGISTERS_LOGS_FK on DELIVERY_TRACKING (STAFF_ID);
 create index RECORDS_LOGS_FK on DELIVERY_TRACKING (WAR_ID);
 
+/*==============================================================*/
+/* Table: BACKGROUND_JOB                                        */
+/* Queue for long imports/exports, consumed by                  */
+/* 'python manage.py run_jobs' (see jobs_objects.sql)           */
+/*==============================================================*/
+create table BACKGROUND_JOB (
+   ID                   SERIAL               not null,
+   KIND                 VARCHAR(50)          not null, -- 'export' || 'import' || 'invoices_pdf'
+   PAYLOAD              JSONB                not null,
+   STATUS               VARCHAR(20)          not null, -- 'queued' || 'running' || 'done' || 'failed'
+   PROGRESS_DONE        INT4                 null,
+   PROGRESS_TOTAL       INT4                 null,
+   RESULT               JSONB                null,
+   ERROR_MESSAGE        TEXT                 null,
+   ATTEMPTS             INT4                 not null default 0,
+   REQUESTED_BY         INT4                 null,
+   CREATED_AT           TIMESTAMPTZ          not null,
+   STARTED_AT           TIMESTAMPTZ          null,
+   FINISHED_AT          TIMESTAMPTZ          null,
+   UPDATED_AT           TIMESTAMPTZ          not null,
+   constraint PK_BACKGROUND_JOB primary key (ID),
+   constraint CHK_JOB_STATUS CHECK (STATUS IN ('queued', 'running', 'done', 'failed'))
+);
+
+-- Partial index: the worker only ever scans queued jobs, oldest first
+create index QUEUED_JOBS_IDX on BACKGROUND_JOB (CREATED_AT) where STATUS = 'queued';
+create index REQUESTED_BY_FK on BACKGROUND_JOB (REQUESTED_BY);
+
+/*==============================================================*/
+/* Table: DASHBOARD_COUNTER                                     */
+/* Live admin dashboard counts, sharded to spread concurrent    */
+/* updates; kept by the trg_dashboard_* statement triggers      */
+/* (see rodrigo_objects.sql). Value = SUM over a stat's shards. */
+/*==============================================================*/
+create table DASHBOARD_COUNTER (
+   STAT_NAME            VARCHAR(50)          not null,
+   SHARD                INT2                 not null, -- pg_backend_pid() % 16
+   VALUE                INT8                 not null default 0,
+   constraint PK_DASHBOARD_COUNTER primary key (STAT_NAME, SHARD)
+);
+
+/*==============================================================*/
+/* Table: DELIVERY_PARTY_STATS                                  */
+/* Deliveries per driver / client by status and priority, kept  */
+/* by trg_dashboard_delivery (see rodrigo_objects.sql)          */
+/*==============================================================*/
+create table DELIVERY_PARTY_STATS (
+   PARTY_ROLE           VARCHAR(10)          not null, -- 'driver' || 'client'
+   PARTY_ID             INT4                 not null,
+   STATUS               VARCHAR(20)          not null,
+   PRIORITY             VARCHAR(20)          not null,
+   DELIVERIES           INT8                 not null default 0,
+   constraint PK_DELIVERY_PARTY_STATS primary key (PARTY_ROLE, PARTY_ID, STATUS, PRIORITY)
+);
+
+/*==============================================================*/
+/* Table: DELIVERY_PARTY_DAILY                                  */
+/* Deliveries per driver / client, day (fn_delivery_day) and    */
+/* status, kept by trg_dashboard_delivery                       */
+/*==============================================================*/
+create table DELIVERY_PARTY_DAILY (
+   PARTY_ROLE           VARCHAR(10)          not null, -- 'driver' || 'client'
+   PARTY_ID             INT4                 not null,
+   DELIVERY_DAY         DATE                 not null,
+   STATUS               VARCHAR(20)          not null,
+   DELIVERIES           INT8                 not null default 0,
+   constraint PK_DELIVERY_PARTY_DAILY primary key (PARTY_ROLE, PARTY_ID, DELIVERY_DAY, STATUS)
+);
+
+/*==============================================================*/
+/* Table: DELIVERY_DAILY_ROLLUP                                 */
+/* Delivery tracking events per day, warehouse and status, kept */
+/* by trg_rollup_delivery_tracking (see rodrigo_objects.sql)    */
+/*==============================================================*/
+create table DELIVERY_DAILY_ROLLUP (
+   DAY                  DATE                 not null,
+   WAR_ID               INT4                 not null, -- 0 = no warehouse
+   STATUS               VARCHAR(20)          not null,
+   DELIVERIES           INT8                 not null default 0,
+   constraint PK_DELIVERY_DAILY_ROLLUP primary key (DAY, WAR_ID, STATUS)
+);
+
+/*==============================================================*/
+/* Table: REVENUE_DAILY_ROLLUP                                  */
+/* Invoices and revenue per creation day and warehouse, kept by */
+/* trg_rollup_invoice (see rodrigo_objects.sql)                 */
+/*==============================================================*/
+create table REVENUE_DAILY_ROLLUP (
+   DAY                  DATE                 not null,
+   WAR_ID               INT4                 not null, -- 0 = no warehouse
+   INVOICES             INT8                 not null default 0,
+   REVENUE              DECIMAL(14,2)        not null default 0.00,
+   constraint PK_REVENUE_DAILY_ROLLUP primary key (DAY, WAR_ID)
+);
+
+/*==============================================================*/
+/* Table: MV_REFRESH_STATS                                      */
+/* Refresh count and durations per materialized view, kept by   */
+/* sp_refresh_materialized_view (see rodrigo_objects.sql)       */
+/*==============================================================*/
+create table MV_REFRESH_STATS (
+   MV_NAME              VARCHAR(63)          not null,
+   REFRESHES            INT8                 not null default 0,
+   TOTAL_SECONDS        FLOAT8               not null default 0,
+   LAST_SECONDS         FLOAT8               not null default 0,
+   MAX_SECONDS          FLOAT8               not null default 0,
+   LAST_REFRESHED_AT    TIMESTAMPTZ          null,
+   constraint PK_MV_REFRESH_STATS primary key (MV_NAME)
+);
+
 
 /*==============================================================*/
 /* Foreign Key Constraints (R1-R20)                             */
@@ -349,6 +466,105 @@ alter table DELIVERY_TRACKING add constraint FK_TRACKING_REGISTERS_LOGS
 alter table DELIVERY_TRACKING add constraint FK_TRACKING_RECORDS_LOGS
    foreign key (WAR_ID) references WAREHOUSE (ID);
 
+-- User -> Background_Job (Requests_Job)
+alter table BACKGROUND_JOB add constraint FK_JOB_REQUESTED_BY
+   foreign key (REQUESTED_BY) references "USER" (ID);
+
+
+/*==============================================================*/
+/* Autocomplete (prefix search) indexes                         */
+/* Used by the fn_autocomplete_* functions behind the form      */
+/* pickers: text_pattern_ops lets a btree serve LIKE 'abc%'     */
+/* whatever the database collation.                             */
+/*==============================================================*/
+create index if not exists USER_USERNAME_PREFIX_IDX on "USER" (lower(USERNAME) text_pattern_ops);
+create index if not exists USER_FULL_NAME_PREFIX_IDX on "USER" (lower(FIRST_NAME || ' ' || LAST_NAME) text_pattern_ops);
+create index VEHICLE_PLATE_PREFIX_IDX on VEHICLE (upper(PLATE_NUMBER) text_pattern_ops);
+create index INVOICE_NAME_PREFIX_IDX on INVOICE (lower(NAME) text_pattern_ops);
+create index ROUTE_DESCRIPTION_PREFIX_IDX on ROUTE (lower(DESCRIPTION) text_pattern_ops);
+
+
+/*==============================================================*/
+/* Search (full-text + trigram)                                 */
+/* Generated columns kept by PostgreSQL itself on every write:  */
+/*   SEARCH_VECTOR  tsvector of the searchable fields, weighted */
+/*                  (names A, e-mail / phone B, addresses C,    */
+/*                  description D), for word and prefix search  */
+/*   SEARCH_TEXT    the same fields as one lowercase string,    */
+/*                  for partial (LIKE '%..%') and fuzzy (<%)    */
+/*                  matches through pg_trgm (GIN: fast lookups, */
+/*                  every matching row; ranked by the function) */
+/* 'simple' configuration: names and addresses are not stemmed. */
+/* Used by fn_search_deliveries / _clients / _invoices.         */
+/*==============================================================*/
+create extension if not exists pg_trgm;
+
+alter table DELIVERY
+   add column SEARCH_VECTOR tsvector generated always as (
+         setweight(to_tsvector('simple', coalesce(RECIPIENT_NAME, '') || ' ' || coalesce(SENDER_NAME, '')), 'A')
+      || setweight(to_tsvector('simple', coalesce(RECIPIENT_EMAIL, '') || ' ' || coalesce(SENDER_EMAIL, '') || ' '
+                                         || coalesce(RECIPIENT_PHONE, '') || ' ' || coalesce(SENDER_PHONE, '')), 'B')
+      || setweight(to_tsvector('simple', coalesce(RECIPIENT_ADDRESS, '') || ' ' || coalesce(SENDER_ADDRESS, '')), 'C')
+      || setweight(to_tsvector('simple', coalesce(DESCRIPTION, '')), 'D')
+   ) stored,
+   add column SEARCH_TEXT TEXT generated always as (
+      lower(coalesce(RECIPIENT_NAME, '') || ' ' || coalesce(RECIPIENT_EMAIL, '') || ' ' || coalesce(RECIPIENT_PHONE, '')
+            || ' ' || coalesce(RECIPIENT_ADDRESS, '') || ' ' || coalesce(SENDER_NAME, '') || ' ' || coalesce(SENDER_EMAIL, '')
+            || ' ' || coalesce(SENDER_PHONE, '') || ' ' || coalesce(SENDER_ADDRESS, '') || ' ' || coalesce(DESCRIPTION, ''))
+   ) stored;
+
+create index DELIVERY_SEARCH_VECTOR_IDX on DELIVERY using gin (SEARCH_VECTOR);
+create index DELIVERY_SEARCH_TEXT_TRGM_IDX on DELIVERY using gin (SEARCH_TEXT gin_trgm_ops);
+
+alter table "USER"
+   add column if not exists SEARCH_VECTOR tsvector generated always as (
+         setweight(to_tsvector('simple', coalesce(FIRST_NAME, '') || ' ' || coalesce(LAST_NAME, '') || ' ' || coalesce(USERNAME, '')), 'A')
+      || setweight(to_tsvector('simple', coalesce(EMAIL, '') || ' ' || coalesce(CONTACT, '')), 'B')
+   ) stored,
+   add column if not exists SEARCH_TEXT TEXT generated always as (
+      lower(coalesce(FIRST_NAME, '') || ' ' || coalesce(LAST_NAME, '') || ' ' || coalesce(USERNAME, '')
+            || ' ' || coalesce(EMAIL, '') || ' ' || coalesce(CONTACT, ''))
+   ) stored;
+
+create index if not exists USER_SEARCH_VECTOR_IDX on "USER" using gin (SEARCH_VECTOR);
+create index if not exists USER_SEARCH_TEXT_TRGM_IDX on "USER" using gin (SEARCH_TEXT gin_trgm_ops);
+
+alter table INVOICE
+   add column SEARCH_VECTOR tsvector generated always as (
+         setweight(to_tsvector('simple', coalesce(NAME, '')), 'A')
+      || setweight(to_tsvector('simple', coalesce(CONTACT, '')), 'B')
+   ) stored,
+   add column SEARCH_TEXT TEXT generated always as (
+      lower(coalesce(NAME, '') || ' ' || coalesce(CONTACT, ''))
+   ) stored;
+
+create index INVOICE_SEARCH_VECTOR_IDX on INVOICE using gin (SEARCH_VECTOR);
+create index INVOICE_SEARCH_TEXT_TRGM_IDX on INVOICE using gin (SEARCH_TEXT gin_trgm_ops);
+
+
+/*==============================================================*/
+/* List pages (filtered, keyset-paginated)                      */
+/* fn_list_deliveries / fn_list_routes / fn_list_invoices read  */
+/* a page as one index range: equality filters first, then the  */
+/* sort key and ID (the page cursor). "pending deliveries at    */
+/* warehouse 3 this week" only reads the rows it returns.       */
+/* Routes sort on COALESCE(DELIVERY_DATE, '-infinity'): routes  */
+/* without a date come last, as in v_routes_full.               */
+/*==============================================================*/
+create index DELIVERY_LIST_IDX on DELIVERY (CREATED_AT, ID);
+create index DELIVERY_LIST_STATUS_IDX on DELIVERY (STATUS, CREATED_AT, ID);
+create index DELIVERY_LIST_WAR_STATUS_IDX on DELIVERY (WAR_ID, STATUS, CREATED_AT, ID);
+create index DELIVERY_LIST_DRIVER_IDX on DELIVERY (DRIVER_ID, CREATED_AT, ID);
+create index DELIVERY_LIST_CLIENT_IDX on DELIVERY (CLIENT_ID, CREATED_AT, ID);
+
+create index ROUTE_LIST_IDX on ROUTE ((coalesce(DELIVERY_DATE, '-infinity'::DATE)), ID);
+create index ROUTE_LIST_WAR_IDX on ROUTE (WAR_ID, (coalesce(DELIVERY_DATE, '-infinity'::DATE)), ID);
+create index ROUTE_LIST_DRIVER_IDX on ROUTE (DRIVER_ID, (coalesce(DELIVERY_DATE, '-infinity'::DATE)), ID);
+
+create index INVOICE_LIST_IDX on INVOICE (CREATED_AT, ID);
+create index INVOICE_LIST_WAR_IDX on INVOICE (WAR_ID, CREATED_AT, ID);
+create index INVOICE_LIST_CLIENT_IDX on INVOICE (CLIENT_ID, CREATED_AT, ID);
+
 
 -- FOR MongoDB:
 -- /*==============================================================*/
@@ -0,0 +1,69 @@
+from django.conf import settings
+from django.db import connections
+
+from . import db, routers
+
+# ==========================================================
+#  AUTOCOMPLETE: FORM PICKERS (fn_autocomplete_*)
+# ==========================================================
+# The create / edit forms no longer render every client, driver, route,
+# invoice or vehicle into a <select>: their pickers (forms.AutocompleteField)
+# fetch at most AUTOCOMPLETE_LIMIT options per keystroke from
+# /autocomplete/<source>/, and the submitted ids of a whole form are checked
+# with a single lookup() query.
+
+# source -> function (diego_objects.sql / rodrigo_objects.sql)
+SOURCES = {
+    "clients": "fn_autocomplete_clients",
+    "potential_employees": "fn_autocomplete_potential_employees",
+    "drivers": "fn_autocomplete_drivers",
+    "vehicles": "fn_autocomplete_vehicles",
+    "routes": "fn_autocomplete_routes",
+    "invoices": "fn_autocomplete_invoices",
+}
+
+
+def search(source, term):
+    """
+    Options of a source matching the beginning of `term`.
+
+    Returns:
+        list: [{"id": ..., "label": ...}], empty for terms shorter than AUTOCOMPLETE_MIN_CHARS
+    """
+    term = term.strip()
+    if len(term) < settings.AUTOCOMPLETE_MIN_CHARS and not term.isdigit():
+        return []
+    rows = db.fetch_all(f"autocomplete_{source}", [term, settings.AUTOCOMPLETE_LIMIT])
+    return [{"id": row.id, "label": row.label} for row in rows]
+
+
+def lookup(ids_by_source, primary=False):
+    """
+    Looks up ids of several sources in one query.
+
+    Args:
+        ids_by_source (dict): {"clients": {4, 8}, "routes": {15}}
+        primary (bool): Read from the primary (a form validated right before
+            it writes) instead of the replica. Not a write: the user's later
+            reads are not pinned to the primary.
+
+    Returns:
+        dict: {source: {id: label}} for the ids that exist and may be picked
+    """
+    found = {source: {} for source in ids_by_source}
+    sources = [source for source, ids in ids_by_source.items() if ids]
+    if not sources:
+        return found
+
+    sql = " UNION ALL ".join(
+        f"SELECT %s, id, label FROM {SOURCES[source]}(NULL, NULL, %s::INT[])" for source in sources
+    )
+    params = []
+    for source in sources:
+        params += [source, sorted(ids_by_source[source])]
+    conn = connections[routers.PRIMARY] if primary else db.read_connection()
+    with conn.cursor() as cursor:
+        cursor.execute(sql, params)
+        for source, id_, label in cursor.fetchall():
+            found[source][id_] = label
+    return found
@@ -0,0 +1,58 @@
+import json
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.dateparse import parse_datetime
+
+from . import db
+
+# ==========================================================
+#  DASHBOARD STATS (fn_get_dashboard_stats_json)
+# ==========================================================
+# Admin counts are live: trg_dashboard_* triggers keep them in the sharded
+# dashboard_counter table, so reading them never scans the base tables.
+#
+# Results are cached for DASHBOARD_CACHE_TTL seconds. Admin, manager and
+# staff stats are the same for everyone in the role, so they share one
+# entry per role; driver and client stats are cached per user.
+
+SHARED_ROLES = ("admin", "manager", "staff")
+
+
+def _cache_key(user):
+    if user.role in SHARED_ROLES:
+        return f"dashboard_stats:{user.role}"
+    return f"dashboard_stats:{user.role}:{user.id}"
+
+
+def _fetch_stats(user):
+    data = db.fetch_value("dashboard_stats_json", [user.id, user.role])
+    # psycopg2 already decodes JSONB; keep str support for other drivers
+    return json.loads(data) if isinstance(data, str) else data
+
+
+def get_stats(user):
+    """
+    Returns the role-specific dashboard stats of a user.
+    Costs one cache get while the cached entry is fresh.
+
+    Returns:
+        tuple: ({stat_name: stat_value}, as_of datetime)
+    """
+    key = _cache_key(user)
+    data = cache.get(key)
+    if data is None:
+        data = _fetch_stats(user)
+        cache.set(key, data, settings.DASHBOARD_CACHE_TTL)
+    return data["stats"], parse_datetime(data["as_of"])
+
+
+def get_daily_series(days=90, warehouse_id=None):
+    """
+    Returns the daily delivery / revenue series of fn_get_daily_series,
+    one dict per day, oldest first, with every day present.
+    """
+    with db.read_connection().cursor() as cursor:
+        cursor.execute("SELECT * FROM fn_get_daily_series(%s, %s)", [days, warehouse_id])
+        columns = [col[0] for col in cursor.description]
+        return [dict(zip(columns, row)) for row in cursor.fetchall()]
@@ -0,0 +1,355 @@
+import csv
+import io
+import re
+import weakref
+from collections import namedtuple
+from functools import lru_cache
+
+from django.conf import settings
+from django.db import connections, reset_queries
+
+from . import routers
+
+# ==========================================================
+#  DATA ACCESS: SERVER-SIDE PREPARED STATEMENTS
+# ==========================================================
+# The hot read queries are registered below and run with PREPARE/EXECUTE,
+# so PostgreSQL parses and plans each of them once per connection instead
+# of on every call. Combined with persistent or pooled connections
+# (DB_CONN_MODE, settings.py) the plan survives across requests.
+#
+# Statements are prepared lazily, the first time they run on a connection,
+# and the set of prepared names is tracked per raw DB-API connection (not
+# per Django wrapper: in pool mode one raw connection serves many
+# wrappers), so a reconnect simply prepares them again.
+#
+# CALL sp_* cannot be PREPAREd. That costs little: the statements inside a
+# PL/pgSQL procedure are already planned once per connection and cached.
+# Use call() for procedures.
+#
+# Reads run on read_connection() (the replica, when configured) and
+# call() runs on the primary, pinning the rest of the request to it
+# (see routers.py).
+
+# name -> (SQL with $n placeholders, parameter types)
+STATEMENTS = {
+    "dashboard_stats": (
+        "SELECT * FROM fn_get_dashboard_stats($1, $2)",
+        ("INT", "VARCHAR"),
+    ),
+    "dashboard_stats_json": (
+        "SELECT fn_get_dashboard_stats_json($1, $2)",
+        ("INT", "VARCHAR"),
+    ),
+    "delivery_tracking": (
+        "SELECT * FROM fn_get_delivery_tracking($1)",
+        ("VARCHAR",),
+    ),
+    "deliveries_page": (
+        "SELECT * FROM v_deliveries_full LIMIT $1 OFFSET $2",
+        ("INT", "INT"),
+    ),
+    "routes_page": (
+        "SELECT * FROM v_routes_full LIMIT $1 OFFSET $2",
+        ("INT", "INT"),
+    ),
+    "vehicles_page": (
+        "SELECT * FROM v_vehicles_full LIMIT $1 OFFSET $2",
+        ("INT", "INT"),
+    ),
+    "warehouses_page": (
+        "SELECT * FROM v_warehouses_full LIMIT $1 OFFSET $2",
+        ("INT", "INT"),
+    ),
+    "employees_page": (
+        "SELECT * FROM v_employees_full LIMIT $1 OFFSET $2",
+        ("INT", "INT"),
+    ),
+    # Filtered list pages (lists.py): filters, sort, cursor, page size
+    "deliveries_list": (
+        "SELECT * FROM fn_list_deliveries($1, $2, $3, $4, $5, $6, $7, $8, $9)",
+        ("VARCHAR", "INT", "INT", "INT", "DATE", "DATE", "TEXT", "INT", "INT"),
+    ),
+    "routes_list": (
+        "SELECT * FROM fn_list_routes($1, $2, $3, $4, $5, $6, $7, $8)",
+        ("VARCHAR", "INT", "INT", "DATE", "DATE", "TEXT", "INT", "INT"),
+    ),
+    "invoices_list": (
+        "SELECT * FROM fn_list_invoices($1, $2, $3, $4, $5, $6, $7, $8)",
+        ("VARCHAR", "INT", "INT", "DATE", "DATE", "TEXT", "INT", "INT"),
+    ),
+    # Form pickers (autocomplete.py): one statement per source
+    "autocomplete_clients": (
+        "SELECT * FROM fn_autocomplete_clients($1, $2, NULL)",
+        ("TEXT", "INT"),
+    ),
+    "autocomplete_potential_employees": (
+        "SELECT * FROM fn_autocomplete_potential_employees($1, $2, NULL)",
+        ("TEXT", "INT"),
+    ),
+    "autocomplete_drivers": (
+        "SELECT * FROM fn_autocomplete_drivers($1, $2, NULL)",
+        ("TEXT", "INT"),
+    ),
+    "autocomplete_vehicles": (
+        "SELECT * FROM fn_autocomplete_vehicles($1, $2, NULL)",
+        ("TEXT", "INT"),
+    ),
+    "autocomplete_routes": (
+        "SELECT * FROM fn_autocomplete_routes($1, $2, NULL)",
+        ("TEXT", "INT"),
+    ),
+    "autocomplete_invoices": (
+        "SELECT * FROM fn_autocomplete_invoices($1, $2, NULL)",
+        ("TEXT", "INT"),
+    ),
+    # Ranked search (search.py): term, page size, offset
+    "search_deliveries": (
+        "SELECT * FROM fn_search_deliveries($1, $2, $3)",
+        ("TEXT", "INT", "INT"),
+    ),
+    "search_clients": (
+        "SELECT * FROM fn_search_clients($1, $2, $3)",
+        ("TEXT", "INT", "INT"),
+    ),
+    "search_invoices": (
+        "SELECT * FROM fn_search_invoices($1, $2, $3)",
+        ("TEXT", "INT", "INT"),
+    ),
+}
+
+
+def read_connection():
+    """Connection for read-only queries: the replica unless this request wrote."""
+    return connections[routers.read_alias()]
+
+
+def write_connection():
+    """Connection for writes: the primary, pinned for the rest of the request."""
+    routers.mark_write()
+    return connections[routers.PRIMARY]
+
+
+# raw DB-API connection -> names prepared on it; dropped with the connection
+_PREPARED = weakref.WeakKeyDictionary()
+
+
+def _prepared_names(conn):
+    """Names already prepared on the current raw connection of `conn`."""
+    return _PREPARED.setdefault(conn.connection, set())
+
+
+def execute(cursor, name, params=()):
+    """
+    Runs a registered statement on `cursor`, preparing it first if needed.
+    """
+    sql, types = STATEMENTS[name]
+    if len(params) != len(types):
+        raise ValueError(f"{name} expects {len(types)} parameters, got {len(params)}")
+
+    # cursor.db.connection is only set once the cursor has connected
+    prepared = _prepared_names(cursor.db)
+    statement = f"po_{name}"
+    if statement not in prepared:
+        cursor.execute(f"PREPARE {statement} ({', '.join(types)}) AS {sql}")
+        prepared.add(statement)
+
+    if params:
+        cursor.execute(f"EXECUTE {statement} ({', '.join(['%s'] * len(params))})", list(params))
+    else:
+        cursor.execute(f"EXECUTE {statement}")
+
+
+def fetch_all(name, params=()):
+    """
+    Returns every row of a registered statement as a list of records.
+    """
+    with read_connection().cursor() as cursor:
+        execute(cursor, name, params)
+        return fetch_records(cursor)
+
+
+def fetch_value(name, params=()):
+    """
+    Returns the first column of the first row of a registered statement.
+    """
+    with read_connection().cursor() as cursor:
+        execute(cursor, name, params)
+        row = cursor.fetchone()
+    return row[0] if row else None
+
+
+def call(procedure, params=()):
+    """
+    CALLs a stored procedure and returns its INOUT values (if any).
+    Example: call("sp_update_delivery_status", [delivery_id, "in_transit", staff_id, None, None])
+    """
+    placeholders = ", ".join(["%s"] * len(params))
+    with write_connection().cursor() as cursor:
+        cursor.execute(f"CALL {procedure}({placeholders})", list(params))
+        return cursor.fetchone() if cursor.description else None
+
+
+def adhoc_sql(name):
+    """
+    The registered statement as a plain parameterized query (for benchmarks).
+    """
+    sql, types = STATEMENTS[name]
+    for i in range(len(types), 0, -1):
+        sql = sql.replace(f"${i}", "%s")
+    return sql
+
+
+def expand(name, params=()):
+    """
+    The registered statement for a connection that has not prepared it:
+    the SQL with typed named placeholders, and their values.
+    Example: expand("delivery_tracking", ["PT123"])
+        -> ("SELECT * FROM fn_get_delivery_tracking(%(p1)s::VARCHAR)", {"p1": "PT123"})
+    """
+    sql, types = STATEMENTS[name]
+    sql = re.sub(
+        r"\$(\d+)", lambda match: f"%(p{match.group(1)})s::{types[int(match.group(1)) - 1]}", sql.replace("%", "%%"),
+    )
+    return sql, {f"p{i}": value for i, value in enumerate(params or (), 1)}
+
+
+# ==========================================================
+#  ROW MAPPING: RECORDS INSTEAD OF dict(zip(columns, row))
+# ==========================================================
+# A record is a namedtuple subclass generated once per column signature
+# (one per view/function, in practice), so a row costs one tuple instead
+# of a dict with its own key table. Records also answer row["col"] and
+# row.get("col"), so templates ({{ row.col }}) and code written against
+# dicts keep working; keys are looked up in the column names only, so
+# row.get("count") is the column, never a tuple method. Use row._asdict()
+# where a real dict is needed (JSON). Records cannot be pickled; convert
+# them before caching.
+
+@lru_cache(maxsize=256)
+def record_type(columns):
+    """
+    Returns the record class for a tuple of column names.
+    Raises ValueError on duplicate names: alias them in the SQL.
+    """
+    duplicates = sorted({name for name in columns if columns.count(name) > 1})
+    if duplicates:
+        raise ValueError(f"Duplicate column names: {', '.join(duplicates)}")
+    # Names that are not valid attributes (keywords such as "from") only
+    # get positional attribute names; as keys they keep their own
+    base = namedtuple("Record", columns, rename=True)
+
+    class Record(base):
+        __slots__ = ()
+        _fields = columns
+
+        def __getitem__(self, key):
+            if isinstance(key, str):
+                try:
+                    key = self._fields.index(key)
+                except ValueError:
+                    raise KeyError(key) from None
+            return super().__getitem__(key)
+
+        def get(self, key, default=None):
+            try:
+                return self[key]
+            except KeyError:
+                return default
+
+    return Record
+
+
+def _record_factory(cursor):
+    record = record_type(tuple(col[0] for col in cursor.description))
+    return lambda row: tuple.__new__(record, row)
+
+
+def fetch_records(cursor):
+    """
+    Returns the remaining rows of an executed cursor as a list of records.
+    """
+    make = _record_factory(cursor)
+    return [make(row) for row in cursor.fetchall()]
+
+
+def iter_records(cursor, batch_size=None):
+    """
+    Yields the rows of an executed cursor as records, fetchmany() at a time.
+    """
+    make = _record_factory(cursor)
+    batch_size = batch_size or settings.JOB_BATCH_SIZE
+    while True:
+        rows = cursor.fetchmany(batch_size)
+        if not rows:
+            break
+        for row in rows:
+            yield make(row)
+
+
+def stream(sql, params=None, batch_size=None):
+    """
+    Runs a query on a server-side cursor and yields its rows as records,
+    so only one batch is held in memory at a time (exports, large lists).
+    """
+    with read_connection().chunked_cursor() as cursor:
+        cursor.execute(sql, params)
+        yield from iter_records(cursor, batch_size)
+
+
+# ==========================================================
+#  BULK LOAD: COPY FROM STDIN
+# ==========================================================
+
+def copy_rows(cursor, table, columns, rows, batch_size=None):
+    """
+    Streams an iterable of row tuples into `table` with COPY.
+    None is loaded as NULL. Works with psycopg 3 and psycopg2.
+
+    Returns:
+        int: Number of rows copied
+    """
+    sql = f"COPY {table} ({', '.join(columns)}) FROM STDIN"
+    raw = cursor.cursor
+    count = 0
+
+    if hasattr(raw, "copy"):
+        # psycopg 3 streams rows itself; write_row() produces TEXT format
+        with raw.copy(sql) as copy:
+            for row in rows:
+                copy.write_row(row)
+                count += 1
+        return count
+
+    # psycopg2: one CSV buffer per batch (None -> unquoted empty field = NULL)
+    sql += " WITH (FORMAT csv)"
+    batch_size = batch_size or settings.JOB_BATCH_SIZE * 50
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in rows:
+        writer.writerow(row)
+        count += 1
+        if count % batch_size == 0:
+            buffer.seek(0)
+            raw.copy_expert(sql, buffer)
+            buffer = io.StringIO()
+            writer = csv.writer(buffer)
+    buffer.seek(0)
+    raw.copy_expert(sql, buffer)
+    return count
+
+
+# ==========================================================
+#  LONG-RUNNING LOOPS: BOUNDED MEMORY
+# ==========================================================
+# Django empties the query log of each connection when a request starts,
+# never in a job or a management command. With DEBUG = True every
+# statement is logged there with its parameters (up to 9000 per
+# connection): for an import, the whole JSON of each sp_import_* batch.
+
+def end_batch():
+    """
+    Call between the batches of a loop that runs outside a request: drops
+    the query log of every open connection.
+    """
+    reset_queries()
@@ -1,12 +1,114 @@
 from django import forms
+from django.conf import settings
+from django.urls import reverse
 from django.utils import timezone
 from django.contrib.auth.forms import UserCreationForm, UserChangeForm
+from . import autocomplete
 from .models import (
     InvoiceItem, User, Employee, EmployeeDriver, EmployeeStaff,
     Warehouse, Vehicle, Invoice, Route, Delivery
 )
 
 
+# ==========================================================
+#  AUTOCOMPLETE PICKERS (instead of full-table selects)
+# ==========================================================
+
+class AutocompleteWidget(forms.Widget):
+    """
+    A text box that fetches its options from /autocomplete/<source>/ as the
+    user types, and a hidden input holding the picked id.
+    """
+    template_name = "widgets/autocomplete.html"
+
+    def __init__(self, source, attrs=None):
+        super().__init__(attrs)
+        self.source = source
+        self.label = ""
+
+    def get_context(self, name, value, attrs):
+        context = super().get_context(name, value, attrs)
+        context["widget"].update({
+            "url": reverse("autocomplete", args=[self.source]),
+            "label": self.label,
+            "min_chars": settings.AUTOCOMPLETE_MIN_CHARS,
+        })
+        return context
+
+
+class AutocompleteField(forms.IntegerField):
+    """
+    The id of a row picked from an autocomplete source (see autocomplete.py).
+    Its existence is checked by AutocompleteFormMixin, with the other pickers
+    of the form, in one query.
+    """
+
+    def __init__(self, source, **kwargs):
+        if source not in autocomplete.SOURCES:
+            raise ValueError(f"Unknown autocomplete source '{source}'")
+        self.source = source
+        kwargs.setdefault("widget", AutocompleteWidget(source))
+        super().__init__(**kwargs)
+
+    def widget_attrs(self, widget):
+        # No min / max / step: the id is not typed in by the user
+        return {}
+
+
+class AutocompleteFormMixin:
+    """
+    Validates (bound form, on the primary) or labels (unbound form, on the
+    replica) every AutocompleteField of the form with a single
+    autocomplete.lookup() query.
+    A picker named <name> is the instance's <name>_id foreign key: it is
+    not in Meta.fields, so it is read from and saved to the instance here.
+    An unchanged initial value (edit forms) is accepted as it is.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        if self.instance.pk is not None:
+            for name in self._pickers():
+                self.initial.setdefault(name, getattr(self.instance, f"{name}_id"))
+        if not self.is_bound:
+            values = {name: self.get_initial_for_field(field, name) for name, field in self._pickers().items()}
+            self._lookup({name: value for name, value in values.items() if value not in (None, "")})
+
+    def _pickers(self):
+        return {name: field for name, field in self.fields.items() if isinstance(field, AutocompleteField)}
+
+    def _lookup(self, values, primary=False):
+        """Runs the lookup for {field name: id} and labels the widgets."""
+        pickers = self._pickers()
+        ids_by_source = {}
+        for name, value in values.items():
+            ids_by_source.setdefault(pickers[name].source, set()).add(int(getattr(value, "pk", value)))
+        found = autocomplete.lookup(ids_by_source, primary)
+        for name, value in values.items():
+            pickers[name].widget.label = found[pickers[name].source].get(int(getattr(value, "pk", value)), "")
+        return found
+
+    def clean(self):
+        cleaned_data = super().clean()
+        values = {
+            name: cleaned_data[name] for name in self._pickers()
+            if cleaned_data.get(name) is not None and name in self.changed_data
+        }
+        if values:
+            found = self._lookup(values, primary=True)
+            for name, value in values.items():
+                if value not in found[self.fields[name].source]:
+                    self.add_error(name, "Select a valid option.")
+        return cleaned_data
+
+    def _post_clean(self):
+        # Before the model validation, which runs in super()._post_clean()
+        for name in self._pickers():
+            if name in self.cleaned_data:
+                setattr(self.instance, f"{name}_id", self.cleaned_data[name])
+        super()._post_clean()
+
+
 # ==========================================================
 #  USER FORMS
 # ==========================================================
@@ -33,31 +135,20 @@ class CustomUserChangeForm(UserChangeForm):
 #  EMPLOYEE FORMS (Driver / Staff specialization)
 # ==========================================================
 
-class EmployeeForm(forms.ModelForm):
-    # Expose the related user so the user assignment can be handled via the form
-    user = forms.ModelChoiceField(
-        queryset=User.objects.exclude(role__in=["admin", "client"]),
-        required=True,
-        label="User",
-    )
+class EmployeeForm(AutocompleteFormMixin, forms.ModelForm):
+    # The user id; only users without an employee record can be picked
+    user = AutocompleteField("potential_employees", required=True, label="User")
 
     class Meta:
         model = Employee
         fields = [
-            "user", "position", "schedule", "wage",
+            "position", "schedule", "wage",
             "is_active", "hire_date"
         ]
         widgets = {
             "hire_date": forms.DateInput(attrs={"type": "date"}),
         }
 
-    def clean_user(self):
-        user = self.cleaned_data.get("user")
-        # Ensure the selected user does not already have an employee record
-        if user and hasattr(user, "employee") and (not self.instance.pk or user.employee.pk != self.instance.pk):
-            raise forms.ValidationError("This user is already assigned to an employee record.")
-        return user
-
     def clean_wage(self):
         wage = self.cleaned_data.get("wage")
         if wage is not None and wage < 0:
@@ -185,7 +276,11 @@ class InvoiceItemForm(forms.ModelForm):
 #  ROUTE FORM
 # ==========================================================
 
-class RouteForm(forms.ModelForm):
+class RouteForm(AutocompleteFormMixin, forms.ModelForm):
+    # Ids picked by autocomplete
+    driver = AutocompleteField("drivers", required=False)
+    vehicle = AutocompleteField("vehicles", required=False)
+
     class Meta:
         model = Route
         fields = [
@@ -193,7 +288,7 @@ class RouteForm(forms.ModelForm):
             "delivery_date", "delivery_start_time",
             "delivery_end_time", "expected_duration",
             "kms_travelled", "driver_notes",
-            "driver", "vehicle", "warehouse"
+            "warehouse"
         ]
         widgets = {
             "delivery_date": forms.DateInput(attrs={"type": "date"}),
@@ -217,11 +312,16 @@ class RouteForm(forms.ModelForm):
 #  DELIVERY FORM
 # ==========================================================
 
-class DeliveryForm(forms.ModelForm):
+class DeliveryForm(AutocompleteFormMixin, forms.ModelForm):
+    # Ids picked by autocomplete
+    invoice = AutocompleteField("invoices", required=False)
+    driver = AutocompleteField("drivers", required=False)
+    client = AutocompleteField("clients", required=False)
+    route = AutocompleteField("routes", required=False)
+
     class Meta:
         model = Delivery
         fields = [
-            "invoice",
             "tracking_number", "description",
 
             # SENDER
@@ -239,8 +339,6 @@ class DeliveryForm(forms.ModelForm):
             "in_transition",
 
             "delivery_date",
-
-            "driver", "client", "route"
         ]
         widgets = {
             "updated_at": forms.DateTimeInput(attrs={"type": "datetime-local"}),
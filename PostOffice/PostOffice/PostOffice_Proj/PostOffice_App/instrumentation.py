@@ -0,0 +1,232 @@
+import json
+import logging
+import re
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DatabaseError, connections
+
+from . import db, metrics
+
+# ==========================================================
+#  QUERY INSTRUMENTATION (per request)
+# ==========================================================
+# QueryTimingMiddleware (middleware.py) installs record() as an
+# execute_wrapper on every configured connection for the duration of a
+# request. Each statement is recorded as a Call: the database object it
+# used (sp_* / fn_* / v_* / mv_*), the alias it ran on (primary or
+# replica), its duration and the rows it returned.
+#
+# At the end of the request the calls are summarized per object into a
+# Server-Timing header and one JSON log line on the "PostOffice_App.db"
+# logger. Calls slower than DB_SLOW_CALL_MS are logged again; reads of
+# views and fn_get_* functions get their EXPLAIN (ANALYZE, BUFFERS) plan,
+# taken on a background thread (never on the request path) and at most
+# once per object every DB_EXPLAIN_INTERVAL_SECONDS. Every call is also
+# observed in the po_db_call_duration_seconds histogram (metrics.py).
+
+logger = logging.getLogger("PostOffice_App.db")
+
+Call = namedtuple("Call", "object alias ms rows sql params many")
+
+OBJECT_RE = re.compile(r"\b((?:sp|fn|v|mv)_\w+)", re.IGNORECASE)
+EXECUTE_RE = re.compile(r"\s*EXECUTE\s+po_(\w+)", re.IGNORECASE)
+
+# Objects that only read: EXPLAIN ANALYZE runs the statement again, so
+# only statements using nothing else are explained. Every other fn_*
+# (e.g. fn_dequeue_job) and every sp_* may write
+READ_ONLY_OBJECTS = ("v_", "mv_", "fn_get_")
+# Reads that still have side effects (locks, sequences, settings)
+SIDE_EFFECT_RE = re.compile(
+    r";\s*\S|\bFOR\s+(?:NO\s+KEY\s+)?(?:UPDATE|SHARE)\b|\b(?:nextval|setval|set_config|pg_advisory\w*)\s*\(",
+    re.IGNORECASE,
+)
+
+_calls = ContextVar("db_calls", default=None)
+
+# One thread runs the EXPLAINs, on its own connections
+_explain_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="explain")
+_explain_lock = threading.Lock()
+# object -> time.monotonic() of its last EXPLAIN
+_last_explained = {}
+
+
+def object_name(sql):
+    """
+    The database object a statement uses, e.g. 'sp_update_delivery_status'.
+    EXECUTE of a prepared statement is resolved through db.STATEMENTS.
+    """
+    match = EXECUTE_RE.match(sql)
+    if match and match.group(1) in db.STATEMENTS:
+        sql = db.STATEMENTS[match.group(1)][0]
+    match = OBJECT_RE.search(sql)
+    return match.group(1).lower() if match else "sql"
+
+
+def record(execute, sql, params, many, context):
+    """execute_wrapper: times the statement and appends it to the request's calls."""
+    calls = _calls.get()
+    if calls is None:
+        return execute(sql, params, many, context)
+
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        seconds = time.perf_counter() - start
+        rows = context["cursor"].rowcount
+        call = Call(
+            object=object_name(sql),
+            alias=context["connection"].alias,
+            ms=seconds * 1000,
+            rows=rows if rows >= 0 else None,
+            sql=sql,
+            params=params,
+            many=many,
+        )
+        calls.append(call)
+        metrics.db_call_duration.observe(seconds, object=call.object, alias=call.alias)
+
+
+def start():
+    """Starts recording for the current request; returns (calls, token)."""
+    calls = []
+    return calls, _calls.set(calls)
+
+
+def stop(token):
+    _calls.reset(token)
+
+
+def current_calls():
+    """The calls recorded so far in the current request, or None outside one."""
+    return _calls.get()
+
+
+def summarize(calls):
+    """
+    Aggregates calls per (object, alias), slowest first.
+
+    Returns:
+        list: [{"object", "alias", "calls", "ms", "rows"}]
+    """
+    summary = {}
+    for call in calls:
+        entry = summary.setdefault((call.object, call.alias), {
+            "object": call.object, "alias": call.alias, "calls": 0, "ms": 0.0, "rows": 0,
+        })
+        entry["calls"] += 1
+        entry["ms"] += call.ms
+        entry["rows"] += call.rows or 0
+    return sorted(summary.values(), key=lambda entry: entry["ms"], reverse=True)
+
+
+def server_timing(summary, limit):
+    """
+    Server-Timing header value: the DB total plus the `limit` slowest objects.
+    Example: db;dur=12.4;desc="5 calls", fn_get_dashboard_stats;dur=8.1;desc="replica x1, 12 rows"
+    """
+    total = sum(entry["ms"] for entry in summary)
+    count = sum(entry["calls"] for entry in summary)
+    metrics = [f'db;dur={total:.1f};desc="{count} calls"']
+    for entry in summary[:limit]:
+        metrics.append(
+            f'{entry["object"]};dur={entry["ms"]:.1f};'
+            f'desc="{entry["alias"]} x{entry["calls"]}, {entry["rows"]} rows"'
+        )
+    return ", ".join(metrics)
+
+
+def _explainable(call):
+    # Allowlist: a single SELECT (or EXECUTE of a registered po_* statement)
+    # whose every object is a view or a fn_get_* read, without locks
+    sql = call.sql
+    match = EXECUTE_RE.match(sql)
+    if match:
+        if match.group(1) not in db.STATEMENTS:
+            return False
+        sql = db.STATEMENTS[match.group(1)][0]
+    objects = OBJECT_RE.findall(sql)
+    return (
+        not call.many
+        and sql.lstrip().upper().startswith("SELECT")
+        and bool(objects)
+        and all(name.lower().startswith(READ_ONLY_OBJECTS) for name in objects)
+        and not SIDE_EFFECT_RE.search(sql)
+    )
+
+
+def _explain_due(call):
+    """True at most once per object every DB_EXPLAIN_INTERVAL_SECONDS."""
+    now = time.monotonic()
+    with _explain_lock:
+        last = _last_explained.get(call.object)
+        if last is not None and now - last < settings.DB_EXPLAIN_INTERVAL_SECONDS:
+            return False
+        _last_explained[call.object] = now
+        return True
+
+
+def explain(call):
+    """
+    EXPLAIN (ANALYZE, BUFFERS) of a recorded read, on the alias it ran on.
+    Returns the plan text, or None if the call cannot be re-run safely.
+    """
+    if not _explainable(call):
+        return None
+    sql, params = call.sql, call.params
+    match = EXECUTE_RE.match(sql)
+    if match:
+        # Prepared on the request's connection, not on this one
+        sql, params = db.expand(match.group(1), params)
+    try:
+        with connections[call.alias].cursor() as cursor:
+            cursor.execute(f"EXPLAIN (ANALYZE, BUFFERS) {sql}", params)
+            return "\n".join(row[0] for row in cursor.fetchall())
+    except DatabaseError as e:
+        return f"EXPLAIN failed: {e}"
+
+
+def log_request(request, status, total_ms, summary):
+    """One structured log line per request with its DB calls."""
+    logger.info(json.dumps({
+        "event": "db_calls",
+        "method": request.method,
+        "path": request.path,
+        "status": status,
+        "request_ms": round(total_ms, 1),
+        "db_ms": round(sum(entry["ms"] for entry in summary), 1),
+        "calls": [dict(entry, ms=round(entry["ms"], 1)) for entry in summary],
+    }))
+
+
+def _log_slow_call(entry, call):
+    if call:
+        # The explain thread keeps its connections between calls
+        connections[call.alias].close_if_unusable_or_obsolete()
+    logger.warning(json.dumps(dict(entry, plan=explain(call) if call else None)))
+
+
+def log_slow_call(request, call):
+    """
+    Logs a slow call. Its plan, when it can be re-run safely and was not
+    taken recently, is added by the explain thread: the response does not
+    wait for it.
+    """
+    entry = {
+        "event": "db_slow_call",
+        "path": request.path,
+        "object": call.object,
+        "alias": call.alias,
+        "ms": round(call.ms, 1),
+        "rows": call.rows,
+        "sql": call.sql,
+    }
+    if _explainable(call) and _explain_due(call):
+        _explain_pool.submit(_log_slow_call, entry, call)
+    else:
+        _log_slow_call(entry, None)
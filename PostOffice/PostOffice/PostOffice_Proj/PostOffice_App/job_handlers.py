@@ -0,0 +1,194 @@
+import csv
+import json
+import re
+from itertools import islice
+from pathlib import Path
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection, transaction
+
+from . import db, pdf_export
+from .jobs import job_handler
+
+# ==========================================================
+#  JOB HANDLERS: IMPORT / EXPORT FOR EVERY ENTITY
+# ==========================================================
+
+# entity -> flat export view (JSON / CSV)
+EXPORT_VIEWS = {
+    "deliveries": "v_deliveries_export",
+    "routes": "v_routes_export",
+    "vehicles": "v_vehicles_export",
+    "warehouses": "v_warehouses_export",
+    "invoices": "v_invoices_export",
+}
+
+# entity -> bulk import procedure taking a JSONB array
+IMPORT_PROCEDURES = {
+    "deliveries": "sp_import_deliveries",
+    "routes": "sp_import_routes",
+    "vehicles": "sp_import_vehicles",
+    "warehouses": "sp_import_warehouses",
+    "invoices": "sp_import_invoices",
+}
+
+EXPORT_FORMATS = ("json", "csv")
+
+CONTENT_TYPES = {
+    "json": "application/json",
+    "csv": "text/csv",
+    "pdf": "application/pdf",
+    "zip": "application/zip",
+}
+
+
+def _result(path, filename, rows):
+    extension = Path(filename).suffix.lstrip(".")
+    return {
+        "file": path.name,
+        "filename": filename,
+        "content_type": CONTENT_TYPES[extension],
+        "rows": rows,
+    }
+
+
+@job_handler("export")
+def export_entity(job):
+    """
+    payload: {"entity": "deliveries", "format": "json" | "csv"}
+    Streams the export view to a file in batches of JOB_BATCH_SIZE rows.
+    """
+    entity = job.payload["entity"]
+    fmt = job.payload["format"]
+    view = EXPORT_VIEWS[entity]
+    path = job.output_path(fmt)
+
+    # Exports read from the replica when one is configured
+    source = db.read_connection()
+    with source.cursor() as cursor:
+        cursor.execute(f"SELECT COUNT(*) FROM {view}")
+        total = cursor.fetchone()[0]
+    job.progress(0, total)
+
+    done = 0
+    # Server-side cursor: only one batch of rows is held in memory
+    with source.chunked_cursor() as cursor, open(path, "w", newline="", encoding="utf-8") as f:
+        cursor.execute(f"SELECT * FROM {view}")
+        columns = [col[0] for col in cursor.description]
+        if fmt == "csv":
+            writer = csv.writer(f)
+            writer.writerow(columns)
+        else:
+            f.write("[")
+
+        for record in db.iter_records(cursor):
+            if fmt == "csv":
+                writer.writerow(record)
+            else:
+                f.write(",\n" if done else "\n")
+                f.write(json.dumps(record._asdict(), cls=DjangoJSONEncoder))
+            done += 1
+            if done % settings.JOB_BATCH_SIZE == 0:
+                job.progress(done, total)
+
+        if fmt == "json":
+            f.write("\n]\n")
+
+    job.progress(done, total)
+    return _result(path, f"{entity}_export.{fmt}", done)
+
+
+_WHITESPACE = re.compile(r"[ \t\n\r]*")
+
+
+def iter_json_array(f, chunk_size=64 * 1024):
+    """
+    Yields the items of the JSON array in text file `f` one by one, reading
+    it chunk_size characters at a time: memory stays flat whatever the size
+    of the file.
+    """
+    decoder = json.JSONDecoder()
+    buffer, pos, eof = "", 0, False
+    # "[" -> "first" (an item or "]") -> "separator" ("," or "]") -> "item"
+    state = "["
+    while True:
+        pos = _WHITESPACE.match(buffer, pos).end()
+        if pos == len(buffer):
+            if eof:
+                raise ValueError("Import file must contain a JSON array")
+            chunk = f.read(chunk_size)
+            buffer, pos, eof = chunk, 0, not chunk
+            continue
+
+        char = buffer[pos]
+        if state == "[":
+            if char != "[":
+                raise ValueError("Import file must contain a JSON array")
+            pos, state = pos + 1, "first"
+        elif char == "]" and state in ("first", "separator"):
+            return
+        elif char == "," and state == "separator":
+            pos, state = pos + 1, "item"
+        elif state in ("first", "item"):
+            try:
+                item, end = decoder.raw_decode(buffer, pos)
+                after = _WHITESPACE.match(buffer, end).end()
+            except json.JSONDecodeError:
+                end = after = None
+            # Incomplete, or a number cut by the chunk ("2." of "2.5"): read on and retry
+            if not eof and (end is None or after == len(buffer) or buffer[after] not in ",]"):
+                chunk = f.read(chunk_size)
+                buffer, pos, eof = buffer[pos:] + chunk, 0, not chunk
+                continue
+            if end is None:
+                raise ValueError(f"Import file is not valid JSON near character {pos}")
+            yield item
+            pos, state = end, "separator"
+        else:
+            raise ValueError(f"Import file is not valid JSON near character {pos}")
+
+
+@job_handler("import")
+def import_entity(job):
+    """
+    payload: {"entity": "vehicles", "path": "<uploaded JSON file>"}
+    Reads the file as a stream and calls the entity's sp_import_* procedure
+    once per batch of JOB_BATCH_SIZE records, so each batch commits on its
+    own, progress is visible while the import runs, and only one batch is
+    held in memory.
+    A batch commits together with its progress, so a job requeued after its
+    worker died skips the progress_done records already imported instead of
+    inserting them twice.
+    """
+    entity = job.payload["entity"]
+    procedure = IMPORT_PROCEDURES[entity]
+    upload = Path(job.payload["path"])
+
+    done = job.progress_done
+    try:
+        with open(upload, encoding="utf-8") as f, connection.cursor() as cursor:
+            records = islice(iter_json_array(f), done, None)
+            job.progress(done)
+            while batch := list(islice(records, settings.JOB_BATCH_SIZE)):
+                with transaction.atomic():
+                    cursor.execute(f"CALL {procedure}(%s::jsonb)", [json.dumps(batch)])
+                    done += len(batch)
+                    job.progress(done)
+    finally:
+        upload.unlink(missing_ok=True)
+
+    # The total is only known at the end
+    job.progress(done, done)
+    return {"rows": done}
+
+
+@job_handler("invoices_pdf")
+def export_invoices_pdf(job):
+    """
+    payload: {"mode": "pdf" | "zip", "client_id": <id or null>}
+    """
+    mode = job.payload.get("mode", pdf_export.MODE_PDF)
+    path = job.output_path(mode)
+    rows = pdf_export.run_export(path, job.payload.get("client_id"), mode, job.progress)
+    return _result(path, f"invoices.{mode}", rows)
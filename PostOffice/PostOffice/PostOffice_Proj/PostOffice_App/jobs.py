@@ -0,0 +1,195 @@
+import json
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import DatabaseError, connection
+
+from . import db, routers
+
+# ==========================================================
+#  BACKGROUND JOBS (PostgreSQL queue, no broker)
+# ==========================================================
+# Views call enqueue() and return immediately. The worker
+# ('python manage.py run_jobs') claims jobs with fn_dequeue_job
+# (FOR UPDATE SKIP LOCKED), runs the registered handler and records the
+# outcome with sp_finish_job. See jobs_objects.sql.
+# Every claim is a new attempt. A job with no progress for
+# JOB_STALE_AFTER_SECONDS is requeued even if its worker is still running;
+# that worker's next progress (or finish) call then raises and it stops.
+# The queue always lives on the primary (never the read replica).
+
+# kind -> handler(job) returning a JSON-serializable result dict
+HANDLERS = {}
+
+
+def job_handler(kind):
+    """
+    Registers the decorated function as the handler for a job kind.
+    Example: @job_handler("export")
+    """
+    def decorator(func):
+        HANDLERS[kind] = func
+        return func
+    return decorator
+
+
+class Job:
+    """A claimed job, as passed to its handler."""
+
+    def __init__(self, row):
+        self.id = row["id"]
+        self.kind = row["kind"]
+        self.payload = row["payload"]
+        self.requested_by = row["requested_by"]
+        # The claim: progress and finish only apply while it is current
+        self.attempt = row["attempts"]
+        # Set when a requeued job was interrupted: what the last run committed
+        self.progress_done = row.get("progress_done") or 0
+
+    def progress(self, done, total=None):
+        """
+        Records how much is done. Handlers call it once per batch, so it is
+        also where the memory held by the previous batch is released.
+        """
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "CALL sp_update_job_progress(%s, %s, %s, %s)", [self.id, self.attempt, done, total],
+            )
+        db.end_batch()
+
+    def output_path(self, extension):
+        """Where the job writes its downloadable file."""
+        directory = settings.EXPORTS_DIR
+        directory.mkdir(parents=True, exist_ok=True)
+        return directory / f"job_{self.id}.{extension}"
+
+
+def _dumps(value):
+    return json.dumps(value, cls=DjangoJSONEncoder)
+
+
+def _loads(value):
+    # psycopg2 already decodes JSONB; keep str support for other drivers
+    return json.loads(value) if isinstance(value, str) else value
+
+
+def enqueue(kind, payload, user=None):
+    """
+    Queues a job and returns its id.
+
+    Args:
+        kind (str): A key of HANDLERS (e.g. 'export', 'import', 'invoices_pdf')
+        payload (dict): Handler arguments, stored as JSONB
+        user: The requesting user, notified when the job finishes
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "CALL sp_enqueue_job(%s, %s::jsonb, %s, NULL)",
+            [kind, _dumps(payload), user.id if user else None],
+        )
+        return cursor.fetchone()[0]
+
+
+def get_job(job_id):
+    """
+    Returns a job from v_background_jobs as a dict, or None.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT * FROM v_background_jobs WHERE id = %s", [job_id])
+        row = cursor.fetchone()
+        if row is None:
+            return None
+        columns = [col[0] for col in cursor.description]
+    job = dict(zip(columns, row))
+    job["payload"] = _loads(job["payload"])
+    job["result"] = _loads(job["result"])
+    return job
+
+
+def _claim(job_class=Job):
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT * FROM fn_dequeue_job()")
+        row = cursor.fetchone()
+        if row is None:
+            return None
+        columns = [col[0] for col in cursor.description]
+    row = dict(zip(columns, row))
+    row["payload"] = _loads(row["payload"])
+    return job_class(row)
+
+
+def _finish(job, status, result=None, error=None):
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "CALL sp_finish_job(%s, %s, %s, %s::jsonb, %s)",
+            [job.id, job.attempt, status, _dumps(result) if result is not None else None, error],
+        )
+
+    email = (get_job(job.id) or {}).get("requested_by_email")
+    if email:
+        # Imported here so the job layer does not connect to MongoDB on import
+        from .notifications import create_notification
+
+        create_notification(
+            notification_type=f"job_{status}",
+            recipient_contact=email,
+            subject=f"Job #{job.id} {'finished' if status == 'done' else 'failed'}",
+            message=(
+                f"Your {job.kind} job #{job.id} is ready"
+                if status == "done"
+                else f"Your {job.kind} job #{job.id} failed: {error}"
+            ),
+            status="sent",
+        )
+
+
+def _superseded(job):
+    """True if the job was requeued (as stale) since this attempt claimed it."""
+    current = get_job(job.id)
+    return current is None or current["status"] != "running" or current["attempts"] != job.attempt
+
+
+def run_next():
+    """
+    Claims and runs one queued job.
+
+    Returns:
+        bool: True if a job was run, False if the queue was empty
+    """
+    # Handlers register themselves on import
+    from . import job_handlers  # noqa: F401
+
+    job = _claim()
+    if job is None:
+        return False
+
+    handler = HANDLERS.get(job.kind)
+    if handler is None:
+        _finish(job, "failed", error=f"No handler for job kind '{job.kind}'")
+        return True
+
+    # Each job gets its own read-your-writes scope (see routers.py)
+    token = routers.reset()
+    try:
+        try:
+            result = handler(job)
+        except Exception as e:
+            _finish(job, "failed", error=str(e))
+        else:
+            _finish(job, "done", result=result)
+    except DatabaseError:
+        # Requeued under this worker: the outcome belongs to the new attempt
+        if not _superseded(job):
+            raise
+    finally:
+        routers.restore(token)
+    return True
+
+
+def requeue_stale_jobs():
+    """Puts back jobs abandoned by a worker that died mid-run."""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "CALL sp_requeue_stale_jobs(make_interval(secs => %s), %s)",
+            [settings.JOB_STALE_AFTER_SECONDS, settings.JOB_MAX_ATTEMPTS],
+        )
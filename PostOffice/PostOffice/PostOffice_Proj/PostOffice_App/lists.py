@@ -0,0 +1,39 @@
+from django.conf import settings
+
+from . import db
+
+# ==========================================================
+#  LIST PAGES: FILTERED, KEYSET-PAGINATED (fn_list_*)
+# ==========================================================
+# v_deliveries_full, v_routes_full and v_invoices_with_items join and sort
+# every row. fn_list_deliveries / _routes / _invoices filter the base table
+# first (status, warehouse, driver, client, dates) and page by cursor, the id
+# of the last row shown, so a page costs the same on page 1 and page 10 000
+# and "pending deliveries at warehouse 3 this week" reads only those rows.
+
+# entity -> its filters, in the order of the function's parameters
+FILTERS = {
+    "deliveries": ("status", "warehouse", "driver", "client", "from", "to"),
+    "routes": ("status", "warehouse", "driver", "from", "to"),
+    "invoices": ("status", "warehouse", "client", "from", "to"),
+}
+SORTS = ("newest", "oldest")
+
+
+def page(entity, filters, sort="newest", after=None):
+    """
+    One page of an entity's list.
+
+    Args:
+        filters (dict): {"status": "pending", "warehouse": 3, "from": date(...)}, missing = any
+        after (int): cursor returned with the previous page
+
+    Returns:
+        tuple: (rows as dicts, cursor of the next page or None on the last page)
+    """
+    size = settings.LIST_PAGE_SIZE
+    params = [filters.get(name) for name in FILTERS[entity]]
+    # One row more than the page tells whether there is a next one
+    rows = db.fetch_all(f"{entity}_list", params + [sort, after, size + 1])
+    cursor = rows[size - 1].id if len(rows) > size else None
+    return [row._asdict() for row in rows[:size]], cursor
@@ -0,0 +1,29 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+
+class Command(BaseCommand):
+    help = "Rebuilds the daily delivery/revenue rollups from delivery_tracking and invoice history."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--since",
+            help="First day to rebuild (YYYY-MM-DD). Default: all history.",
+        )
+
+    def handle(self, *args, **options):
+        since = None
+        if options["since"]:
+            try:
+                since = date.fromisoformat(options["since"])
+            except ValueError:
+                raise CommandError("--since must be a date in YYYY-MM-DD format")
+
+        with connection.cursor() as cursor:
+            cursor.execute("CALL sp_backfill_daily_rollups(%s)", [since])
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Daily rollups rebuilt {'since ' + str(since) if since else 'for all history'}"
+        ))
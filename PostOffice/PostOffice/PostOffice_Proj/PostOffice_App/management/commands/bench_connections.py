@@ -0,0 +1,65 @@
+import threading
+import time
+
+from django.conf import settings
+from django.core.signals import request_finished, request_started
+from django.core.management.base import BaseCommand
+from django.db import connection, connections
+
+
+class Command(BaseCommand):
+    help = (
+        "Measures requests/second for the current DB_CONN_MODE. Each simulated request "
+        "sends Django's request_started/request_finished signals around its queries, so "
+        "connections are opened, reused or returned to the pool exactly as in a real request. "
+        "Run it once per mode, e.g. DB_CONN_MODE=none python manage.py bench_connections"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=500, help="Requests per thread.")
+        parser.add_argument("--threads", type=int, default=4, help="Concurrent worker threads.")
+        parser.add_argument("--queries", type=int, default=3, help="Queries per request.")
+        parser.add_argument("--sql", default="SELECT 1", help="Query run by each request.")
+
+    def _worker(self, options, errors):
+        try:
+            for _ in range(options["requests"]):
+                request_started.send(sender=self.__class__)
+                try:
+                    with connection.cursor() as cursor:
+                        for _ in range(options["queries"]):
+                            cursor.execute(options["sql"])
+                            cursor.fetchall()
+                finally:
+                    request_finished.send(sender=self.__class__)
+        except Exception as e:
+            errors.append(e)
+        finally:
+            connections.close_all()
+
+    def handle(self, *args, **options):
+        errors = []
+        threads = [
+            threading.Thread(target=self._worker, args=(options, errors))
+            for _ in range(options["threads"])
+        ]
+
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+        if errors:
+            raise errors[0]
+
+        total = options["requests"] * options["threads"]
+        db = settings.DATABASES["default"]
+        self.stdout.write(
+            f"mode={settings.DB_CONN_MODE} conn_max_age={db.get('CONN_MAX_AGE', 0)} "
+            f"threads={options['threads']} requests={total}"
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"{total / elapsed:.1f} requests/s ({elapsed * 1000 / total * options['threads']:.2f} ms/request)"
+        ))
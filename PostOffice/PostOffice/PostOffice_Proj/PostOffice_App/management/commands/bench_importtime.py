@@ -0,0 +1,90 @@
+import os
+import re
+import statistics
+import subprocess
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# What a process does before it can serve: `manage.py check` (every deploy
+# and CI run) and a WSGI worker loading the application and its URLconf
+TARGETS = {
+    "check": ["manage.py", "check"],
+    "wsgi": ["-c", "from PostOffice_Proj.wsgi import application; "
+                   "from django.urls import get_resolver; get_resolver().url_patterns"],
+}
+
+# Loaded on first use only (PDF export, notifications): never at startup
+HEAVY_MODULES = ("xhtml2pdf", "reportlab", "pypdf", "pymongo", "bson")
+
+# "import time: self [us] | cumulative | imported package", nested names indented
+IMPORTTIME_RE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$")
+
+
+def importtime(args):
+    """
+    Runs `python -X importtime <args>` from BASE_DIR in a fresh interpreter.
+
+    Returns:
+        dict: module -> (self us, cumulative us), top-level imports -> cumulative us
+    """
+    env = dict(os.environ, DJANGO_SETTINGS_MODULE=os.environ.get("DJANGO_SETTINGS_MODULE", "PostOffice_Proj.settings"))
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", *args],
+        cwd=settings.BASE_DIR, env=env, capture_output=True, text=True,
+    )
+    if completed.returncode:
+        raise CommandError(f"{' '.join(args)} failed:\n{completed.stdout}{completed.stderr[-2000:]}")
+
+    modules, top_level = {}, {}
+    for line in completed.stderr.splitlines():
+        match = IMPORTTIME_RE.match(line)
+        if match is None:
+            continue
+        self_us, cumulative_us, indent, module = match.groups()
+        modules[module] = (int(self_us), int(cumulative_us))
+        if len(indent) == 1:
+            top_level[module] = int(cumulative_us)
+    return modules, top_level
+
+
+class Command(BaseCommand):
+    help = (
+        "Measures the import time of `manage.py check` and of loading the WSGI application "
+        "(python -X importtime, fresh interpreters) and fails if it is over budget or if a "
+        "heavy optional module (PDF, MongoDB) is imported at startup."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--runs", type=int, default=5, help="Interpreters per target (the median is reported).")
+        parser.add_argument("--check-budget-ms", type=float, default=600)
+        parser.add_argument("--wsgi-budget-ms", type=float, default=800)
+        parser.add_argument("--top", type=int, default=10, help="Slowest top-level imports to list.")
+
+    def handle(self, *args, **options):
+        budgets = {"check": options["check_budget_ms"], "wsgi": options["wsgi_budget_ms"]}
+        failures = []
+
+        for target, target_args in TARGETS.items():
+            totals, modules, top_level = [], {}, {}
+            for _ in range(options["runs"]):
+                modules, top_level = importtime(target_args)
+                totals.append(sum(self_us for self_us, _ in modules.values()) / 1000)
+            total_ms = statistics.median(totals)
+
+            self.stdout.write(f"{target}: {total_ms:.1f} ms in imports, {len(modules)} modules "
+                              f"(budget {budgets[target]:.0f} ms)")
+            slowest = sorted(top_level.items(), key=lambda item: item[1], reverse=True)[:options["top"]]
+            for module, cumulative_us in slowest:
+                self.stdout.write(f"  {cumulative_us / 1000:9.1f} ms  {module}")
+
+            heavy = sorted(module for module in modules if module.split(".")[0] in HEAVY_MODULES)
+            if heavy:
+                failures.append(f"{target} imports {', '.join(heavy)}")
+            if total_ms > budgets[target]:
+                failures.append(f"{target} took {total_ms:.1f} ms (budget {budgets[target]:.0f} ms)")
+
+        if failures:
+            raise CommandError("; ".join(failures))
+        self.stdout.write(self.style.SUCCESS("Import times within budget."))
@@ -0,0 +1,43 @@
+import json
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from ... import db
+
+
+class Command(BaseCommand):
+    help = "Compares ad-hoc vs prepared execution of a statement registered in db.STATEMENTS."
+
+    def add_arguments(self, parser):
+        parser.add_argument("statement", help=f"One of: {', '.join(db.STATEMENTS)}")
+        parser.add_argument("params", nargs="?", default="[]", help='JSON list, e.g. \'[1, "admin"]\'')
+        parser.add_argument("--iterations", type=int, default=1000)
+
+    def _timed(self, run, iterations):
+        with connection.cursor() as cursor:
+            # Warm up (and prepare) before measuring
+            run(cursor)
+            cursor.fetchall()
+            started = time.perf_counter()
+            for _ in range(iterations):
+                run(cursor)
+                cursor.fetchall()
+            return time.perf_counter() - started
+
+    def handle(self, *args, **options):
+        name = options["statement"]
+        if name not in db.STATEMENTS:
+            raise CommandError(f"Unknown statement '{name}'")
+        params = json.loads(options["params"])
+        iterations = options["iterations"]
+        sql = db.adhoc_sql(name)
+
+        adhoc = self._timed(lambda cursor: cursor.execute(sql, params), iterations)
+        prepared = self._timed(lambda cursor: db.execute(cursor, name, params), iterations)
+
+        self.stdout.write(f"{name} x {iterations}")
+        self.stdout.write(f"  ad-hoc:   {adhoc * 1000 / iterations:.3f} ms/call")
+        self.stdout.write(f"  prepared: {prepared * 1000 / iterations:.3f} ms/call")
+        self.stdout.write(self.style.SUCCESS(f"  speedup:  {adhoc / prepared:.2f}x"))
@@ -0,0 +1,125 @@
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+# name -> (SQL, functions it calls per row). Reads as the views and reports
+# use the helpers, plus the status workflow trigger on a bulk UPDATE
+WORKLOADS = {
+    "status_transition_scan": (
+        "SELECT COUNT(*) FROM delivery d WHERE fn_is_valid_status_transition(d.status, 'cancelled')",
+        ("fn_is_valid_status_transition",),
+    ),
+    "item_totals": (
+        "SELECT SUM(fn_calculate_item_total(ii.quantity, ii.unit_price) + fn_calculate_tax(ii.total_item_cost)) "
+        "FROM invoice_item ii",
+        ("fn_calculate_item_total", "fn_calculate_tax"),
+    ),
+    "invoice_totals": (
+        "SELECT SUM(fn_invoice_total(i.id)) FROM (SELECT id FROM invoice ORDER BY id LIMIT 1000) i",
+        ("fn_invoice_total", "fn_invoice_subtotal", "fn_calculate_tax"),
+    ),
+    "valid_years": (
+        "SELECT COUNT(*) FROM vehicle v WHERE fn_is_valid_year(v.year)",
+        ("fn_is_valid_year",),
+    ),
+    "valid_licenses": (
+        "SELECT COUNT(*) FROM employee_driver ed WHERE fn_is_license_valid(ed.license_expiry_date)",
+        ("fn_is_license_valid",),
+    ),
+    "driver_pending_page": (
+        "SELECT * FROM fn_get_driver_deliveries("
+        "(SELECT driver_id FROM delivery WHERE driver_id IS NOT NULL LIMIT 1)"
+        ") WHERE status = 'pending' LIMIT 25",
+        ("fn_get_driver_deliveries",),
+    ),
+    "status_update_trigger": (
+        "UPDATE delivery SET status = 'cancelled' "
+        "WHERE id IN (SELECT id FROM delivery WHERE status = 'registered' ORDER BY id LIMIT 1000)",
+        ("fn_is_valid_status_transition",),
+    ),
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Times the bulk reads and the trigger that call the SQL helper functions, as they are "
+        "(LANGUAGE sql, inlined, PARALLEL SAFE) and as the old PL/pgSQL VOLATILE versions, "
+        "recreated inside a transaction that is rolled back. Load a data set first with: "
+        "python manage.py generate_data"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--iterations", type=int, default=10, help="Timed runs per workload and version.")
+        parser.add_argument("--only", nargs="+", choices=sorted(WORKLOADS), help="Run only these workloads.")
+
+    def _as_plpgsql(self, cursor, name):
+        """Replaces a LANGUAGE sql function by the same body in PL/pgSQL, default volatility."""
+        cursor.execute(
+            """
+            SELECT pg_get_function_arguments(p.oid), pg_get_function_result(p.oid), p.prosrc, p.proretset
+            FROM pg_proc p
+            JOIN pg_language l ON l.oid = p.prolang
+            WHERE p.proname = %s AND l.lanname = 'sql'
+            """,
+            [name],
+        )
+        row = cursor.fetchone()
+        if row is None:
+            raise CommandError(f"{name} is not a LANGUAGE sql function: run the *_objects.sql files first")
+        arguments, result, source, returns_set = row
+        body = source.strip().rstrip(";")
+        statement = f"RETURN QUERY {body};" if returns_set else f"RETURN ({body});"
+        cursor.execute(
+            f"CREATE OR REPLACE FUNCTION {name}({arguments}) RETURNS {result} "
+            f"LANGUAGE plpgsql AS $fn$ BEGIN {statement} END; $fn$"
+        )
+
+    def _timed(self, cursor, sql):
+        """ms per run; every run is rolled back (the UPDATE workload writes)."""
+        latencies = []
+        for i in range(self.iterations + 1):
+            cursor.execute("SAVEPOINT bench_run")
+            started = time.perf_counter()
+            cursor.execute(sql)
+            if cursor.description:
+                cursor.fetchall()
+            elapsed = (time.perf_counter() - started) * 1000
+            cursor.execute("ROLLBACK TO SAVEPOINT bench_run")
+            if i:  # the first run warms the caches
+                latencies.append(elapsed)
+        return statistics.median(latencies)
+
+    def _plan(self, cursor, sql, functions):
+        """(inlined, parallel) for a read: no function name left in the plan, a Gather node."""
+        if not sql.startswith("SELECT"):
+            return None, None
+        cursor.execute(f"EXPLAIN (VERBOSE) {sql}")
+        plan = "\n".join(row[0] for row in cursor.fetchall())
+        return not any(f"{name}(" in plan for name in functions), "Gather" in plan
+
+    def handle(self, *args, **options):
+        self.iterations = options["iterations"]
+        names = options["only"] or list(WORKLOADS)
+
+        with transaction.atomic(), connection.cursor() as cursor:
+            for name in names:
+                sql, functions = WORKLOADS[name]
+                current = self._timed(cursor, sql)
+                inlined, parallel = self._plan(cursor, sql, functions)
+
+                cursor.execute("SAVEPOINT bench_legacy")
+                for function in functions:
+                    self._as_plpgsql(cursor, function)
+                legacy = self._timed(cursor, sql)
+                cursor.execute("ROLLBACK TO SAVEPOINT bench_legacy")
+
+                plan = "" if inlined is None else (
+                    f"  {'inlined' if inlined else 'NOT inlined'}{', parallel' if parallel else ''}"
+                )
+                self.stdout.write(
+                    f"  {name:<24} plpgsql {legacy:9.2f} ms   sql {current:9.2f} ms   "
+                    f"{legacy / current if current else 0:5.2f}x{plan}"
+                )
+            transaction.set_rollback(True)
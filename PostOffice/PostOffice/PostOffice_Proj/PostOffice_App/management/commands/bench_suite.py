@@ -0,0 +1,265 @@
+import json
+import random
+import statistics
+import subprocess
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from ... import dashboard, db, lists
+
+LIST_PAGES = ("deliveries", "routes", "vehicles", "warehouses", "employees")
+PAGE_SIZE = 25
+
+
+class _Rollback(Exception):
+    """Raised inside a write benchmark so its changes are never committed."""
+
+
+class Command(BaseCommand):
+    help = (
+        "Times the hot paths (list pages, tracking lookup, status update, imports, exports, "
+        "dashboard) against the current database and saves the latencies to JSON. Writes run "
+        "inside a transaction that is rolled back, so the data set is left unchanged. "
+        "Load a data set first with: python manage.py generate_data"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--iterations", type=int, default=200, help="Timed runs per benchmark.")
+        parser.add_argument("--warmup", type=int, default=10, help="Untimed runs per benchmark.")
+        parser.add_argument("--import-rows", type=int, default=500, help="Vehicles per import call.")
+        parser.add_argument("--export-rows", type=int, default=50_000, help="Rows per export run.")
+        parser.add_argument("--only", nargs="+", help="Run only these benchmarks (by name prefix).")
+        parser.add_argument("--seed", type=int, default=42)
+        parser.add_argument("--output", help="JSON file (default: bench_results/bench_<timestamp>.json).")
+        parser.add_argument("--baseline", help="Earlier JSON result to compare against.")
+
+    # ----------------------------------------------------------
+    #  Measurement
+    # ----------------------------------------------------------
+
+    def _measure(self, name, run, iterations):
+        """Runs run(i) warmup + iterations times; returns latency stats in ms."""
+        for i in range(self.warmup):
+            run(i)
+        latencies = []
+        rows = 0
+        for i in range(iterations):
+            started = time.perf_counter()
+            rows += run(i) or 0
+            latencies.append((time.perf_counter() - started) * 1000)
+
+        latencies.sort()
+        total_s = sum(latencies) / 1000
+        result = {
+            "iterations": iterations,
+            "mean_ms": round(statistics.fmean(latencies), 3),
+            "p50_ms": round(self._percentile(latencies, 50), 3),
+            "p95_ms": round(self._percentile(latencies, 95), 3),
+            "p99_ms": round(self._percentile(latencies, 99), 3),
+            "min_ms": round(latencies[0], 3),
+            "max_ms": round(latencies[-1], 3),
+            "ops_per_s": round(iterations / total_s, 1) if total_s else None,
+        }
+        if rows:
+            result["rows_per_s"] = round(rows / total_s, 1)
+        self.stdout.write(
+            f"  {name:<28} p50 {result['p50_ms']:9.3f} ms  p95 {result['p95_ms']:9.3f} ms  "
+            f"{result['ops_per_s'] or 0:9.1f} ops/s"
+        )
+        return result
+
+    @staticmethod
+    def _percentile(ordered, pct):
+        index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+        return ordered[index]
+
+    def _rolled_back(self, func):
+        """Runs func() in a transaction that is always rolled back."""
+        try:
+            with transaction.atomic():
+                func()
+                raise _Rollback
+        except _Rollback:
+            pass
+
+    # ----------------------------------------------------------
+    #  Samples
+    # ----------------------------------------------------------
+
+    def _scalar_list(self, sql, params=None):
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            return [row[0] for row in cursor.fetchall()]
+
+    def _count(self, view):
+        return self._scalar_list(f"SELECT COUNT(*) FROM {view}")[0]
+
+    def _user_of_role(self, role):
+        ids = self._scalar_list('SELECT id FROM "USER" WHERE role = %s ORDER BY id LIMIT 1', [role])
+        return ids[0] if ids else None
+
+    # ----------------------------------------------------------
+    #  Benchmarks: name -> run(i) or (run, iterations); run returns rows handled
+    # ----------------------------------------------------------
+
+    def _bench_list_pages(self):
+        benches = {}
+        for entity in LIST_PAGES:
+            total = self._count(f"v_{entity}_full")
+            # First pages plus deep pages, as users paging through a long list
+            offsets = [self.rng.choice((0, PAGE_SIZE, self.rng.randrange(max(total - PAGE_SIZE, 1))))
+                       for _ in range(self.iterations + self.warmup)]
+            benches[f"list_{entity}"] = (
+                lambda i, entity=entity, offsets=offsets:
+                    len(db.fetch_all(f"{entity}_page", [PAGE_SIZE, offsets[i % len(offsets)]]))
+            )
+
+        # Filtered list: pending deliveries of one warehouse in the last week of data
+        warehouses = self._scalar_list("SELECT id FROM warehouse ORDER BY id LIMIT 100")
+        newest = self._scalar_list("SELECT MAX(created_at) FROM delivery")[0]
+        if warehouses and newest:
+            week = {"status": "pending", "from": (newest - timedelta(days=6)).date(), "to": newest.date()}
+            benches["list_deliveries_filtered"] = (
+                lambda i: len(lists.page("deliveries", dict(week, warehouse=warehouses[i % len(warehouses)]))[0])
+            )
+        return benches
+
+    def _bench_tracking(self):
+        numbers = self._scalar_list(
+            "SELECT tracking_number FROM delivery TABLESAMPLE SYSTEM (1) "
+            "WHERE tracking_number IS NOT NULL LIMIT 1000"
+        ) or self._scalar_list("SELECT tracking_number FROM delivery WHERE tracking_number IS NOT NULL LIMIT 1000")
+        if not numbers:
+            return {}
+        return {"tracking_lookup": lambda i: len(db.fetch_all("delivery_tracking", [numbers[i % len(numbers)]]))}
+
+    def _bench_status_update(self):
+        deliveries = self._scalar_list("SELECT id FROM delivery WHERE status = 'registered' LIMIT 1000")
+        staff = self._scalar_list("SELECT id FROM employee_staff ORDER BY id LIMIT 1")
+        if not deliveries:
+            return {}
+        staff_id = staff[0] if staff else None
+
+        def run(i):
+            self._rolled_back(lambda: db.call(
+                "sp_update_delivery_status",
+                [deliveries[i % len(deliveries)], "ready", staff_id, None, "benchmark"],
+            ))
+        return {"status_update": run}
+
+    def _bench_import(self):
+        def records(i):
+            return [
+                {"vehicle_type": "van", "plate_number": f"BENCH-{i}-{n}", "capacity": 1500, "brand": "Ford",
+                 "model": "Transit", "year": 2024, "fuel_type": "diesel"}
+                for n in range(self.import_rows)
+            ]
+        payloads = [json.dumps(records(i)) for i in range(4)]
+
+        def run(i):
+            self._rolled_back(lambda: db.call("sp_import_vehicles", [payloads[i % len(payloads)]]))
+            return self.import_rows
+        return {"import_vehicles": run}
+
+    def _bench_export(self):
+        sql = f"SELECT * FROM v_deliveries_export LIMIT {int(self.export_rows)}"
+
+        def run(i):
+            return sum(1 for _ in db.stream(sql))
+        # Exports are long; a handful of runs is enough
+        return {"export_deliveries": (run, max(3, self.iterations // 50))}
+
+    def _bench_dashboard(self):
+        benches = {}
+        for role in ("admin", "driver", "client"):
+            user_id = self._user_of_role(role)
+            if user_id is not None:
+                # Straight to the DB: dashboard.get_stats() would hit the cache
+                def run(i, user_id=user_id, role=role):
+                    db.fetch_value("dashboard_stats_json", [user_id, role])
+                benches[f"dashboard_stats_{role}"] = run
+        benches["dashboard_series_90d"] = lambda i: len(dashboard.get_daily_series(90))
+        return benches
+
+    # ----------------------------------------------------------
+    #  Run
+    # ----------------------------------------------------------
+
+    def _environment(self):
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT version()")
+            version = cursor.fetchone()[0]
+        try:
+            commit = subprocess.run(
+                ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+                cwd=settings.BASE_DIR,
+            ).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            commit = None
+        counts = {
+            table: self._count(table)
+            for table in ("delivery", "delivery_tracking", "invoice", "invoice_item", "route", "vehicle")
+        }
+        return {
+            "git_commit": commit,
+            "postgres": version,
+            "db_conn_mode": settings.DB_CONN_MODE,
+            "replica": "replica" in settings.DATABASES,
+            "row_counts": counts,
+        }
+
+    def handle(self, *args, **options):
+        self.rng = random.Random(options["seed"])
+        self.iterations = options["iterations"]
+        self.warmup = options["warmup"]
+        self.import_rows = options["import_rows"]
+        self.export_rows = options["export_rows"]
+
+        benches = {}
+        for group in (self._bench_list_pages, self._bench_tracking, self._bench_status_update,
+                      self._bench_import, self._bench_export, self._bench_dashboard):
+            benches.update(group())
+        if options["only"]:
+            benches = {name: b for name, b in benches.items() if name.startswith(tuple(options["only"]))}
+        if not benches:
+            raise CommandError("Nothing to benchmark (is the database empty?)")
+
+        started_at = datetime.now(timezone.utc)
+        self.stdout.write(f"Benchmarking {len(benches)} paths, {self.iterations} iterations each:")
+        results = {}
+        for name, bench in benches.items():
+            run, iterations = bench if isinstance(bench, tuple) else (bench, self.iterations)
+            results[name] = self._measure(name, run, iterations)
+
+        report = {
+            "started_at": started_at.isoformat(),
+            "environment": self._environment(),
+            "options": {k: options[k] for k in ("iterations", "warmup", "import_rows", "export_rows", "seed")},
+            "results": results,
+        }
+        output = Path(options["output"] or settings.BASE_DIR / "bench_results" / f"bench_{started_at:%Y%m%d_%H%M%S}.json")
+        output.parent.mkdir(parents=True, exist_ok=True)
+        output.write_text(json.dumps(report, indent=2), encoding="utf-8")
+        self.stdout.write(self.style.SUCCESS(f"Results saved to {output}"))
+
+        if options["baseline"]:
+            self._compare(json.loads(Path(options["baseline"]).read_text(encoding="utf-8")), results)
+
+    def _compare(self, baseline, results):
+        self.stdout.write(f"Compared with {baseline.get('environment', {}).get('git_commit')} "
+                          f"({baseline.get('started_at')}):")
+        for name, result in results.items():
+            before = baseline.get("results", {}).get(name)
+            if not before:
+                self.stdout.write(f"  {name:<28} (new)")
+                continue
+            ratio = before["p50_ms"] / result["p50_ms"] if result["p50_ms"] else float("inf")
+            style = self.style.SUCCESS if ratio >= 1 else self.style.WARNING
+            self.stdout.write(style(
+                f"  {name:<28} p50 {before['p50_ms']:9.3f} -> {result['p50_ms']:9.3f} ms  ({ratio:.2f}x)"
+            ))
@@ -0,0 +1,318 @@
+import random
+import time
+from datetime import date, datetime, time as dtime, timedelta, timezone
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DatabaseError, connection, transaction
+
+from ... import db
+
+# Delivery lifecycle, as enforced by trg_delivery_status_workflow
+FLOW = ("registered", "ready", "pending", "in_transit", "completed")
+FINAL_STATUS_WEIGHTS = {
+    "completed": 60, "in_transit": 10, "pending": 8, "ready": 6, "registered": 6, "cancelled": 10,
+}
+
+FIRST_NAMES = ("Ana", "Bruno", "Carlos", "Diana", "Eduardo", "Filipa", "Gabriel", "Helena", "Inês", "João",
+               "Luís", "Marta", "Nuno", "Olga", "Pedro", "Rita", "Sofia", "Tiago", "Vasco", "Zé")
+LAST_NAMES = ("Silva", "Santos", "Ferreira", "Costa", "Lopes", "Mendes", "Rodrigues", "Pereira", "Oliveira",
+              "Martins", "Sousa", "Gomes", "Carvalho", "Almeida", "Ribeiro", "Pinto")
+CITIES = ("Lisboa", "Porto", "Coimbra", "Braga", "Faro", "Aveiro", "Évora", "Setúbal", "Viseu", "Leiria")
+STREETS = ("Rua das Flores", "Av. da Liberdade", "Rua do Carmo", "Rua Augusta", "Praça do Comércio",
+           "Rua de Santa Catarina", "Rua do Ouro", "Av. da República", "Rua Direita")
+VEHICLES = {
+    "van": (("Mercedes-Benz", "Sprinter 314"), ("Renault", "Master"), ("Ford", "Transit")),
+    "truck": (("Volvo", "FH 460"), ("MAN", "TGL"), ("Iveco", "Eurocargo")),
+    "motorcycle": (("Honda", "PCX 125"), ("Yamaha", "NMAX")),
+    "car": (("Renault", "Kangoo"), ("Citroën", "Berlingo")),
+    "bicycle": (("Decathlon", "Cargo 500"),),
+}
+ITEM_TYPES = ("letter", "package", "parcel", "document", "fragile")
+SHIPMENT_TYPES = ("letter", "package", "parcel", "pallet")
+DELIVERY_SPEEDS = ("standard", "express", "same_day")
+
+DELIVERY_COLUMNS = (
+    "id", "driver_id", "route_id", "inv_id", "client_id", "war_id", "tracking_number", "description",
+    "sender_name", "sender_address", "sender_phone", "sender_email", "recipient_name",
+    "recipient_address", "recipient_phone", "recipient_email", "item_type", "weight", "dimensions",
+    "status", "priority", "in_transition", "delivery_date", "created_at", "updated_at",
+)
+TRACKING_COLUMNS = ("id", "staff_id", "war_id", "del_id", "status", "notes", "created_at")
+
+
+class Command(BaseCommand):
+    help = (
+        "Loads a large, referentially valid synthetic data set (users, clients, employees, warehouses, "
+        "vehicles, routes, invoices with items, deliveries with tracking histories) with COPY. "
+        "Row triggers are disabled during the load (needs a superuser, e.g. postgres); the dashboard "
+        "counters, daily rollups and mv_invoice_totals are rebuilt at the end. Generated users log in "
+        "with the password 'testpass123'. The same --seed always produces the same data."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--deliveries", type=int, default=1_000_000)
+        parser.add_argument("--invoices", type=int, default=300_000)
+        parser.add_argument("--clients", type=int, default=20_000)
+        parser.add_argument("--drivers", type=int, default=300)
+        parser.add_argument("--staff", type=int, default=150)
+        parser.add_argument("--warehouses", type=int, default=25)
+        parser.add_argument("--vehicles", type=int, default=400)
+        parser.add_argument("--routes", type=int, default=50_000)
+        parser.add_argument("--days", type=int, default=365, help="History spread over this many days.")
+        parser.add_argument("--seed", type=int, default=42)
+        parser.add_argument("--batch-size", type=int, default=50_000, help="Rows per COPY round trip.")
+
+    # ----------------------------------------------------------
+    #  COPY helpers
+    # ----------------------------------------------------------
+
+    def _load_table(self, cursor, table, columns, rows):
+        started = time.perf_counter()
+        self._report(table, db.copy_rows(cursor, table, columns, rows, self.batch_size), started)
+
+    def _report(self, table, count, started):
+        self.stdout.write(f"  {table:<18} {count:>10} rows  {time.perf_counter() - started:7.1f}s")
+
+    def _max_id(self, cursor, table):
+        cursor.execute(f"SELECT COALESCE(MAX(id), 0) FROM {table}")
+        return cursor.fetchone()[0]
+
+    # ----------------------------------------------------------
+    #  Fake values
+    # ----------------------------------------------------------
+
+    def _when(self):
+        """A timestamp within the last --days days."""
+        return self.until - timedelta(seconds=self.rng.randrange(self.days * 86400))
+
+    def _person(self):
+        return self.rng.choice(FIRST_NAMES), self.rng.choice(LAST_NAMES)
+
+    def _address(self):
+        return f"{self.rng.choice(STREETS)} {self.rng.randint(1, 300)}, {self.rng.choice(CITIES)}"
+
+    def _phone(self, prefix="9"):
+        return f"{prefix}{self.rng.randrange(10**8):08d}"
+
+    # ----------------------------------------------------------
+    #  Tables
+    # ----------------------------------------------------------
+
+    def _users(self, cursor, first_id, counts):
+        password = make_password("testpass123")
+        columns = ("id", "password", "username", "first_name", "last_name", "email", "is_superuser",
+                   "is_staff", "is_active", "created_at", "contact", "address", "role", "updated_at")
+
+        def rows():
+            user_id = first_id
+            for role, count in counts:
+                for _ in range(count):
+                    first, last = self._person()
+                    created = self._when()
+                    username = f"gen.{role}.{user_id}"
+                    yield (user_id, password, username, first, last, f"{username}@example.com", False,
+                           role == "staff", True, created, self._phone(), self._address(), role, created)
+                    user_id += 1
+
+        self._load_table(cursor, '"USER"', columns, rows())
+
+    def handle(self, *args, **options):
+        self.rng = random.Random(options["seed"])
+        self.days = options["days"]
+        self.batch_size = options["batch_size"]
+        self.until = datetime.combine(date.today(), dtime(0), tzinfo=timezone.utc)
+        started = time.perf_counter()
+
+        try:
+            with transaction.atomic(), connection.cursor() as cursor:
+                # Skip triggers (including FK checks: the ids are valid by
+                # construction). Totals are computed here and the
+                # counters/rollups are rebuilt once at the end. Needs a superuser
+                cursor.execute("SET LOCAL session_replication_role = replica")
+                self._load(cursor, options)
+                # Inside an outer transaction (tests, call_command) atomic() is only
+                # a savepoint and SET LOCAL would outlive it: turn the triggers back on
+                cursor.execute("SET LOCAL session_replication_role = DEFAULT")
+        except DatabaseError as e:
+            raise CommandError(f"Data generation failed (nothing was loaded): {e}")
+
+        self.stdout.write(self.style.SUCCESS(f"Done in {time.perf_counter() - started:.1f}s"))
+
+    def _load(self, cursor, options):
+        rng = self.rng
+
+        # --- ids continue after whatever is already there ------------
+        user0 = self._max_id(cursor, '"USER"') + 1
+        clients = range(user0, user0 + options["clients"])
+        drivers = range(clients.stop, clients.stop + options["drivers"])
+        staff = range(drivers.stop, drivers.stop + options["staff"])
+        war0 = self._max_id(cursor, "warehouse") + 1
+        warehouses = range(war0, war0 + options["warehouses"])
+        veh0 = self._max_id(cursor, "vehicle") + 1
+        vehicles = range(veh0, veh0 + options["vehicles"])
+        route0 = self._max_id(cursor, "route") + 1
+        inv0 = self._max_id(cursor, "invoice") + 1
+        item0 = self._max_id(cursor, "invoice_item") + 1
+        del0 = self._max_id(cursor, "delivery") + 1
+        track0 = self._max_id(cursor, "delivery_tracking") + 1
+
+        self.stdout.write("Loading:")
+        self._users(cursor, user0, [
+            ("client", options["clients"]), ("driver", options["drivers"]), ("staff", options["staff"]),
+        ])
+        self._load_table(cursor, "client", ("id", "tax_id"), (
+            (cid, f"PT{rng.randrange(10**9):09d}") for cid in clients
+        ))
+
+        self._load_table(cursor, "warehouse", (
+            "id", "name", "contact", "address", "schedule_open", "schedule_close", "schedule",
+            "maximum_storage_capacity", "is_active", "created_at", "updated_at",
+        ), (
+            (wid, f"Armazém {rng.choice(CITIES)} {wid}", self._phone("2"), self._address(),
+             "07:00", "20:00", "Mon-Sat", rng.randrange(1000, 10000), True, self.until, self.until)
+            for wid in warehouses
+        ))
+
+        # Each employee works at one warehouse
+        home = {eid: rng.choice(warehouses) for eid in (*drivers, *staff)}
+        self._load_table(cursor, "employee", (
+            "id", "war_id", "emp_position", "schedule", "wage", "is_active", "hire_date",
+        ), (
+            (eid, home[eid], "driver" if eid in drivers else "staff", "08:00-17:00 Mon-Fri",
+             f"{rng.uniform(1000, 2000):.2f}", True, (self._when() - timedelta(days=365)).date())
+            for eid in (*drivers, *staff)
+        ))
+        self._load_table(cursor, "employee_driver", (
+            "id", "license_number", "license_category", "license_expiry_date",
+            "driving_experience_years", "driver_status",
+        ), (
+            (eid, f"DL-{eid:08d}", rng.choice("BCD"), self.until.date() + timedelta(days=rng.randrange(30, 2000)),
+             rng.randrange(1, 30), rng.choice(("available", "on_duty", "off_duty")))
+            for eid in drivers
+        ))
+        self._load_table(cursor, "employee_staff", ("id", "department"), (
+            (eid, rng.choice(("customer_service", "sorting", "administration"))) for eid in staff
+        ))
+
+        def vehicle_rows():
+            for vid in vehicles:
+                kind = rng.choice(tuple(VEHICLES))
+                brand, model = rng.choice(VEHICLES[kind])
+                yield (vid, kind, f"{vid:06d}-GEN", f"{rng.uniform(50, 8000):.2f}", brand, model,
+                       rng.choice(("available", "in_use", "maintenance")), rng.randrange(2010, 2026),
+                       "electric" if kind == "bicycle" else rng.choice(("diesel", "petrol", "electric", "hybrid")),
+                       self._when().date(), True, self.until, self.until)
+
+        self._load_table(cursor, "vehicle", (
+            "id", "vehicle_type", "plate_number", "capacity", "brand", "model", "vehicle_status",
+            "year", "fuel_type", "last_maintenance_date", "is_active", "created_at", "updated_at",
+        ), vehicle_rows())
+
+        # Routes: one driver, vehicle and (the driver's) warehouse each
+        routes = []
+
+        def route_rows():
+            for rid in range(route0, route0 + options["routes"]):
+                driver = rng.choice(drivers)
+                day = self._when()
+                start = day.replace(hour=8) + timedelta(minutes=rng.randrange(120))
+                status = "finished" if day < self.until - timedelta(days=1) else rng.choice(("not_started", "on_going"))
+                end = start + timedelta(minutes=rng.randrange(60, 600)) if status == "finished" else None
+                routes.append((rid, driver, home[driver]))
+                yield (rid, driver, rng.choice(vehicles), home[driver], f"Route {rid}", status, day.date(),
+                       start if status != "not_started" else None, end, "06:00:00",
+                       f"{rng.uniform(5, 400):.2f}" if end else None, None, True, day, day)
+
+        self._load_table(cursor, "route", (
+            "id", "driver_id", "vehicle_id", "war_id", "description", "delivery_status", "delivery_date",
+            "delivery_start_time", "delivery_end_time", "expected_duration", "kms_travelled",
+            "driver_notes", "is_active", "created_at", "updated_at",
+        ), route_rows())
+
+        # Invoices and their items; cost/quantity are the sums of the items
+        invoices = []
+        items = []
+        inv_rows = []
+        item_id = item0
+        for inv_id in range(inv0, inv0 + options["invoices"]):
+            client = rng.choice(clients)
+            war = rng.choice(warehouses)
+            created = self._when()
+            cost = 0
+            quantity = 0
+            for _ in range(rng.randint(1, 4)):
+                qty = rng.randint(1, 5)
+                price = rng.randrange(150, 5000)  # cents
+                items.append((item_id, inv_id, rng.choice(SHIPMENT_TYPES), f"{rng.uniform(0.1, 30):.2f}",
+                              rng.choice(DELIVERY_SPEEDS), qty, f"{price / 100:.2f}", f"{qty * price / 100:.2f}",
+                              None, created, created))
+                item_id += 1
+                cost += qty * price
+                quantity += qty
+            first, last = self._person()
+            status = rng.choices(("completed", "pending", "cancelled", "refunded"), (80, 15, 4, 1))[0]
+            inv_rows.append((inv_id, war, rng.choice(staff), client, status,
+                             rng.choice(("paid_on_send", "paid_on_delivery")), quantity, f"{cost / 100:.2f}",
+                             status == "completed", rng.choice(("cash", "card", "mobile_payment", "account")),
+                             f"{first} {last}", self._address(), self._phone(), created, created))
+            invoices.append((inv_id, client, war, created))
+
+        self._load_table(cursor, "invoice", (
+            "id", "war_id", "staff_id", "client_id", "status", "type", "quantity", "cost", "paid",
+            "pay_method", "name", "address", "contact", "created_at", "updated_at",
+        ), inv_rows)
+        del inv_rows
+        self._load_table(cursor, "invoice_item", (
+            "id", "inv_id", "shipment_type", "weight", "delivery_speed", "quantity", "unit_price",
+            "total_item_cost", "notes", "created_at", "updated_at",
+        ), items)
+        del items
+
+        # Deliveries with a tracking event per status they went through,
+        # generated and copied one batch at a time
+        statuses = tuple(FINAL_STATUS_WEIGHTS)
+        weights = tuple(FINAL_STATUS_WEIGHTS.values())
+        delivered = tracked = 0
+        track_id = track0
+        started = time.perf_counter()
+        for batch_start in range(del0, del0 + options["deliveries"], self.batch_size):
+            deliveries = []
+            events = []
+            for del_id in range(batch_start, min(batch_start + self.batch_size, del0 + options["deliveries"])):
+                inv_id, client, war, created = rng.choice(invoices)
+                route_id, driver, _ = rng.choice(routes)
+                status = rng.choices(statuses, weights)[0]
+                if status == "cancelled":
+                    steps = FLOW[:rng.randint(1, 4)] + ("cancelled",)
+                else:
+                    steps = FLOW[:FLOW.index(status) + 1]
+                when = created
+                for step in steps:
+                    events.append((track_id, rng.choice(staff), war, del_id, step, None, when))
+                    track_id += 1
+                    when += timedelta(hours=rng.randint(1, 36))
+                deliveries.append((
+                    del_id, driver, route_id, inv_id, client, war, f"PO-{created:%Y%m%d}-{del_id:07d}", None,
+                    " ".join(self._person()), self._address(), self._phone(), None,
+                    " ".join(self._person()), self._address(), self._phone(), None,
+                    rng.choice(ITEM_TYPES), rng.randint(1, 30000),
+                    f"{rng.randint(5, 80)}x{rng.randint(5, 80)}x{rng.randint(1, 60)}",
+                    status, "urgent" if rng.random() < 0.1 else "normal", status == "in_transit",
+                    when, created, when,
+                ))
+            delivered += db.copy_rows(cursor, "delivery", DELIVERY_COLUMNS, deliveries, self.batch_size)
+            tracked += db.copy_rows(cursor, "delivery_tracking", TRACKING_COLUMNS, events, self.batch_size)
+        self._report("delivery", delivered, started)
+        self._report("delivery_tracking", tracked, started)
+
+        self.stdout.write("Rebuilding sequences, counters, rollups and mv_invoice_totals...")
+        for table in ('"USER"', "warehouse", "vehicle", "route", "invoice", "invoice_item",
+                      "delivery", "delivery_tracking"):
+            cursor.execute(
+                f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), (SELECT MAX(id) FROM {table}))"
+            )
+        cursor.execute("CALL sp_rebuild_dashboard_counters()")
+        cursor.execute("CALL sp_backfill_daily_rollups(NULL)")
+        cursor.execute("CALL sp_refresh_materialized_view('mv_invoice_totals')")
+        cursor.execute("ANALYZE")
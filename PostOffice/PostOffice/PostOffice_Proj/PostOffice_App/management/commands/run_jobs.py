@@ -0,0 +1,39 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from ... import jobs
+
+
+class Command(BaseCommand):
+    help = "Background job worker: runs queued imports/exports from the background_job table."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--once", action="store_true", help="Run the queued jobs, then exit.")
+        parser.add_argument(
+            "--poll-interval",
+            type=float,
+            default=settings.JOB_POLL_INTERVAL,
+            help="Seconds to sleep when the queue is empty.",
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write("Job worker started")
+        jobs.requeue_stale_jobs()
+
+        try:
+            while True:
+                # Drop connections that died or outlived CONN_MAX_AGE between jobs
+                close_old_connections()
+                if jobs.run_next():
+                    continue
+                if options["once"]:
+                    break
+                time.sleep(options["poll_interval"])
+                jobs.requeue_stale_jobs()
+        except KeyboardInterrupt:
+            pass
+
+        self.stdout.write("Job worker stopped")
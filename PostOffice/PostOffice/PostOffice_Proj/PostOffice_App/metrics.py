@@ -0,0 +1,288 @@
+import bisect
+import threading
+import weakref
+
+from django.conf import settings
+
+# ==========================================================
+#  IN-PROCESS METRICS (Prometheus text format, /metrics)
+# ==========================================================
+# No client library and no push gateway: every thread writes to its own
+# shard (a plain dict), so recording a value takes no lock. A scrape sums
+# the shards of the live threads plus a base shard into which the shard of
+# every finished thread is folded, so totals never go backwards and the
+# number of shards stays bounded by the live threads. Each process (e.g.
+# each gunicorn worker) reports its own series; Prometheus sums them
+# across targets.
+#
+# Label values are bounded per metric: once `max_series` label sets have
+# been seen, new ones are reported as "other".
+#
+# Values owned by the database (job throughput, materialized view refresh
+# durations) and the notification backlog in MongoDB are read at scrape
+# time by the collectors at the bottom of this file, so they are the same
+# whichever process serves the scrape.
+
+OTHER = "other"
+
+# Seconds; covers fast lookups up to slow exports
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+_local = threading.local()
+_shards = []
+# What finished threads recorded
+_base = {}
+# Reentrant: a thread's shard may be folded by a GC run inside a locked section
+_shards_lock = threading.RLock()
+
+# name -> metric, in registration order
+REGISTRY = {}
+# Scrape-time callables, see collector()
+COLLECTORS = []
+
+
+class _ShardOwner:
+    """Held only by the thread-local: collected when its thread ends."""
+
+    def __init__(self, shard):
+        self.shard = shard
+
+
+def _fold(shard):
+    """Moves a finished thread's shard into _base."""
+    with _shards_lock:
+        _shards.remove(shard)
+        for (name, values), state in shard.items():
+            key = name, values
+            merged = {values: _base[key]} if key in _base else {}
+            REGISTRY[name]._merge(merged, values, state)
+            _base[key] = merged[values]
+
+
+def _shard():
+    owner = getattr(_local, "owner", None)
+    if owner is None:
+        shard = {}
+        owner = _local.owner = _ShardOwner(shard)
+        with _shards_lock:
+            _shards.append(shard)
+        weakref.finalize(owner, _fold, shard)
+    return owner.shard
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, help, labelnames=(), max_series=100):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.max_series = max_series
+        self._series = set()
+        self._series_lock = threading.Lock()
+        REGISTRY[name] = self
+
+    def _key(self, labels):
+        values = tuple(str(labels[name]) for name in self.labelnames)
+        if values in self._series:
+            return self.name, values
+        # New label set: the only path that takes a lock
+        with self._series_lock:
+            if len(self._series) >= self.max_series:
+                values = (OTHER,) * len(self.labelnames)
+            self._series.add(values)
+        return self.name, values
+
+    def _merged(self):
+        merged = {}
+        # Holding the lock, a shard cannot be folded into _base mid-scrape
+        with _shards_lock:
+            for shard in [_base] + _shards:
+                for (name, values), value in list(shard.items()):
+                    if name == self.name:
+                        self._merge(merged, values, value)
+        return merged
+
+    def _labels(self, values, extra=()):
+        pairs = list(zip(self.labelnames, values)) + list(extra)
+        if not pairs:
+            return ""
+        return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help, labelnames=(), max_series=100, buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help, labelnames, max_series)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, **labels):
+        shard = _shard()
+        key = self._key(labels)
+        state = shard.get(key)
+        if state is None:
+            # Per-bucket counts (+Inf last), then sum
+            state = shard[key] = [0] * (len(self.buckets) + 1) + [0.0]
+        state[bisect.bisect_left(self.buckets, value)] += 1
+        state[-1] += value
+
+    def _merge(self, merged, values, state):
+        total = merged.setdefault(values, [0] * len(state[:-1]) + [0.0])
+        for i, value in enumerate(state):
+            total[i] += value
+
+    def render(self):
+        lines = []
+        for values, state in sorted(self._merged().items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + ("+Inf",), state[:-1]):
+                cumulative += count
+                le = bound if bound == "+Inf" else _number(bound)
+                lines.append(f"{self.name}_bucket{self._labels(values, [('le', le)])} {cumulative}")
+            lines.append(f"{self.name}_sum{self._labels(values)} {_number(state[-1])}")
+            lines.append(f"{self.name}_count{self._labels(values)} {cumulative}")
+        return lines
+
+
+def collector(func):
+    """
+    Registers a function called at scrape time. It returns metric families:
+    [(name, help, type, [(labels dict, value)])]
+    """
+    COLLECTORS.append(func)
+    return func
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def _family(name, help, kind, samples):
+    lines = [f"# HELP {name} {help}", f"# TYPE {name} {kind}"]
+    for labels, value in samples:
+        pairs = ",".join(f'{k}="{_escape(v)}"' for k, v in labels.items())
+        lines.append(f"{name}{{{pairs}}} {_number(value)}" if pairs else f"{name} {_number(value)}")
+    return lines
+
+
+def render():
+    """
+    All metrics in the Prometheus text exposition format (version 0.0.4).
+    """
+    lines = []
+    for metric in REGISTRY.values():
+        lines.append(f"# HELP {metric.name} {metric.help}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        lines.extend(metric.render())
+
+    status = []
+    for func in COLLECTORS:
+        try:
+            families = func()
+        except Exception:
+            # A backend being down must not break the whole scrape
+            families = []
+            status.append(({"collector": func.__name__.lstrip("_")}, 0))
+        else:
+            status.append(({"collector": func.__name__.lstrip("_")}, 1))
+        for family in families:
+            lines.extend(_family(*family))
+
+    lines.extend(_family("po_collector_up", "Whether the scrape-time collector succeeded", "gauge", status))
+    return "\n".join(lines) + "\n"
+
+
+# ==========================================================
+#  APPLICATION METRICS
+# ==========================================================
+
+HTTP_METHODS = {"GET", "HEAD", "POST", "PUT", "PATCH", "DELETE", "OPTIONS"}
+
+request_duration = Histogram(
+    "po_http_request_duration_seconds",
+    "Request latency by URL name (urls.py)",
+    ("view", "method", "status"),
+    max_series=300,
+)
+
+db_call_duration = Histogram(
+    "po_db_call_duration_seconds",
+    "Duration of each DB statement by sp_/fn_/v_ object and alias",
+    ("object", "alias"),
+    max_series=300,
+)
+
+mongo_write_duration = Histogram(
+    "po_mongo_write_duration_seconds",
+    "MongoDB notification write latency",
+    ("outcome",),
+    max_series=2,
+)
+
+
+def observe_request(request, response, seconds):
+    match = request.resolver_match
+    view = (match.url_name or "unnamed") if match else "unmatched"
+    method = request.method if request.method in HTTP_METHODS else OTHER
+    request_duration.observe(seconds, view=view, method=method, status=f"{response.status_code // 100}xx")
+
+
+# ==========================================================
+#  SCRAPE-TIME COLLECTORS (database / MongoDB)
+# ==========================================================
+
+@collector
+def _jobs():
+    from . import db
+
+    with db.read_connection().cursor() as cursor:
+        cursor.execute(
+            "SELECT kind, status, COUNT(*), COALESCE(SUM((result->>'rows')::BIGINT), 0) "
+            "FROM background_job GROUP BY kind, status ORDER BY kind, status"
+        )
+        rows = cursor.fetchall()
+    return [
+        ("po_jobs_total", "Background jobs by kind and status", "counter",
+         [({"kind": kind, "status": status}, count) for kind, status, count, _ in rows]),
+        ("po_job_rows_total", "Rows imported/exported by finished jobs", "counter",
+         [({"kind": kind}, total) for kind, status, _, total in rows if status == "done"]),
+    ]
+
+
+@collector
+def _mv_refresh():
+    from . import db
+
+    with db.read_connection().cursor() as cursor:
+        cursor.execute(
+            "SELECT mv_name, refreshes, total_seconds, last_seconds, max_seconds "
+            "FROM mv_refresh_stats ORDER BY mv_name"
+        )
+        rows = cursor.fetchall()
+    return [
+        ("po_mv_refreshes_total", "Refreshes of each materialized view", "counter",
+         [({"view": name}, count) for name, count, _, _, _ in rows]),
+        ("po_mv_refresh_seconds_total", "Time spent refreshing each materialized view", "counter",
+         [({"view": name}, total) for name, _, total, _, _ in rows]),
+        ("po_mv_refresh_last_seconds", "Duration of the last refresh of each materialized view", "gauge",
+         [({"view": name}, last) for name, _, _, last, _ in rows]),
+        ("po_mv_refresh_max_seconds", "Slowest refresh of each materialized view", "gauge",
+         [({"view": name}, longest) for name, _, _, _, longest in rows]),
+    ]
+
+
+@collector
+def _notification_outbox():
+    from .notifications import notifications_collection
+
+    depth = notifications_collection().count_documents(
+        {"status": "pending"}, maxTimeMS=settings.METRICS_MONGO_TIMEOUT_MS,
+    )
+    return [
+        ("po_notification_outbox_depth", "Notifications still pending in MongoDB", "gauge", [({}, depth)]),
+    ]
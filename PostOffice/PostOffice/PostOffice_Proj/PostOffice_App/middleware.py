@@ -0,0 +1,111 @@
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+
+from . import instrumentation, metrics, profiler, routers
+
+PIN_COOKIE = "db_primary_pin"
+
+
+class ReplicaPinMiddleware:
+    """
+    Starts every request with a clean read-your-writes flag. A request that
+    wrote sets a short-lived cookie, so the user's following requests also
+    read from the primary until the replica has caught up.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        token = routers.reset(pinned=PIN_COOKIE in request.COOKIES)
+        try:
+            response = self.get_response(request)
+            if routers.has_written():
+                response.set_cookie(
+                    PIN_COOKIE, "1",
+                    max_age=settings.DB_REPLICA_PIN_SECONDS,
+                    httponly=True, samesite="Lax",
+                )
+            return response
+        finally:
+            routers.restore(token)
+
+
+class QueryTimingMiddleware:
+    """
+    Records every DB call of the request (see instrumentation.py) and
+    reports it as a Server-Timing header and a structured log line.
+    Calls slower than DB_SLOW_CALL_MS are logged, reads with their query
+    plan (taken in the background).
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        calls, token = instrumentation.start()
+        started = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for alias in settings.DATABASES:
+                    stack.enter_context(connections[alias].execute_wrapper(instrumentation.record))
+                response = self.get_response(request)
+        finally:
+            instrumentation.stop(token)
+        total_ms = (time.perf_counter() - started) * 1000
+
+        if not calls:
+            return response
+
+        summary = instrumentation.summarize(calls)
+        if settings.DB_SERVER_TIMING:
+            response["Server-Timing"] = instrumentation.server_timing(
+                summary, settings.DB_SERVER_TIMING_LIMIT,
+            )
+        instrumentation.log_request(request, response.status_code, total_ms, summary)
+        for call in calls:
+            if call.ms >= settings.DB_SLOW_CALL_MS:
+                instrumentation.log_slow_call(request, call)
+        return response
+
+
+class MetricsMiddleware:
+    """
+    Observes every request's latency in po_http_request_duration_seconds,
+    labelled with its URL name from urls.py (see metrics.py).
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        started = time.perf_counter()
+        response = self.get_response(request)
+        metrics.observe_request(request, response, time.perf_counter() - started)
+        return response
+
+
+class ProfilerMiddleware:
+    """
+    Runs requests carrying a signed profiling token under the sampling
+    profiler (see profiler.py). Must come after QueryTimingMiddleware, whose
+    recorded DB calls are stored with the capture, and after
+    AuthenticationMiddleware: the token only counts in its admin's session.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        token = profiler.request_token(request)
+        if token is None:
+            return self.get_response(request)
+
+        user_id = profiler.authorized_user_id(request, token)
+        if user_id is None:
+            # Invalid, expired or someone else's: served as a normal request
+            return self.get_response(request)
+        return profiler.profile(request, self.get_response, user_id)
@@ -1,16 +1,28 @@
+import functools
+import time
+
+from django.conf import settings
 from django.utils import timezone
-from pymongo import MongoClient
-from bson import ObjectId
 from datetime import timedelta
 
+from . import metrics
+
 # ==========================================================
 #  MONGO: NOTIFICATIONS ONLY - CENTRALIZED CONNECTION
 # ==========================================================
+# The client is created on first use, not on import: only processes that
+# actually read or write notifications load pymongo, and a client is never
+# inherited across a fork (gunicorn --preload).
 
-# Access the 'notifications' collection within the database
-mongo_client = MongoClient("mongodb://localhost:27017")
-mongo_db = mongo_client["postoffice"]
-notifications_collection = mongo_db["notifications"]
+
+@functools.cache
+def notifications_collection():
+    """
+    The 'notifications' collection; one MongoClient per process.
+    """
+    from pymongo import MongoClient
+
+    return MongoClient(settings.MONGO_URL)[settings.MONGO_DB_NAME]["notifications"]
 
 
 def create_notification(notification_type, recipient_contact, subject, message, status="pending"):
@@ -27,9 +39,10 @@ def create_notification(notification_type, recipient_contact, subject, message,
     Returns:
         None - Silently fails if MongoDB is unavailable
     """
+    started = time.perf_counter()
     try:
         # Insert a new notification document into MongoDB
-        notifications_collection.insert_one({
+        notifications_collection().insert_one({
             "notification_type": notification_type,  # Category of notification
             "recipient_contact": recipient_contact,   # User's email to match against
             "subject": subject,                       # Notification title
@@ -41,7 +54,9 @@ def create_notification(notification_type, recipient_contact, subject, message,
     except Exception:
         # Silently fail to avoid breaking the main application flow
         # In production, you might want to log this error
-        pass
+        metrics.mongo_write_duration.observe(time.perf_counter() - started, outcome="error")
+    else:
+        metrics.mongo_write_duration.observe(time.perf_counter() - started, outcome="ok")
 
 
 def get_user_notifications(user_email, max_age_minutes=3):
@@ -61,7 +76,7 @@ def get_user_notifications(user_email, max_age_minutes=3):
 
     # Query MongoDB for ALL notifications matching the user's email AND created after cutoff
     notifs = list(
-        notifications_collection.find({
+        notifications_collection().find({
             "recipient_contact": user_email,
             "created_at": {"$gte": cutoff_time}  # Only get notifications newer than cutoff
         })
@@ -89,9 +104,11 @@ def mark_as_read(notif_id):
     Returns:
         bool: True if notification was successfully marked as read, False otherwise
     """
+    from bson import ObjectId
+
     try:
         # Update the notification document, setting is_read to True
-        result = notifications_collection.update_one(
+        result = notifications_collection().update_one(
             {"_id": ObjectId(notif_id)},  # Find notification by ObjectId
             {"$set": {"is_read": True}}    # Set is_read field to True
         )
@@ -0,0 +1,139 @@
+import hashlib
+import os
+import uuid
+
+from django.conf import settings
+
+# ==========================================================
+#  RENDERED INVOICE PDF CACHE (local disk, LRU)
+# ==========================================================
+# Entries are stored as <invoice_id>/<digest>.pdf. The digest covers the
+# invoice header and every item, including their updated_at columns.
+# sp_update_invoice bumps invoice.updated_at, and sp_add_invoice_item does
+# the same through trg_invoice_update_cost, so an edited invoice gets a
+# new key and the old entry is never served again. Storing an entry only
+# lists its own invoice's directory to drop the older versions.
+#
+# The file mtime is the LRU clock: hits touch the file, and eviction
+# removes the oldest files until the cache fits the size budget. Eviction
+# scans the whole cache, so it only runs when the running size total
+# (the last scan plus what this process stored since) passes the budget.
+
+ITEM_FIELDS = ("id", "shipment_type", "weight", "delivery_speed", "quantity", "unit_price", "total_item_cost", "updated_at")
+INVOICE_FIELDS = ("id", "status", "name", "address", "contact", "cost", "updated_at")
+
+# Bytes in the cache at the last scan plus this process's puts since (None = not scanned)
+_size = None
+
+
+def _cache_dir():
+    path = settings.INVOICE_PDF_CACHE_DIR
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+def cache_key(data):
+    """
+    Content hash of one invoice as returned by pdf_export.fetch_invoices().
+    """
+    digest = hashlib.sha256()
+    invoice = data["invoice"]
+    digest.update(repr([invoice.get(f) for f in INVOICE_FIELDS]).encode())
+    for item in data["items"]:
+        digest.update(repr([item.get(f) for f in ITEM_FIELDS]).encode())
+    return f"{invoice['id']}-{digest.hexdigest()[:32]}"
+
+
+def _path(key):
+    invoice_id, digest = key.split("-", 1)
+    return _cache_dir() / invoice_id / f"{digest}.pdf"
+
+
+def get(data):
+    """
+    Returns the cached PDF bytes for an invoice, or None on a miss.
+    """
+    path = _path(cache_key(data))
+    try:
+        pdf = path.read_bytes()
+    except FileNotFoundError:
+        return None
+    # Mark as recently used
+    os.utime(path)
+    return pdf
+
+
+def put(data, pdf):
+    """
+    Stores a rendered PDF, drops older versions of the same invoice,
+    and evicts least recently used entries once the size budget is passed.
+    """
+    global _size
+
+    key = cache_key(data)
+    path = _path(key)
+    path.parent.mkdir(exist_ok=True)
+    tmp = path.parent / f".{uuid.uuid4().hex}.tmp"
+    tmp.write_bytes(pdf)
+    tmp.replace(path)
+
+    invalidate(data["invoice"]["id"], keep=key)
+    if _size is None:
+        evict()
+        return
+    _size += len(pdf)
+    if _size > settings.INVOICE_PDF_CACHE_MAX_BYTES:
+        evict()
+
+
+def invalidate(invoice_id, keep=None):
+    """
+    Removes every cached PDF of an invoice (except the `keep` key).
+    """
+    keep = keep and _path(keep).name
+    try:
+        entries = list(os.scandir(_cache_dir() / str(invoice_id)))
+    except FileNotFoundError:
+        return
+    for entry in entries:
+        if entry.name.endswith(".pdf") and entry.name != keep:
+            try:
+                os.unlink(entry.path)
+            except FileNotFoundError:
+                pass
+
+
+def evict(max_bytes=None):
+    """
+    Deletes least recently used entries until the cache fits in max_bytes.
+    """
+    global _size
+
+    if max_bytes is None:
+        max_bytes = settings.INVOICE_PDF_CACHE_MAX_BYTES
+
+    entries = []
+    total = 0
+    for directory in os.scandir(_cache_dir()):
+        if not directory.is_dir():
+            continue
+        for entry in os.scandir(directory.path):
+            if entry.name.endswith(".pdf"):
+                stat = entry.stat()
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+                total += stat.st_size
+
+    _size = total
+    if total <= max_bytes:
+        return
+
+    entries.sort()
+    for _, size, path in entries:
+        try:
+            os.unlink(path)
+        except FileNotFoundError:
+            pass
+        total -= size
+        if total <= max_bytes:
+            break
+    _size = total
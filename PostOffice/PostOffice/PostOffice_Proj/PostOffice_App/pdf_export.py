@@ -0,0 +1,228 @@
+import io
+
+from django.conf import settings
+from django.template.loader import get_template
+
+from . import db, pdf_cache
+
+# ==========================================================
+#  INVOICE PDF EXPORT JOBS
+# ==========================================================
+# xhtml2pdf is CPU bound, so a large export is split into chunks of
+# invoices that are rendered in a process pool. The chunks are then
+# merged back into one PDF, or written as one PDF per invoice in a ZIP.
+# Only the invoice ids are read up front: each chunk is fetched and
+# rendered to HTML when it is submitted, at most PDF_EXPORT_MAX_WORKERS * 2
+# chunks are in flight, and each finished chunk goes straight into the
+# output, so memory does not grow with the size of the export.
+#
+# The export runs as an "invoices_pdf" background job (see job_handlers.py).
+# xhtml2pdf, pypdf and the process pool are imported on first use, so web
+# workers that never export do not load them.
+
+MODE_PDF = "pdf"
+MODE_ZIP = "zip"
+
+
+# ==========================================================
+#  DATA (v_invoices_with_items + invoice_item)
+# ==========================================================
+
+def fetch_invoice_ids(client_id=None):
+    """
+    Returns the ids of the invoices to export, newest first.
+
+    Args:
+        client_id (int): Only this client's invoices (None = all)
+    """
+    sql, params = "SELECT id FROM v_invoices_with_items", []
+    if client_id is not None:
+        sql += " WHERE client_id = %s"
+        params.append(client_id)
+    with db.read_connection().cursor() as cursor:
+        cursor.execute(sql, params)
+        return [row[0] for row in cursor.fetchall()]
+
+
+def fetch_invoices(client_id=None, invoice_ids=None):
+    """
+    Returns the invoices to export, newest first, each with its items.
+
+    Args:
+        client_id (int): Only export this client's invoices (None = all)
+        invoice_ids (list): Only export these invoices (None = all)
+
+    Returns:
+        list: [{"invoice": {...}, "items": [...], "subtotal", "tax", "total"}]
+    """
+    where, params = [], []
+    if client_id is not None:
+        where.append("client_id = %s")
+        params.append(client_id)
+    if invoice_ids is not None:
+        where.append("id = ANY(%s)")
+        params.append(list(invoice_ids))
+
+    with db.read_connection().cursor() as cursor:
+        sql = "SELECT * FROM v_invoices_with_items"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        cursor.execute(sql, params)
+        invoices = db.fetch_records(cursor)
+
+        cursor.execute(
+            "SELECT * FROM invoice_item WHERE inv_id = ANY(%s) ORDER BY inv_id, id",
+            [[inv.id for inv in invoices]],
+        )
+        items_by_invoice = {}
+        for item in db.iter_records(cursor):
+            items_by_invoice.setdefault(item.inv_id, []).append(item)
+
+    return [
+        {
+            "invoice": inv,
+            "items": items_by_invoice.get(inv.id, []),
+            "subtotal": inv.subtotal,
+            "tax": inv.tax,
+            "total": inv.total,
+        }
+        for inv in invoices
+    ]
+
+
+def render_html(invoices):
+    return get_template("invoices/pdf_template.html").render({"invoices": invoices})
+
+
+def render_invoice_pdf(data):
+    """
+    Returns the PDF of a single invoice, from the cache when its content
+    has not changed since it was last rendered.
+    """
+    pdf = pdf_cache.get(data)
+    if pdf is None:
+        pdf = render_pdfs([render_html([data])])[0]
+        pdf_cache.put(data, pdf)
+    return pdf
+
+
+# ==========================================================
+#  RENDERING (runs inside the process pool)
+# ==========================================================
+
+def render_pdfs(htmls):
+    """
+    Renders each HTML document to PDF bytes.
+    Runs in a pool worker, so it must stay importable and picklable.
+    """
+    from xhtml2pdf import pisa
+
+    pdfs = []
+    for html in htmls:
+        buffer = io.BytesIO()
+        if pisa.CreatePDF(html, dest=buffer).err:
+            raise RuntimeError("Error generating PDF")
+        pdfs.append(buffer.getvalue())
+    return pdfs
+
+
+def _chunks(seq, size):
+    return [seq[i:i + size] for i in range(0, len(seq), size)]
+
+
+def _pool():
+    import multiprocessing
+    from concurrent.futures import ProcessPoolExecutor
+
+    # "spawn" keeps the web worker's threads and DB socket out of the children
+    return ProcessPoolExecutor(
+        max_workers=settings.PDF_EXPORT_MAX_WORKERS,
+        mp_context=multiprocessing.get_context("spawn"),
+    )
+
+
+# ==========================================================
+#  EXPORT
+# ==========================================================
+
+def _work(client_id, invoice_ids, mode):
+    """
+    Yields (invoices, cached PDFs, HTML documents to render) per chunk.
+    Django templates are rendered here; the workers only run xhtml2pdf.
+    """
+    for chunk_ids in _chunks(invoice_ids, settings.PDF_EXPORT_CHUNK_SIZE):
+        invoices = fetch_invoices(client_id, chunk_ids)
+        if mode == MODE_ZIP:
+            # Per-invoice PDFs come from the cache when possible; only misses are rendered
+            cached = [pdf_cache.get(data) for data in invoices]
+            htmls = [render_html([data]) for data, pdf in zip(invoices, cached) if pdf is None]
+        else:
+            cached, htmls = [None] * len(invoices), [render_html(invoices)]
+        yield invoices, cached, htmls
+
+
+def _rendered(pool, work):
+    """
+    Submits each chunk of `work` to the pool, with a bounded number in
+    flight, and yields (invoices, cached PDFs, rendered PDFs) in order.
+    """
+    from collections import deque
+
+    max_in_flight = settings.PDF_EXPORT_MAX_WORKERS * 2
+    pending = deque()
+    for invoices, cached, htmls in work:
+        pending.append((invoices, cached, pool.submit(render_pdfs, htmls) if htmls else None))
+        while len(pending) >= max_in_flight:
+            invoices, cached, future = pending.popleft()
+            yield invoices, cached, future.result() if future else []
+    while pending:
+        invoices, cached, future = pending.popleft()
+        yield invoices, cached, future.result() if future else []
+
+
+def run_export(path, client_id=None, mode=MODE_PDF, progress=None):
+    """
+    Renders every invoice visible to the requester into `path`.
+
+    Args:
+        path: Destination file (merged PDF or ZIP of per-invoice PDFs)
+        client_id (int): Only export this client's invoices (None = all)
+        mode (str): MODE_PDF or MODE_ZIP
+        progress (callable): Called as progress(done, total) after each chunk
+
+    Returns:
+        int: Number of invoices exported
+    """
+    progress = progress or (lambda done, total: None)
+    invoice_ids = fetch_invoice_ids(client_id)
+    total = len(invoice_ids)
+    done = 0
+    progress(done, total)
+
+    with _pool() as pool:
+        chunks = _rendered(pool, _work(client_id, invoice_ids, mode))
+        if mode == MODE_ZIP:
+            import zipfile
+
+            with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as archive:
+                for invoices, cached, rendered in chunks:
+                    rendered = iter(rendered)
+                    for data, pdf in zip(invoices, cached):
+                        if pdf is None:
+                            pdf = next(rendered)
+                            pdf_cache.put(data, pdf)
+                        archive.writestr(f"invoice_{data['invoice']['id']}.pdf", pdf)
+                    done += len(invoices)
+                    progress(done, total)
+        else:
+            from pypdf import PdfWriter
+
+            writer = PdfWriter()
+            for invoices, _, rendered in chunks:
+                for pdf in rendered:
+                    writer.append(io.BytesIO(pdf))
+                done += len(invoices)
+                progress(done, total)
+            writer.write(str(path))
+
+    return total
@@ -0,0 +1,203 @@
+import json
+import os
+import re
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from datetime import datetime, timezone
+
+from django.conf import settings
+from django.core import signing
+
+from . import instrumentation
+
+# ==========================================================
+#  ON-DEMAND REQUEST PROFILER (admins only)
+# ==========================================================
+# A request carrying a signed token, as an X-Profile: <token> header (or
+# ?_profile=<token>, which ends up in access logs), runs under a sampling
+# profiler: a helper thread records the request thread's stack every
+# PROFILER_INTERVAL_MS. Tokens are issued to admins on the profiles page
+# (views/profiles.py), expire after PROFILER_TOKEN_MAX_AGE seconds and only
+# work in a session of the admin they were issued to.
+#
+# Each capture is one JSON file in PROFILER_DIR: the stacks in the folded
+# format of flamegraph.pl / speedscope ("frame;frame;frame count") and
+# the SQL / procedure calls recorded by instrumentation.py. The directory
+# is a ring buffer of the last PROFILER_MAX_CAPTURES captures.
+#
+# Without a token ProfilerMiddleware only looks for it: nothing is sampled,
+# recorded or written.
+
+PARAM = "_profile"
+HEADER = "HTTP_X_PROFILE"
+SALT = "PostOffice_App.profiler"
+
+# <UTC timestamp>_<random>: sorts by capture time
+CAPTURE_ID_RE = re.compile(r"^\d{8}T\d{12}_[0-9a-f]{8}$")
+
+
+def make_token(user):
+    """A profiling token for an admin, valid for PROFILER_TOKEN_MAX_AGE seconds."""
+    return signing.dumps({"user": user.id}, salt=SALT)
+
+
+def check_token(token):
+    """
+    Returns:
+        int: The id of the admin the token was issued to, or None if it is invalid or expired
+    """
+    try:
+        return signing.loads(token, salt=SALT, max_age=settings.PROFILER_TOKEN_MAX_AGE)["user"]
+    except (signing.BadSignature, KeyError, TypeError):
+        return None
+
+
+def request_token(request):
+    # Cheap checks first: most requests carry neither. The header wins
+    token = request.META.get(HEADER)
+    if token is None and PARAM in request.META.get("QUERY_STRING", ""):
+        token = request.GET.get(PARAM)
+    return token
+
+
+def authorized_user_id(request, token):
+    """
+    Needs request.user (AuthenticationMiddleware).
+
+    Returns:
+        int: The id of the logged-in admin the token was issued to, or None
+    """
+    user_id = check_token(token)
+    user = request.user
+    if user_id is None or not user.is_authenticated or user.id != user_id or user.role != "admin":
+        return None
+    return user_id
+
+
+# ----------------------------------------------------------
+#  Sampling
+# ----------------------------------------------------------
+
+def _folded(frame):
+    stack = []
+    while frame is not None:
+        stack.append(f"{frame.f_globals.get('__name__', '?')}:{frame.f_code.co_name}")
+        frame = frame.f_back
+    return ";".join(reversed(stack))
+
+
+class Sampler:
+    """
+    Samples the stack of one thread every `interval` seconds, from a
+    helper thread, while used as a context manager.
+    """
+
+    def __init__(self, thread_id, interval):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="po-profiler", daemon=True)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is not None:
+                self.stacks[_folded(frame)] += 1
+
+    def folded(self):
+        return "\n".join(f"{stack} {count}" for stack, count in self.stacks.most_common())
+
+
+def profile(request, get_response, user_id):
+    """
+    Runs the request under the sampler and stores the capture.
+    The response gets an X-Profile-Id header with the capture id.
+    """
+    started_at = datetime.now(timezone.utc)
+    started = time.perf_counter()
+    with Sampler(threading.get_ident(), settings.PROFILER_INTERVAL_MS / 1000) as sampler:
+        response = get_response(request)
+    duration_ms = (time.perf_counter() - started) * 1000
+
+    calls = instrumentation.current_calls() or []
+    capture_id = store({
+        "method": request.method,
+        "path": request.path,
+        "status": response.status_code,
+        "user_id": user_id,
+        "started_at": started_at.isoformat(),
+        "duration_ms": round(duration_ms, 1),
+        "interval_ms": settings.PROFILER_INTERVAL_MS,
+        "samples": sum(sampler.stacks.values()),
+        "db_ms": round(sum(call.ms for call in calls), 1),
+        # Parameters are left out: they may hold personal data
+        "calls": [
+            {"object": call.object, "alias": call.alias, "ms": round(call.ms, 3), "rows": call.rows, "sql": call.sql}
+            for call in calls
+        ],
+        "folded": sampler.folded(),
+    }, started_at)
+    response["X-Profile-Id"] = capture_id
+    return response
+
+
+# ----------------------------------------------------------
+#  Ring buffer on disk
+# ----------------------------------------------------------
+
+def _profile_dir():
+    path = settings.PROFILER_DIR
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+def store(capture, started_at):
+    """
+    Writes a capture and drops the oldest ones beyond PROFILER_MAX_CAPTURES.
+    Returns its id.
+    """
+    directory = _profile_dir()
+    capture_id = f"{started_at:%Y%m%dT%H%M%S%f}_{uuid.uuid4().hex[:8]}"
+    tmp = directory / f".{capture_id}.tmp"
+    tmp.write_text(json.dumps(dict(capture, id=capture_id)), encoding="utf-8")
+    os.replace(tmp, directory / f"{capture_id}.json")
+
+    for path in sorted(directory.glob("*.json"))[:-settings.PROFILER_MAX_CAPTURES]:
+        path.unlink(missing_ok=True)
+    return capture_id
+
+
+def load(capture_id):
+    """Returns a capture as a dict, or None."""
+    if not CAPTURE_ID_RE.match(capture_id):
+        return None
+    try:
+        return json.loads((_profile_dir() / f"{capture_id}.json").read_text(encoding="utf-8"))
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+def list_captures():
+    """
+    Summaries of the stored captures (no stacks or calls), newest first.
+    """
+    captures = []
+    for path in sorted(_profile_dir().glob("*.json"), reverse=True):
+        capture = load(path.stem)
+        if capture is not None:
+            capture["calls"] = len(capture["calls"])
+            del capture["folded"]
+            captures.append(capture)
+    return captures
@@ -0,0 +1,64 @@
+from contextvars import ContextVar
+
+from django.conf import settings
+
+# ==========================================================
+#  READ-REPLICA ROUTING (read-your-writes)
+# ==========================================================
+# When DATABASES has a "replica" alias, reads (v_* views, fn_get_*
+# functions, ORM queries) go to it and writes (sp_* procedures, ORM saves)
+# go to "default". Once something is written in a request (or job), the
+# rest of it reads from the primary too, so it never misses its own
+# writes because of replication lag. ReplicaPinMiddleware carries that
+# over to the user's next requests for DB_REPLICA_PIN_SECONDS.
+
+PRIMARY = "default"
+REPLICA = "replica"
+
+_wrote = ContextVar("db_wrote", default=False)
+
+
+def mark_write():
+    """Pins the rest of the current request/job to the primary."""
+    _wrote.set(True)
+
+
+def has_written():
+    return _wrote.get()
+
+
+def reset(pinned=False):
+    """Starts a new unit of work (request or job); returns a token for restore()."""
+    return _wrote.set(pinned)
+
+
+def restore(token):
+    _wrote.reset(token)
+
+
+def read_alias():
+    """Database alias for a read-only query."""
+    if REPLICA in settings.DATABASES and not _wrote.get():
+        return REPLICA
+    return PRIMARY
+
+
+class ReplicaRouter:
+    """
+    Database router: reads to the replica (if configured and nothing was
+    written yet), writes and migrations to the primary.
+    """
+
+    def db_for_read(self, model, **hints):
+        return read_alias()
+
+    def db_for_write(self, model, **hints):
+        mark_write()
+        return PRIMARY
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Both aliases hold the same data
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == PRIMARY
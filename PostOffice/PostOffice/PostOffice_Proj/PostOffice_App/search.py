@@ -0,0 +1,33 @@
+from django.conf import settings
+
+from . import db
+
+# ==========================================================
+#  SEARCH: DELIVERIES, CLIENTS, INVOICES (fn_search_*)
+# ==========================================================
+# Full-text (prefix words, weighted fields) and fuzzy (pg_trgm: partial
+# words, typos) search over the SEARCH_VECTOR / SEARCH_TEXT generated
+# columns of DDL.sql. Ranking and paging happen in the database: a page is
+# SEARCH_PAGE_SIZE rows, best match first.
+
+# kind -> function (david_objects.sql / diego_objects.sql / rodrigo_objects.sql)
+KINDS = {
+    "deliveries": "fn_search_deliveries",
+    "clients": "fn_search_clients",
+    "invoices": "fn_search_invoices",
+}
+
+
+def search(kind, term, page=1):
+    """
+    One page of `kind` matching `term`, best match first.
+
+    Returns:
+        list: one dict per row (its columns and "rank"), empty for terms shorter than SEARCH_MIN_CHARS
+    """
+    term = term.strip()
+    if len(term) < settings.SEARCH_MIN_CHARS:
+        return []
+    offset = (max(page, 1) - 1) * settings.SEARCH_PAGE_SIZE
+    rows = db.fetch_all(f"search_{kind}", [term, settings.SEARCH_PAGE_SIZE, offset])
+    return [row._asdict() for row in rows]
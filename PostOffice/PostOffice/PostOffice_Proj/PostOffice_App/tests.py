@@ -1,3 +1,771 @@
-from django.test import TestCase
+import gc
+import json
+import os
+import re
+import shutil
+import statistics
+import tempfile
+import threading
+import time
+import tracemalloc
+from collections import namedtuple
+from datetime import date, timedelta
+from decimal import Decimal
+from io import StringIO
+from pathlib import Path
+from types import SimpleNamespace
+from unittest import mock
 
-# Create your tests here.
+from bson import ObjectId
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import DatabaseError, connection, connections, transaction
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from . import db, instrumentation, job_handlers, jobs, lists, metrics, notifications, profiler, search, urls
+from .models import User
+from .views import invoices as invoice_views
+
+# ==========================================================
+#  PERFORMANCE BUDGETS PER URL (query count + latency)
+# ==========================================================
+# Every named URL in urls.py has a budget: the most queries one request may
+# send and its latency ceiling, measured on a seeded data set of realistic
+# size. A view that starts querying per row (the N+1 of the old
+# invoice_list: one aggregate per invoice) blows its query budget, and a
+# new URL without a budget fails test_every_url_has_a_budget.
+#
+# Needs a local PostgreSQL (the test database gets DDL.sql and the
+# *_objects.sql files, then generate_data). MongoDB is replaced by an
+# in-memory collection. Run with:
+#     python manage.py test PostOffice_App
+# On slow machines scale the latency ceilings, e.g. PERF_BUDGET_LATENCY_FACTOR=2
+
+REPO_DIR = settings.BASE_DIR.parents[2]
+SQL_FILES = ("DDL.sql", "david_objects.sql", "diego_objects.sql", "rodrigo_objects.sql", "jobs_objects.sql")
+
+# Realistic for one warehouse network, and small enough to load in seconds
+SEED = {
+    "deliveries": 20_000, "invoices": 6_000, "clients": 1_000, "drivers": 40, "staff": 20,
+    "warehouses": 5, "vehicles": 50, "routes": 2_000, "seed": 7,
+}
+
+LATENCY_FACTOR = float(os.environ.get("PERF_BUDGET_LATENCY_FACTOR", "1"))
+RUNS = 5
+
+Budget = namedtuple("Budget", "queries ms")
+
+# url name -> Budget. Every logged-in request costs 2 queries (session, user)
+BUDGETS = {
+    "dashboard_stats": Budget(queries=3, ms=50),
+    "dashboard_series": Budget(queries=3, ms=100),
+    "invoice_pdf": Budget(queries=4, ms=300),
+    "invoices_export_pdf_start": Budget(queries=3, ms=50),
+    "export_enqueue": Budget(queries=3, ms=50),
+    "import_enqueue": Budget(queries=3, ms=100),
+    "job_status": Budget(queries=3, ms=50),
+    "job_download": Budget(queries=3, ms=50),
+    "metrics": Budget(queries=3, ms=100),
+    "autocomplete": Budget(queries=3, ms=50),
+    "search": Budget(queries=3, ms=50),
+    "list_page": Budget(queries=3, ms=50),
+    "profiles_list": Budget(queries=2, ms=50),
+    "profile_download": Budget(queries=2, ms=50),
+}
+
+
+# ----------------------------------------------------------
+#  In-memory MongoDB stand-in
+# ----------------------------------------------------------
+
+class _Cursor(list):
+    def sort(self, key, direction=1):
+        super().sort(key=lambda document: document.get(key), reverse=direction < 0)
+        return self
+
+
+def _matches(document, query):
+    for key, condition in query.items():
+        value = document.get(key)
+        if isinstance(condition, dict):
+            for op, operand in condition.items():
+                if op == "$gte" and not (value is not None and value >= operand):
+                    return False
+                if op == "$lt" and not (value is not None and value < operand):
+                    return False
+                if op == "$in" and value not in operand:
+                    return False
+        elif value != condition:
+            return False
+    return True
+
+
+class InMemoryCollection:
+    """The part of pymongo's Collection that notifications.py and metrics.py use."""
+
+    def __init__(self):
+        self.documents = []
+
+    def insert_one(self, document):
+        document = dict(document, _id=ObjectId())
+        self.documents.append(document)
+        return SimpleNamespace(inserted_id=document["_id"])
+
+    def find(self, query=None):
+        return _Cursor(document for document in self.documents if _matches(document, query or {}))
+
+    def count_documents(self, query, **kwargs):
+        return len(self.find(query))
+
+    def update_one(self, query, update):
+        for document in self.documents:
+            if _matches(document, query):
+                document.update(update.get("$set", {}))
+                return SimpleNamespace(matched_count=1, modified_count=1)
+        return SimpleNamespace(matched_count=0, modified_count=0)
+
+
+# ----------------------------------------------------------
+#  Budgets
+# ----------------------------------------------------------
+
+# Fixed here for the override_settings decorators, created and removed once per run
+EXPORTS_DIR = Path(tempfile.gettempdir()) / f"po_test_exports_{os.getpid()}"
+
+
+def setUpModule():
+    EXPORTS_DIR.mkdir(exist_ok=True)
+
+
+def tearDownModule():
+    shutil.rmtree(EXPORTS_DIR, ignore_errors=True)
+
+
+def load_schema():
+    """Runs DDL.sql and the *_objects.sql files on the test database."""
+    with connection.cursor() as cursor:
+        for name in SQL_FILES:
+            cursor.execute((REPO_DIR / name).read_text(encoding="utf-8"))
+
+
+# No EXPLAIN of slow calls: it would add queries to the count
+@override_settings(
+    EXPORTS_DIR=EXPORTS_DIR,
+    INVOICE_PDF_CACHE_DIR=EXPORTS_DIR / "invoice_pdfs",
+    PROFILER_DIR=EXPORTS_DIR / "profiles",
+    DB_SLOW_CALL_MS=float("inf"),
+)
+class PerformanceBudgetTests(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.mongo = InMemoryCollection()
+        patcher = mock.patch.object(notifications, "notifications_collection", return_value=cls.mongo)
+        patcher.start()
+        cls.addClassCleanup(patcher.stop)
+        super().setUpClass()
+
+    @classmethod
+    def setUpTestData(cls):
+        load_schema()
+        call_command("generate_data", batch_size=5_000, stdout=StringIO(), **SEED)
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT MIN(id) FROM invoice")
+            cls.invoice_id = cursor.fetchone()[0]
+
+        cls.admin = User.objects.create_user("budget.admin", "budget.admin@example.com", "testpass123", role="admin")
+        # A finished export, for job_status / job_download
+        cls.job_id = jobs.enqueue("export", {"entity": "warehouses", "format": "json"}, cls.admin)
+        jobs.run_next()
+        cls.capture_id = profiler.store(
+            {"method": "GET", "path": "/", "status": 200, "calls": [], "folded": "a;b 1"}, timezone.now(),
+        )
+
+    def setUp(self):
+        self.client.force_login(self.admin)
+
+    def _requests(self):
+        return {
+            "dashboard_stats": lambda: self.client.get(reverse("dashboard_stats")),
+            "dashboard_series": lambda: self.client.get(reverse("dashboard_series"), {"days": 90}),
+            "invoice_pdf": lambda: self.client.get(reverse("invoice_pdf", args=[self.invoice_id])),
+            "invoices_export_pdf_start": lambda: self.client.post(reverse("invoices_export_pdf_start"), {"mode": "pdf"}),
+            "export_enqueue": lambda: self.client.post(reverse("export_enqueue", args=["deliveries", "csv"])),
+            "import_enqueue": lambda: self.client.post(
+                reverse("import_enqueue", args=["vehicles"]),
+                {"file": SimpleUploadedFile("vehicles.json", b"[]", content_type="application/json")},
+            ),
+            "job_status": lambda: self.client.get(reverse("job_status", args=[self.job_id])),
+            "job_download": lambda: self.client.get(reverse("job_download", args=[self.job_id])),
+            "metrics": lambda: self.client.get(reverse("metrics")),
+            "autocomplete": lambda: self.client.get(reverse("autocomplete", args=["clients"]), {"q": "an"}),
+            "search": lambda: self.client.get(reverse("search"), {"kind": "deliveries", "q": "ana sousa"}),
+            "list_page": lambda: self.client.get(
+                reverse("list_page", args=["deliveries"]), {"status": "pending", "warehouse": 1, "from": "2025-01-01"},
+            ),
+            "profiles_list": lambda: self.client.get(reverse("profiles_list")),
+            "profile_download": lambda: self.client.get(reverse("profile_download", args=[self.capture_id, "folded"])),
+        }
+
+    def _measure(self, request):
+        """Median latency (ms) of RUNS warm requests, and the queries of the last one."""
+        request().close()  # warm up: prepared statements, PDF cache, template loading
+        latencies = []
+        for _ in range(RUNS):
+            cache.clear()
+            with CaptureQueriesContext(connection) as queries:
+                started = time.perf_counter()
+                response = request()
+                latencies.append((time.perf_counter() - started) * 1000)
+            response.close()
+        return response.status_code, statistics.median(latencies), queries
+
+    def test_every_url_has_a_budget(self):
+        names = {pattern.name for pattern in urls.urlpatterns if pattern.name}
+        self.assertEqual(names - set(BUDGETS), set(), "Add these URL names to BUDGETS in tests.py")
+        self.assertEqual(set(BUDGETS) - set(self._requests()), set(), "Add a request for these URL names")
+
+    def test_budgets(self):
+        for name, request in self._requests().items():
+            budget = BUDGETS[name]
+            with self.subTest(url=name):
+                status, ms, queries = self._measure(request)
+                self.assertLess(status, 400, f"{name} returned {status}")
+                self.assertLessEqual(
+                    len(queries), budget.queries,
+                    f"{name} sent {len(queries)} queries (budget {budget.queries}):\n"
+                    + "\n".join(re.sub(r"\s+", " ", query["sql"])[:200] for query in queries),
+                )
+                self.assertLessEqual(
+                    ms, budget.ms * LATENCY_FACTOR,
+                    f"{name} took {ms:.1f} ms (ceiling {budget.ms * LATENCY_FACTOR:.0f} ms)",
+                )
+
+
+# ----------------------------------------------------------
+#  Prepared statements (db.execute)
+# ----------------------------------------------------------
+
+class PreparedStatementTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        load_schema()
+
+    def test_wrappers_sharing_a_raw_connection(self):
+        # Pool mode: another wrapper checks out a connection this one prepared on
+        with connection.cursor() as cursor:
+            db.execute(cursor, "vehicles_page", [1, 0])
+        other = connections.create_connection("default")
+        other.connection = connection.connection
+        try:
+            with other.cursor() as cursor:
+                db.execute(cursor, "vehicles_page", [1, 0])
+                cursor.fetchall()
+        finally:
+            other.connection = None
+
+
+# ----------------------------------------------------------
+#  Records (db.record_type)
+# ----------------------------------------------------------
+
+class RecordTests(SimpleTestCase):
+
+    def test_keys_are_column_names_only(self):
+        row = db.record_type(("id", "count", "from"))(1, 7, "Lisboa")
+        self.assertEqual((row["count"], row.get("count"), row["from"], row.id), (7, 7, "Lisboa", 1))
+        self.assertEqual(row.get("index", "missing"), "missing")
+        with self.assertRaises(KeyError):
+            row["index"]
+        self.assertEqual(row._asdict(), {"id": 1, "count": 7, "from": "Lisboa"})
+
+    def test_duplicate_columns_are_rejected(self):
+        with self.assertRaises(ValueError):
+            db.record_type(("id", "name", "id"))
+
+
+# ----------------------------------------------------------
+#  Invoice save (sp_save_invoice)
+# ----------------------------------------------------------
+
+class InvoiceSaveTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        load_schema()
+
+    def _invoice(self, invoice_id):
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT quantity, cost FROM invoice WHERE id = %s", [invoice_id])
+            quantity, cost = cursor.fetchone()
+            cursor.execute("SELECT id, quantity FROM invoice_item WHERE inv_id = %s ORDER BY id", [invoice_id])
+            return quantity, cost, cursor.fetchall()
+
+    def _refreshes(self):
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT COALESCE(SUM(refreshes), 0) FROM mv_refresh_stats WHERE mv_name = 'mv_invoice_totals'")
+            return cursor.fetchone()[0]
+
+    def test_create_then_edit_recalculates_once_per_save(self):
+        header = {"status": "pending", "type": "paid_on_send", "name": "Ana Silva"}
+        item = {"shipment_type": "parcel", "weight": "1.50", "delivery_speed": "standard", "unit_price": "4.00"}
+
+        refreshes = self._refreshes()
+        invoice_id = invoice_views.save_invoice(header, [dict(item, quantity=n) for n in (1, 2, 3)])
+        quantity, cost, items = self._invoice(invoice_id)
+        self.assertEqual((quantity, cost, len(items)), (6, Decimal("24.00"), 3))
+        self.assertEqual(self._refreshes(), refreshes + 1)
+
+        (first, _), (second, _), _ = items
+        invoice_views.save_invoice(
+            header, [dict(item, id=first, quantity=10), dict(item, quantity=5)], deleted_ids=[second],
+            invoice_id=invoice_id,
+        )
+        quantity, cost, items = self._invoice(invoice_id)
+        self.assertEqual((quantity, cost, [q for _, q in items]), (18, Decimal("72.00"), [10, 3, 5]))
+        self.assertEqual(self._refreshes(), refreshes + 2)
+
+    def test_items_of_another_invoice_are_rejected(self):
+        other_id = invoice_views.save_invoice({}, [{"quantity": 1, "unit_price": "1.00"}])
+        (item_id, _), = self._invoice(other_id)[2]
+        invoice_id = invoice_views.save_invoice({}, [])
+        with self.assertRaises(DatabaseError), transaction.atomic():
+            invoice_views.save_invoice({}, [], deleted_ids=[item_id], invoice_id=invoice_id)
+
+
+# ----------------------------------------------------------
+#  Autocomplete pickers (forms.AutocompleteFormMixin)
+# ----------------------------------------------------------
+
+class AutocompleteFormTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        load_schema()
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "INSERT INTO vehicle (vehicle_type, plate_number, brand, model, vehicle_status, is_active) "
+                "VALUES ('van', 'AA-00-01', 'Renault', 'Master', 'available', true), "
+                "       ('van', 'AA-00-02', 'Renault', 'Trafic', 'available', true) RETURNING id"
+            )
+            cls.vehicles = [row[0] for row in cursor.fetchall()]
+
+    def _data(self, vehicle):
+        return {"description": "Lisboa centro", "delivery_status": "not_started", "vehicle": vehicle}
+
+    def test_picked_ids_round_trip(self):
+        # forms.py imports the ORM models of every form
+        from .forms import RouteForm
+
+        form = RouteForm(self._data(self.vehicles[0]))
+        self.assertTrue(form.is_valid(), form.errors)
+        route = form.save()
+        route.refresh_from_db()
+        self.assertEqual((route.vehicle_id, route.driver_id), (self.vehicles[0], None))
+
+        # The edit form starts from the saved picks, labelled
+        form = RouteForm(instance=route)
+        self.assertEqual(form.initial["vehicle"], self.vehicles[0])
+        self.assertIn("AA-00-01", form.fields["vehicle"].widget.label)
+
+        # Unchanged: accepted without a lookup; changed: saved
+        form = RouteForm(self._data(self.vehicles[0]), instance=route)
+        self.assertEqual(form.changed_data, [])
+        self.assertTrue(form.is_valid(), form.errors)
+        form = RouteForm(self._data(self.vehicles[1]), instance=route)
+        self.assertTrue(form.is_valid(), form.errors)
+        form.save()
+        route.refresh_from_db()
+        self.assertEqual(route.vehicle_id, self.vehicles[1])
+
+
+# ----------------------------------------------------------
+#  Search (fn_search_*)
+# ----------------------------------------------------------
+
+class SearchTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        load_schema()
+        cls.ids = {
+            name: invoice_views.save_invoice({"name": name, "contact": contact}, [])
+            for name, contact in (("Ana Silva", "912345678"), ("Ana Sousa", "934000111"), ("Bruno Costa", "961222333"))
+        }
+
+    def _names(self, term):
+        return [row["name"] for row in search.search("invoices", term)]
+
+    def test_best_match_first(self):
+        self.assertEqual(self._names("ana sil")[0], "Ana Silva")
+        self.assertEqual(self._names("bruno"), ["Bruno Costa"])
+        self.assertEqual(sorted(self._names("ana")), ["Ana Silva", "Ana Sousa"])
+
+    def test_partial_contact_matches(self):
+        self.assertEqual(self._names("2345"), ["Ana Silva"])
+
+    def test_pages_and_short_terms(self):
+        with self.settings(SEARCH_PAGE_SIZE=1):
+            first, second = self._names("ana"), search.search("invoices", "ana", page=2)
+        self.assertEqual(len(first), 1)
+        self.assertNotEqual(first, [row["name"] for row in second])
+        with self.assertNumQueries(0):
+            self.assertEqual(search.search("invoices", "an"), [])
+
+    def test_common_term_beyond_the_candidate_cap(self):
+        # 1100 near matches ("silvestre" ~ "silva"): more than the 1000 candidates ranked
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "INSERT INTO invoice (name, contact, created_at, updated_at) "
+                "SELECT 'Rui Silvestre ' || g, '960' || g, NOW(), NOW() FROM generate_series(1, 1100) g"
+            )
+        first = search.search("invoices", "silva")
+        self.assertEqual(first[0]["id"], self.ids["Ana Silva"])
+
+        pages = [[row["id"] for row in search.search("invoices", "silva", page)] for page in (1, 2, 3)]
+        self.assertEqual(len(set().union(*pages)), 3 * settings.SEARCH_PAGE_SIZE)
+        self.assertEqual([row["id"] for row in first], pages[0])
+
+
+# ----------------------------------------------------------
+#  Filtered list pages (fn_list_*)
+# ----------------------------------------------------------
+
+class ListPageTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        load_schema()
+        # Same created_at (one transaction): pages are ordered by id within it
+        cls.pending = [invoice_views.save_invoice({"status": "pending"}, []) for _ in range(3)]
+        invoice_views.save_invoice({"status": "completed"}, [])
+
+    @override_settings(LIST_PAGE_SIZE=2)
+    def test_pages_follow_the_cursor(self):
+        rows, cursor = lists.page("invoices", {"status": "pending"})
+        self.assertEqual([row["id"] for row in rows], self.pending[:0:-1])
+        rows, cursor = lists.page("invoices", {"status": "pending"}, after=cursor)
+        self.assertEqual(([row["id"] for row in rows], cursor), ([self.pending[0]], None))
+
+    def test_oldest_first_and_date_range(self):
+        rows, _ = lists.page("invoices", {"status": "pending"}, sort="oldest")
+        self.assertEqual([row["id"] for row in rows], self.pending)
+        # Days in the application time zone, whatever the session's
+        today = timezone.localdate()
+        self.assertEqual(lists.page("invoices", {"from": today, "to": today})[0][0]["status"], "completed")
+        self.assertEqual(lists.page("invoices", {"to": today - timedelta(days=1)}), ([], None))
+
+    def test_dates_are_lisbon_days(self):
+        with connection.cursor() as cursor:
+            # 23:30 UTC on 1 July is 00:30 on 2 July in Lisbon (WEST)
+            cursor.execute("UPDATE invoice SET created_at = '2026-07-01 23:30+00' WHERE id = %s", [self.pending[0]])
+        july_2 = date(2026, 7, 2)
+        rows, _ = lists.page("invoices", {"from": july_2, "to": july_2})
+        self.assertEqual([row["id"] for row in rows], [self.pending[0]])
+        self.assertEqual(lists.page("invoices", {"to": july_2 - timedelta(days=1)}), ([], None))
+
+    @override_settings(LIST_PAGE_SIZE=2)
+    def test_deleted_cursor_row(self):
+        _, cursor = lists.page("invoices", {"status": "pending"})
+        with connection.cursor() as db_cursor:
+            db_cursor.execute("DELETE FROM invoice WHERE id = %s", [cursor])
+        # An error, not a silently empty page
+        with self.assertRaises(DatabaseError), transaction.atomic():
+            lists.page("invoices", {"status": "pending"}, after=cursor)
+
+
+# ----------------------------------------------------------
+#  SQL helper functions (inlineable, parallel safe)
+# ----------------------------------------------------------
+
+class SqlFunctionTests(TestCase):
+
+    # function -> volatility ("i"mmutable / "s"table)
+    VOLATILITY = {
+        "fn_is_valid_status_transition": "i",
+        "fn_calculate_tax": "i",
+        "fn_calculate_item_total": "i",
+        "fn_is_valid_year": "s",
+        "fn_is_license_valid": "s",
+        "fn_get_client_deliveries": "s",
+        "fn_get_driver_deliveries": "s",
+        "fn_get_delivery_tracking": "s",
+    }
+
+    @classmethod
+    def setUpTestData(cls):
+        load_schema()
+
+    def _scalar(self, sql, params=None):
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            return cursor.fetchone()[0]
+
+    def test_declared_sql_and_parallel_safe(self):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT p.proname, l.lanname, p.provolatile, p.proparallel FROM pg_proc p "
+                "JOIN pg_language l ON l.oid = p.prolang WHERE p.proname = ANY(%s)",
+                [list(self.VOLATILITY)],
+            )
+            declared = {name: (language, volatility, parallel) for name, language, volatility, parallel in cursor}
+        self.assertEqual(declared, {name: ("sql", volatility, "s") for name, volatility in self.VOLATILITY.items()})
+
+    def test_same_results(self):
+        self.assertIs(self._scalar("SELECT fn_is_valid_status_transition('pending', 'pending')"), True)
+        self.assertIs(self._scalar("SELECT fn_is_valid_status_transition('ready', 'in_transit')"), False)
+        self.assertIs(self._scalar("SELECT fn_is_valid_status_transition(NULL, 'ready')"), False)
+        self.assertEqual(self._scalar("SELECT fn_calculate_tax(10.00)"), Decimal("2.30"))
+        self.assertEqual(self._scalar("SELECT fn_calculate_item_total(NULL, 2.50)"), Decimal("0.00"))
+        self.assertIs(self._scalar("SELECT fn_is_valid_year(1899)"), False)
+
+    def test_constant_calls_are_folded(self):
+        with connection.cursor() as cursor:
+            cursor.execute("EXPLAIN (VERBOSE) SELECT fn_calculate_tax(10.00), fn_is_valid_status_transition('ready', 'pending')")
+            plan = " ".join(row[0] for row in cursor.fetchall())
+        self.assertNotIn("fn_", plan)
+
+
+# ----------------------------------------------------------
+#  Memory of long imports
+# ----------------------------------------------------------
+
+class _SampledJob(jobs.Job):
+    """Records the traced Python memory after every batch."""
+
+    samples = None
+
+    def progress(self, done, total=None):
+        super().progress(done, total)
+        self.samples.append(tracemalloc.get_traced_memory()[0])
+
+
+# DEBUG = True, as in development: every statement goes to connection.queries
+@override_settings(DEBUG=True, EXPORTS_DIR=EXPORTS_DIR)
+class ImportMemoryTests(TestCase):
+    ROWS = 1_000_000
+    # Allowed growth once the first batches have warmed up caches and buffers
+    MAX_GROWTH = 2 * 1024 * 1024
+
+    @classmethod
+    def setUpTestData(cls):
+        load_schema()
+        cls.admin = User.objects.create_user("memory.admin", "memory.admin@example.com", "testpass123", role="admin")
+
+    def test_import_memory_is_flat(self):
+        upload = EXPORTS_DIR / "memory_test_warehouses.json"
+        # The import removes it too, unless the test fails before that
+        self.addCleanup(upload.unlink, missing_ok=True)
+        with open(upload, "w", encoding="utf-8") as f:
+            f.write("[")
+            for i in range(self.ROWS):
+                f.write(("," if i else "") + json.dumps({
+                    "name": f"Warehouse {i}", "contact": "912345678", "address": f"Rua {i}, Lisboa",
+                    "maximum_storage_capacity": 500,
+                }))
+            f.write("]")
+
+        jobs.enqueue("import", {"entity": "warehouses", "path": str(upload)}, self.admin)
+        job = jobs._claim(_SampledJob)
+        job.samples = []
+        tracemalloc.start()
+        try:
+            result = job_handlers.import_entity(job)
+        finally:
+            tracemalloc.stop()
+
+        self.assertEqual(result["rows"], self.ROWS)
+        warm = job.samples[10]
+        growth = max(job.samples[10:]) - warm
+        self.assertLess(growth, self.MAX_GROWTH, f"Memory grew by {growth / 1024 / 1024:.1f} MB during the import")
+
+
+# ----------------------------------------------------------
+#  Resuming requeued imports
+# ----------------------------------------------------------
+
+@override_settings(EXPORTS_DIR=EXPORTS_DIR, JOB_BATCH_SIZE=2)
+class ImportResumeTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        load_schema()
+        cls.admin = User.objects.create_user("resume.admin", "resume.admin@example.com", "testpass123", role="admin")
+
+    def _count(self):
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT COUNT(*) FROM warehouse WHERE name LIKE 'Resumed %%'")
+            return cursor.fetchone()[0]
+
+    def test_requeued_import_skips_committed_batches(self):
+        records = [
+            {"name": f"Resumed {i}", "contact": "912345678", "address": f"Rua {i}, Lisboa",
+             "maximum_storage_capacity": 500}
+            for i in range(5)
+        ]
+        upload = EXPORTS_DIR / "resume_test_warehouses.json"
+        self.addCleanup(upload.unlink, missing_ok=True)
+        upload.write_text(json.dumps(records), encoding="utf-8")
+        jobs.enqueue("import", {"entity": "warehouses", "path": str(upload)}, self.admin)
+
+        # The first attempt imported two batches, then was requeued as stale
+        first = jobs._claim()
+        with connection.cursor() as cursor:
+            cursor.execute("CALL sp_import_warehouses(%s::jsonb)", [json.dumps(records[:4])])
+        first.progress(4)
+        with connection.cursor() as cursor:
+            cursor.execute("UPDATE background_job SET status = 'queued' WHERE id = %s", [first.id])
+
+        job = jobs._claim()
+        self.assertEqual((job.attempt, job.progress_done), (first.attempt + 1, 4))
+        result = job_handlers.import_entity(job)
+
+        self.assertEqual(result["rows"], 5)
+        self.assertEqual(self._count(), 5)
+        # The first attempt's worker stops at its next call
+        with self.assertRaises(DatabaseError), transaction.atomic():
+            first.progress(5)
+
+
+# ----------------------------------------------------------
+#  Profiler toggle
+# ----------------------------------------------------------
+
+@override_settings(PROFILER_DIR=EXPORTS_DIR / "profiler_tests", PROFILER_MAX_CAPTURES=2)
+class ProfilerTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        load_schema()
+        cls.admin = User.objects.create_user("profiler.admin", "profiler.admin@example.com", "testpass123", role="admin")
+        cls.other = User.objects.create_user("profiler.other", "profiler.other@example.com", "testpass123", role="admin")
+
+    def setUp(self):
+        shutil.rmtree(settings.PROFILER_DIR, ignore_errors=True)
+        self.token = profiler.make_token(self.admin)
+        self.client.force_login(self.admin)
+
+    def test_no_capture_without_a_valid_token(self):
+        self.client.get("/no-such-page/")
+        self.client.get(f"/no-such-page/?{profiler.PARAM}=forged")
+        self.assertEqual(profiler.list_captures(), [])
+
+    def test_no_capture_outside_the_admins_session(self):
+        self.client.logout()
+        self.client.get("/no-such-page/", HTTP_X_PROFILE=self.token)
+        self.client.force_login(self.other)
+        self.client.get("/no-such-page/", HTTP_X_PROFILE=self.token)
+        self.assertEqual(profiler.list_captures(), [])
+
+    def test_capture_with_token(self):
+        response = self.client.get(f"/no-such-page/?{profiler.PARAM}={self.token}")
+        capture = profiler.load(response["X-Profile-Id"])
+        self.assertEqual(
+            (capture["path"], capture["status"], capture["user_id"]), ("/no-such-page/", 404, self.admin.id),
+        )
+
+    def test_ring_buffer_keeps_the_newest(self):
+        ids = [self.client.get("/", HTTP_X_PROFILE=self.token)["X-Profile-Id"] for _ in range(3)]
+        self.assertEqual([capture["id"] for capture in profiler.list_captures()], ids[:0:-1])
+
+
+# ----------------------------------------------------------
+#  Plans of slow calls (EXPLAIN ANALYZE re-runs the statement)
+# ----------------------------------------------------------
+
+class SlowCallPlanTests(SimpleTestCase):
+
+    def _call(self, sql, many=False):
+        return instrumentation.Call(instrumentation.object_name(sql), "default", 500.0, 1, sql, [], many)
+
+    def test_only_side_effect_free_reads_are_explained(self):
+        explained = {
+            "SELECT * FROM v_deliveries_export WHERE id = %s": True,
+            "SELECT * FROM mv_delivery_stats;": True,
+            "SELECT * FROM fn_get_driver_deliveries(%s)": True,
+            "SELECT * FROM fn_dequeue_job()": False,
+            "SELECT * FROM v_background_jobs WHERE id = %s FOR UPDATE": False,
+            "SELECT nextval('delivery_id_seq')": False,
+            "SELECT pg_advisory_lock(1)": False,
+            "SELECT set_config('statement_timeout', '0', false)": False,
+            "SELECT * FROM delivery": False,
+            "SELECT * FROM v_deliveries_export; SELECT fn_dequeue_job()": False,
+            "CALL sp_update_delivery_status(%s, %s)": False,
+            "EXECUTE po_unknown(1)": False,
+        }
+        for sql, expected in explained.items():
+            with self.subTest(sql=sql):
+                self.assertEqual(instrumentation._explainable(self._call(sql)), expected)
+        self.assertFalse(instrumentation._explainable(self._call("SELECT * FROM v_deliveries_export", many=True)))
+
+    @override_settings(DB_EXPLAIN_INTERVAL_SECONDS=300)
+    def test_explain_is_rate_limited_per_object(self):
+        call = self._call("SELECT * FROM v_rate_limited")
+        self.assertTrue(instrumentation._explain_due(call))
+        self.assertFalse(instrumentation._explain_due(call))
+
+
+class SlowCallExplainTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        load_schema()
+
+    def test_prepared_read_is_explained_on_a_connection_without_it(self):
+        call = instrumentation.Call(
+            "v_deliveries_full", "default", 500.0, 0, "EXECUTE po_deliveries_page (%s, %s)", [5, 0], False,
+        )
+        with connection.cursor() as cursor:
+            db.execute(cursor, "deliveries_page", [5, 0])
+            # As on the explain thread's connection: nothing prepared
+            cursor.execute("DEALLOCATE ALL")
+        db._PREPARED.pop(connection.connection, None)
+
+        plan = instrumentation.explain(call)
+        self.assertFalse(plan.startswith("EXPLAIN failed"), plan)
+        self.assertIn("Limit", plan)
+
+
+# ----------------------------------------------------------
+#  Metrics of finished threads
+# ----------------------------------------------------------
+
+class MetricShardTests(SimpleTestCase):
+
+    def test_finished_threads_are_folded_into_the_base(self):
+        histogram = metrics.REGISTRY.get("po_test_fold_seconds") or metrics.Histogram(
+            "po_test_fold_seconds", "Test histogram", ["thread"], max_series=1,
+        )
+        shards = len(metrics._shards)
+
+        def work():
+            for _ in range(3):
+                histogram.observe(0.01, thread="any")
+
+        threads = [threading.Thread(target=work) for _ in range(20)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        gc.collect()
+
+        self.assertLessEqual(len(metrics._shards), shards)
+        self.assertIn('po_test_fold_seconds_count{thread="any"} 60', histogram.render())
+
+
+# ----------------------------------------------------------
+#  Startup imports
+# ----------------------------------------------------------
+
+class StartupImportTests(SimpleTestCase):
+
+    def test_no_heavy_modules_at_startup(self):
+        # Only the HEAVY_MODULES check: the latency budgets depend on the machine
+        call_command("bench_importtime", runs=1, check_budget_ms=float("inf"), wsgi_budget_ms=float("inf"),
+                     stdout=StringIO())
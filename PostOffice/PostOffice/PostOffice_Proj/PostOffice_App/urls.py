@@ -3,7 +3,31 @@
 # This module maps URL patterns to the split view modules.
 # """
 
+from importlib import import_module
+
 from django.urls import path
+
+
+def lazy_view(dotted):
+    """
+    A view that imports "<module>.<function>" from PostOffice_App.views on its
+    first request: loading the URLconf (manage.py check, WSGI startup) does
+    not pull in every view module and what it imports.
+    """
+    module_name, name = dotted.rsplit(".", 1)
+    view_function = None
+
+    def view(request, *args, **kwargs):
+        nonlocal view_function
+        if view_function is None:
+            view_function = getattr(import_module(f"{__package__}.views.{module_name}"), name)
+        return view_function(request, *args, **kwargs)
+
+    view.__name__ = view.__qualname__ = name
+    view.__module__ = f"{__package__}.views.{module_name}"
+    return view
+
+
 # from .views import (
 #     core,
 #     dashboard,
@@ -17,7 +41,37 @@ from django.urls import path
 #     notifications,
 # )
 
-urlpatterns = []
+urlpatterns = [
+    # Dashboard
+    path("dashboard/stats/", lazy_view("dashboard.dashboard_stats_json"), name="dashboard_stats"),
+    path("dashboard/series/", lazy_view("dashboard.dashboard_series_json"), name="dashboard_series"),
+
+    # Invoice PDFs
+    path("invoices/<int:invoice_id>/pdf/", lazy_view("invoices.invoice_pdf"), name="invoice_pdf"),
+    path("invoices/export/pdf/", lazy_view("invoices.invoices_export_pdf_start"), name="invoices_export_pdf_start"),
+
+    # Background jobs (imports / exports)
+    path("exports/<str:entity>/<str:fmt>/", lazy_view("jobs.export_enqueue"), name="export_enqueue"),
+    path("imports/<str:entity>/", lazy_view("jobs.import_enqueue"), name="import_enqueue"),
+    path("jobs/<int:job_id>/", lazy_view("jobs.job_status"), name="job_status"),
+    path("jobs/<int:job_id>/download/", lazy_view("jobs.job_download"), name="job_download"),
+
+    # Monitoring (Prometheus)
+    path("metrics", lazy_view("metrics.metrics_endpoint"), name="metrics"),
+
+    # Form pickers (clients, drivers, vehicles, ...)
+    path("autocomplete/<str:source>/", lazy_view("autocomplete.autocomplete_options"), name="autocomplete"),
+
+    # Filtered list pages (deliveries, routes, invoices)
+    path("lists/<str:entity>/", lazy_view("lists.list_page"), name="list_page"),
+
+    # Search (deliveries, clients, invoices)
+    path("search/", lazy_view("search.search"), name="search"),
+
+    # Request profiler (admins)
+    path("profiles/", lazy_view("profiles.profiles_list"), name="profiles_list"),
+    path("profiles/<str:capture_id>/<str:fmt>/", lazy_view("profiles.profile_download"), name="profile_download"),
+]
     # # Dashboard / Home
     # path("", dashboard.dashboard, name="dashboard"),
     # path("home/", core.home, name="home"),
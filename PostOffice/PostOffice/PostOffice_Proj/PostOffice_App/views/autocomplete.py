@@ -0,0 +1,17 @@
+# ==========================================================
+# AUTOCOMPLETE (JSON options for the form pickers)
+# ==========================================================
+from django.contrib.auth.decorators import login_required
+from django.http import Http404, JsonResponse
+
+from .. import autocomplete
+from .decorators import role_required
+
+
+@login_required
+@role_required(["admin", "manager", "staff"])
+def autocomplete_options(request, source):
+    """Options of a picker matching ?q=<prefix>"""
+    if source not in autocomplete.SOURCES:
+        raise Http404("Unknown autocomplete source")
+    return JsonResponse({"results": autocomplete.search(source, request.GET.get("q", ""))})
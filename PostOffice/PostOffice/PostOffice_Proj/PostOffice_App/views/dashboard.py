@@ -34,4 +34,35 @@
 #     else:  # client, staff, manager
 #         stats = {"my_deliveries": Delivery.objects.filter(client=request.user)}
 
-#     return render(request, "dashboard/admin.html", {"stats": stats, "role": role})
\ No newline at end of file
+#     return render(request, "dashboard/admin.html", {"stats": stats, "role": role})
+
+
+# ==========================================================
+# DASHBOARD STATS (JSON)
+# ==========================================================
+from django.contrib.auth.decorators import login_required
+from django.http import HttpResponseBadRequest, JsonResponse
+
+from .. import dashboard as dashboard_stats
+from .decorators import role_required
+
+
+@login_required
+def dashboard_stats_json(request):
+    """Role-specific dashboard counts, served from the stats cache"""
+    stats, as_of = dashboard_stats.get_stats(request.user)
+    return JsonResponse({"role": request.user.role, "stats": stats, "as_of": as_of})
+
+
+@login_required
+@role_required(["admin", "manager"])
+def dashboard_series_json(request):
+    """Daily deliveries by status and revenue, ?days=90&warehouse=<id>"""
+    try:
+        days = min(max(int(request.GET.get("days", 90)), 1), 366)
+        warehouse_id = int(request.GET["warehouse"]) if request.GET.get("warehouse") else None
+    except ValueError:
+        return HttpResponseBadRequest("Invalid days or warehouse.")
+
+    series = dashboard_stats.get_daily_series(days, warehouse_id)
+    return JsonResponse({"days": days, "warehouse": warehouse_id, "series": series})
@@ -335,4 +335,85 @@
 #     pisa_status = pisa.CreatePDF(html, dest=response)
 #     if pisa_status.err:
 #         return HttpResponse("Error generating PDF", status=500)
-#     return response
\ No newline at end of file
+#     return response
+
+
+# ==========================================================
+# BACKGROUND PDF EXPORT
+# ==========================================================
+# Large exports render in a process pool (see pdf_export.py) inside the
+# job worker, not the request worker: queue the job, then poll
+# job_status / job_download (views/jobs.py).
+import json
+
+from django.contrib.auth.decorators import login_required
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import Http404, HttpResponse, HttpResponseBadRequest
+
+from .. import db, jobs, pdf_export
+from .decorators import role_required
+from .jobs import job_accepted
+
+
+@login_required
+@role_required(["admin", "client"])
+def invoices_export_pdf_start(request):
+    """Queue a PDF export (mode=pdf merges everything, mode=zip is one PDF per invoice)"""
+    if request.method != "POST":
+        return HttpResponseBadRequest("Invalid request method.")
+
+    mode = request.POST.get("mode", pdf_export.MODE_PDF)
+    if mode not in (pdf_export.MODE_PDF, pdf_export.MODE_ZIP):
+        return HttpResponseBadRequest("Unknown export mode.")
+
+    client_id = request.user.id if request.user.role == "client" else None
+    job_id = jobs.enqueue("invoices_pdf", {"mode": mode, "client_id": client_id}, request.user)
+    return job_accepted(job_id)
+
+
+@login_required
+@role_required(["admin", "client"])
+def invoice_pdf(request, invoice_id):
+    """Download a single invoice as PDF (served from the PDF cache when unchanged)"""
+    client_id = request.user.id if request.user.role == "client" else None
+    invoices = pdf_export.fetch_invoices(client_id, invoice_ids=[invoice_id])
+    if not invoices:
+        raise Http404("Invoice not found")
+
+    response = HttpResponse(pdf_export.render_invoice_pdf(invoices[0]), content_type="application/pdf")
+    response["Content-Disposition"] = f'attachment; filename="invoice_{invoice_id}.pdf"'
+    return response
+
+
+# ==========================================================
+# INVOICE SAVE (header + items in one sp_save_invoice call)
+# ==========================================================
+# invoice_create / invoice_edit save the invoice form and its item formset
+# with one call: the items are applied set-wise and the invoice cost /
+# quantity and mv_invoice_totals are recalculated once, not once per item.
+INVOICE_HEADER = (
+    "war_id", "staff_id", "client_id", "status", "type",
+    "paid", "pay_method", "name", "address", "contact",
+)
+
+
+def save_invoice(header, items, deleted_ids=(), invoice_id=None):
+    """
+    Creates (invoice_id None) or updates an invoice with its item changes.
+
+    Args:
+        header (dict): INVOICE_HEADER values; missing keys are saved as NULL
+        items (list): Item dicts (shipment_type, weight, delivery_speed, quantity,
+            unit_price, notes), with "id" for existing items
+        deleted_ids: Ids of the items to delete
+
+    Returns:
+        int: The invoice id
+    """
+    changes = [dict(item) for item in items] + [{"id": item_id, "delete": True} for item_id in deleted_ids]
+    (saved_id,) = db.call("sp_save_invoice", [
+        *(header.get(name) for name in INVOICE_HEADER),
+        json.dumps(changes, cls=DjangoJSONEncoder),
+        invoice_id,
+    ])
+    return saved_id
@@ -0,0 +1,97 @@
+# ==========================================================
+#  BACKGROUND JOBS (enqueue / status / download)
+# ==========================================================
+import uuid
+
+from django.conf import settings
+from django.contrib.auth.decorators import login_required
+from django.http import FileResponse, Http404, HttpResponseBadRequest, JsonResponse
+from django.urls import reverse
+
+from .. import jobs
+from ..job_handlers import EXPORT_FORMATS, EXPORT_VIEWS, IMPORT_PROCEDURES
+from .decorators import role_required
+
+
+def job_accepted(job_id):
+    """202 response pointing the client at the job's status endpoint"""
+    return JsonResponse(
+        {"job_id": job_id, "status_url": reverse("job_status", args=[job_id])},
+        status=202,
+    )
+
+
+def _own_job(request, job_id):
+    job = jobs.get_job(job_id)
+    if job is None or (request.user.role != "admin" and job["requested_by"] != request.user.id):
+        raise Http404("Job not found")
+    return job
+
+
+@login_required
+@role_required(["admin", "manager"])
+def export_enqueue(request, entity, fmt):
+    """Queue a JSON/CSV export of an entity"""
+    if request.method != "POST":
+        return HttpResponseBadRequest("Invalid request method.")
+    if entity not in EXPORT_VIEWS or fmt not in EXPORT_FORMATS:
+        raise Http404("Unknown export")
+
+    return job_accepted(jobs.enqueue("export", {"entity": entity, "format": fmt}, request.user))
+
+
+@login_required
+@role_required(["admin"])
+def import_enqueue(request, entity):
+    """Store the uploaded JSON file and queue its import"""
+    if request.method != "POST":
+        return HttpResponseBadRequest("Invalid request method.")
+    if entity not in IMPORT_PROCEDURES:
+        raise Http404("Unknown import")
+
+    file = request.FILES.get("file")
+    if not file:
+        return HttpResponseBadRequest("No file uploaded.")
+
+    upload_dir = settings.EXPORTS_DIR / "uploads"
+    upload_dir.mkdir(parents=True, exist_ok=True)
+    path = upload_dir / f"{uuid.uuid4().hex}.json"
+    with open(path, "wb") as f:
+        for chunk in file.chunks():
+            f.write(chunk)
+
+    return job_accepted(jobs.enqueue("import", {"entity": entity, "path": str(path)}, request.user))
+
+
+@login_required
+def job_status(request, job_id):
+    """Progress of a job; includes download_url once its file is ready"""
+    job = _own_job(request, job_id)
+    data = {
+        "job_id": job["id"],
+        "kind": job["kind"],
+        "status": job["status"],
+        "done": job["progress_done"],
+        "total": job["progress_total"],
+        "error": job["error_message"],
+        "created_at": job["created_at"],
+        "finished_at": job["finished_at"],
+    }
+    if job["status"] == "done" and (job["result"] or {}).get("file"):
+        data["download_url"] = reverse("job_download", args=[job["id"]])
+    return JsonResponse(data)
+
+
+@login_required
+def job_download(request, job_id):
+    job = _own_job(request, job_id)
+    result = job["result"] or {}
+    if job["status"] != "done" or not result.get("file"):
+        raise Http404("Nothing to download")
+
+    return FileResponse(
+        open(settings.EXPORTS_DIR / result["file"], "rb"),
+        as_attachment=True,
+        filename=result["filename"],
+        content_type=result["content_type"],
+    )
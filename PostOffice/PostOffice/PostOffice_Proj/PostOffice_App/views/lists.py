@@ -0,0 +1,59 @@
+# ==========================================================
+# LIST PAGES (deliveries, routes, invoices)
+# ==========================================================
+from datetime import date
+
+from django.contrib.auth.decorators import login_required
+from django.db import DatabaseError, transaction
+from django.http import Http404, HttpResponseBadRequest, HttpResponseForbidden, JsonResponse
+
+from .. import lists
+from .decorators import role_required
+
+# ?<name>=<value> -> parser
+FILTER_TYPES = {
+    "status": str,
+    "warehouse": int,
+    "driver": int,
+    "client": int,
+    "from": date.fromisoformat,
+    "to": date.fromisoformat,
+}
+
+# Drivers and clients only list their own rows
+OWN_FILTER = {"driver": "driver", "client": "client"}
+
+
+@login_required
+@role_required(["admin", "manager", "staff", "driver", "client"])
+def list_page(request, entity):
+    """One page of ?status=&warehouse=&driver=&client=&from=&to=&sort=newest|oldest&after=<cursor>"""
+    if entity not in lists.FILTERS:
+        raise Http404("Unknown list")
+    try:
+        filters = {
+            name: FILTER_TYPES[name](request.GET[name])
+            for name in lists.FILTERS[entity] if request.GET.get(name)
+        }
+        after = int(request.GET["after"]) if request.GET.get("after") else None
+    except ValueError:
+        return HttpResponseBadRequest("Invalid filter or cursor.")
+    sort = request.GET.get("sort", "newest")
+    if sort not in lists.SORTS:
+        return HttpResponseBadRequest("Invalid sort.")
+
+    own = OWN_FILTER.get(request.user.role)
+    if own is not None:
+        if own not in lists.FILTERS[entity]:
+            return HttpResponseForbidden("You do not have permission to view this page.")
+        filters[own] = request.user.id
+
+    try:
+        with transaction.atomic():
+            rows, cursor = lists.page(entity, filters, sort, after)
+    except DatabaseError:
+        # fn_list_* raises when the cursor row was deleted since the last page
+        if after is None:
+            raise
+        return HttpResponseBadRequest("The list changed: reload it from the first page.")
+    return JsonResponse({"entity": entity, "results": rows, "next": cursor})
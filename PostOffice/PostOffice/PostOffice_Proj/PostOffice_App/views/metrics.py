@@ -0,0 +1,14 @@
+# ==========================================================
+#  METRICS (Prometheus scrape endpoint)
+# ==========================================================
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden
+
+from .. import metrics
+
+
+def metrics_endpoint(request):
+    """All metrics in the Prometheus text format, for METRICS_ALLOWED_IPS only"""
+    if request.META.get("REMOTE_ADDR") not in settings.METRICS_ALLOWED_IPS:
+        return HttpResponseForbidden("Forbidden")
+    return HttpResponse(metrics.render(), content_type="text/plain; version=0.0.4; charset=utf-8")
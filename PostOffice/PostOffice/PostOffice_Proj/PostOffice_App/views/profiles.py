@@ -0,0 +1,46 @@
+# ==========================================================
+#  REQUEST PROFILES (admin page, see profiler.py)
+# ==========================================================
+import json
+
+from django.conf import settings
+from django.contrib.auth.decorators import login_required
+from django.http import Http404, HttpResponse
+from django.shortcuts import render
+
+from .. import profiler
+from .decorators import role_required
+
+# format -> (content type, file extension)
+DOWNLOAD_FORMATS = {
+    "folded": ("text/plain; charset=utf-8", "folded"),
+    "json": ("application/json", "json"),
+}
+
+
+@login_required
+@role_required(["admin"])
+def profiles_list(request):
+    """Stored captures, newest first, plus a fresh profiling token"""
+    return render(request, "profiles/list.html", {
+        "captures": profiler.list_captures(),
+        "token": profiler.make_token(request.user),
+        "param": profiler.PARAM,
+        "token_max_age": settings.PROFILER_TOKEN_MAX_AGE,
+        "max_captures": settings.PROFILER_MAX_CAPTURES,
+    })
+
+
+@login_required
+@role_required(["admin"])
+def profile_download(request, capture_id, fmt):
+    """A capture's stacks (folded, for flamegraph.pl / speedscope) or the whole capture as JSON"""
+    capture = profiler.load(capture_id)
+    if capture is None or fmt not in DOWNLOAD_FORMATS:
+        raise Http404("Profile not found")
+
+    content_type, extension = DOWNLOAD_FORMATS[fmt]
+    body = capture["folded"] if fmt == "folded" else json.dumps(capture, indent=2)
+    response = HttpResponse(body, content_type=content_type)
+    response["Content-Disposition"] = f'attachment; filename="profile_{capture_id}.{extension}"'
+    return response
@@ -0,0 +1,23 @@
+# ==========================================================
+# SEARCH (deliveries, clients, invoices)
+# ==========================================================
+from django.contrib.auth.decorators import login_required
+from django.http import Http404, JsonResponse
+
+from .. import search as search_module
+from .decorators import role_required
+
+
+@login_required
+@role_required(["admin", "manager", "staff"])
+def search(request):
+    """Ranked results of ?kind=<deliveries|clients|invoices>&q=<term>&page=<n>"""
+    kind = request.GET.get("kind", "deliveries")
+    if kind not in search_module.KINDS:
+        raise Http404("Unknown search kind")
+    try:
+        page = int(request.GET.get("page", 1))
+    except ValueError:
+        page = 1
+    results = search_module.search(kind, request.GET.get("q", ""), page)
+    return JsonResponse({"kind": kind, "page": page, "results": results})
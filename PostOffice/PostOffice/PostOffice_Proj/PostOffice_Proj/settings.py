@@ -10,6 +10,8 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import copy
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -41,11 +43,15 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'PostOffice_App.middleware.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'PostOffice_App.middleware.QueryTimingMiddleware',
+    'PostOffice_App.middleware.ReplicaPinMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'PostOffice_App.middleware.ProfilerMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -77,22 +83,69 @@ WSGI_APPLICATION = 'PostOffice_Proj.wsgi.application'
 # and provide the appropriate credentials for your PostgreSQL instance.
 # See https://docs.djangoproject.com/en/5.2/ref/settings/#databases for
 # additional options.
+#
+# Every value can be overridden with the DB_* environment variables below.
 DATABASES = {
     "default": {
         "ENGINE": "django.db.backends.postgresql",
         # Name of your PostgreSQL database (e.g. created via ``CREATE DATABASE PO;``)
-        "NAME": "PostOffice_DB",
+        "NAME": os.environ.get("DB_NAME", "PostOffice_DB"),
         # Database user account
-        "USER": "postgres",
+        "USER": os.environ.get("DB_USER", "postgres"),
         # Database user password
-        "PASSWORD": "postgres",
+        "PASSWORD": os.environ.get("DB_PASSWORD", "postgres"),
         # Host where PostgreSQL is running
-        "HOST": "localhost",
+        "HOST": os.environ.get("DB_HOST", "localhost"),
         # Port for PostgreSQL (default is 5432)
-        "PORT": "5432",
+        "PORT": os.environ.get("DB_PORT", "5432"),
     }
 }
 
+# Connection reuse, chosen with DB_CONN_MODE:
+#   "none"       - a new connection per request (Django's default)
+#   "persistent" - each worker thread keeps its connection for
+#                  DB_CONN_MAX_AGE seconds (None = forever), checked with
+#                  CONN_HEALTH_CHECKS before reuse after an error/idle
+#   "pool"       - psycopg 3 connection pool shared by the worker's threads
+#                  (pip install "psycopg[binary,pool]"); Django requires
+#                  CONN_MAX_AGE = 0 with a pool
+# Compare them with: python manage.py bench_connections
+DB_CONN_MODE = os.environ.get("DB_CONN_MODE", "persistent")
+
+if DB_CONN_MODE == "persistent":
+    _max_age = os.environ.get("DB_CONN_MAX_AGE", "600")
+    DATABASES["default"]["CONN_MAX_AGE"] = None if _max_age.lower() == "none" else int(_max_age)
+    DATABASES["default"]["CONN_HEALTH_CHECKS"] = True
+elif DB_CONN_MODE == "pool":
+    DATABASES["default"]["CONN_MAX_AGE"] = 0
+    DATABASES["default"]["OPTIONS"] = {
+        "pool": {
+            "min_size": int(os.environ.get("DB_POOL_MIN_SIZE", "2")),
+            "max_size": int(os.environ.get("DB_POOL_MAX_SIZE", "10")),
+            # Seconds a request waits for a free connection before failing
+            "timeout": float(os.environ.get("DB_POOL_TIMEOUT", "10")),
+        },
+    }
+elif DB_CONN_MODE != "none":
+    raise ValueError(f"Unknown DB_CONN_MODE: {DB_CONN_MODE!r} (use none, persistent or pool)")
+
+# Read replica (optional): set DB_REPLICA_HOST to send v_* / fn_get_* reads
+# and ORM reads to a streaming replica; writes always go to "default".
+# See PostOffice_App/routers.py.
+if os.environ.get("DB_REPLICA_HOST"):
+    DATABASES["replica"] = copy.deepcopy(DATABASES["default"])
+    DATABASES["replica"].update({
+        "HOST": os.environ["DB_REPLICA_HOST"],
+        "PORT": os.environ.get("DB_REPLICA_PORT", DATABASES["default"]["PORT"]),
+        "TEST": {"MIRROR": "default"},
+    })
+
+DATABASE_ROUTERS = ["PostOffice_App.routers.ReplicaRouter"]
+
+# After a write, the user's requests read from the primary for this long
+# (should exceed the replica's usual replication lag)
+DB_REPLICA_PIN_SECONDS = int(os.environ.get("DB_REPLICA_PIN_SECONDS", "5"))
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -150,4 +203,108 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 # AUTH
 # ==========================================
 LOGIN_URL = "login"
-LOGIN_REDIRECT_URL = "dashboard"
\ No newline at end of file
+LOGIN_REDIRECT_URL = "dashboard"
+
+# ==========================================
+# EXPORTS
+# ==========================================
+# Finished export files and uploaded import files
+EXPORTS_DIR = BASE_DIR / "exports"
+
+# Invoices rendered per xhtml2pdf call, and processes rendering in parallel
+PDF_EXPORT_CHUNK_SIZE = 50
+PDF_EXPORT_MAX_WORKERS = 4
+
+# Rendered single-invoice PDFs, keyed by invoice content (see pdf_cache.py)
+INVOICE_PDF_CACHE_DIR = BASE_DIR / "cache" / "invoice_pdfs"
+INVOICE_PDF_CACHE_MAX_BYTES = 256 * 1024 * 1024
+
+# ==========================================
+# BACKGROUND JOBS
+# ==========================================
+# Worker: python manage.py run_jobs (see jobs.py / jobs_objects.sql)
+JOB_BATCH_SIZE = 1000            # rows per fetch / per sp_import_* call
+JOB_POLL_INTERVAL = 1.0          # seconds between polls when the queue is empty
+JOB_STALE_AFTER_SECONDS = 900    # running job with no progress for this long is requeued
+JOB_MAX_ATTEMPTS = 3
+
+# ==========================================
+# DASHBOARD
+# ==========================================
+# Seconds a role's dashboard stats are served from the cache (see dashboard.py).
+# The counts are live in the DB, so this bounds their staleness on screen.
+DASHBOARD_CACHE_TTL = 30
+
+# ==========================================
+# DB INSTRUMENTATION
+# ==========================================
+# Per-request timing of every sp_* / fn_* / v_* call (see instrumentation.py)
+# Server-Timing exposes object names, so it is only sent in development
+DB_SERVER_TIMING = DEBUG
+DB_SERVER_TIMING_LIMIT = 10      # slowest objects listed in the header
+# Calls slower than this (ms) are logged, reads with EXPLAIN (ANALYZE, BUFFERS)
+DB_SLOW_CALL_MS = int(os.environ.get("DB_SLOW_CALL_MS", "200"))
+# At most one EXPLAIN per object in this window (run off the request path)
+DB_EXPLAIN_INTERVAL_SECONDS = int(os.environ.get("DB_EXPLAIN_INTERVAL_SECONDS", "300"))
+
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "handlers": {
+        "console": {"class": "logging.StreamHandler"},
+    },
+    "loggers": {
+        # One JSON line per request, plus one per slow call
+        "PostOffice_App.db": {
+            "handlers": ["console"],
+            "level": os.environ.get("DB_LOG_LEVEL", "INFO"),
+            "propagate": False,
+        },
+    },
+}
+
+# ==========================================
+# METRICS
+# ==========================================
+# Prometheus text format at /metrics (see metrics.py), for these addresses only
+METRICS_ALLOWED_IPS = os.environ.get("METRICS_ALLOWED_IPS", "127.0.0.1,::1").split(",")
+# Server-side time limit (maxTimeMS) for the MongoDB backlog count in a scrape
+METRICS_MONGO_TIMEOUT_MS = 500
+
+# ==========================================
+# PROFILER
+# ==========================================
+# Admin-only request profiling with a signed X-Profile header or
+# ?_profile= token, valid only in the session of the admin it was issued
+# to (see profiler.py); captures are listed at /profiles/
+PROFILER_DIR = BASE_DIR / "profiles"
+PROFILER_MAX_CAPTURES = 50       # ring buffer size, oldest captures are deleted
+PROFILER_INTERVAL_MS = 5         # stack sampling interval
+PROFILER_TOKEN_MAX_AGE = 3600    # seconds a profiling token stays valid
+
+# ==========================================
+# MONGODB (notifications)
+# ==========================================
+# Connected on first use (see notifications.py)
+MONGO_URL = os.environ.get("MONGO_URL", "mongodb://localhost:27017")
+MONGO_DB_NAME = os.environ.get("MONGO_DB_NAME", "postoffice")
+
+# ==========================================
+# AUTOCOMPLETE (form pickers)
+# ==========================================
+# Options are fetched as the user types (see autocomplete.py)
+AUTOCOMPLETE_MIN_CHARS = 2
+AUTOCOMPLETE_LIMIT = 20
+
+# ==========================================
+# SEARCH (deliveries, clients, invoices)
+# ==========================================
+# Ranked full-text + trigram search (see search.py)
+SEARCH_MIN_CHARS = 3
+SEARCH_PAGE_SIZE = 25
+
+# ==========================================
+# LIST PAGES (deliveries, routes, invoices)
+# ==========================================
+# Filtered, keyset-paginated (see lists.py)
+LIST_PAGE_SIZE = 25
@@ -0,0 +1,29 @@
+"""
+Production settings for PostOffice_Proj: the development settings with
+DEBUG off and the secrets taken from the environment.
+
+Use it for the web server and for long-running commands (run_jobs,
+generate_data, imports):
+    DJANGO_SETTINGS_MODULE=PostOffice_Proj.settings_production
+
+With DEBUG = True Django keeps every executed statement, with its
+parameters, in connection.queries: the full JSON of each sp_import_*
+batch in a long import.
+"""
+
+import os
+
+from .settings import *  # noqa: F401,F403
+
+DEBUG = False
+
+SECRET_KEY = os.environ["DJANGO_SECRET_KEY"]
+ALLOWED_HOSTS = [host for host in os.environ.get("DJANGO_ALLOWED_HOSTS", "").split(",") if host]
+
+SESSION_COOKIE_SECURE = True
+CSRF_COOKIE_SECURE = True
+
+# ==========================================
+# Settings derived from DEBUG in settings.py
+# ==========================================
+DB_SERVER_TIMING = False
@@ -0,0 +1,133 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+from datetime import datetime, timezone
+from pathlib import Path
+
+import harness
+
+# ==========================================================
+#  ORM vs DB OBJECTS: COMPARISON REPORT
+# ==========================================================
+# Loads the same synthetic data set into two benchmark databases (one per
+# side), runs every operation through the old Django ORM project and
+# through this project's DB objects, and reports per operation:
+# latency (p50), queries sent and PostgreSQL backend CPU, flagging the
+# operations where the DB objects path is slower than the ORM.
+#
+#   python benchmarks/compare.py --reset            first run (loads both databases)
+#   python benchmarks/compare.py --only invoice_list
+#   python benchmarks/compare.py --fail-on-regression   (exit status 1 on a regression)
+#
+# The app's own database is never touched (BENCH_DB_NAME / BENCH_ORM_DB_NAME).
+
+BENCH_DIR = Path(__file__).resolve().parent
+
+
+def _side(script, command, *args):
+    """Runs one side in its own interpreter; returns its JSON output, if any."""
+    completed = subprocess.run(
+        [sys.executable, str(BENCH_DIR / script), command, *args],
+        stdout=subprocess.PIPE, text=True, check=True, env=os.environ.copy(),
+    )
+    return json.loads(completed.stdout) if command == "run" else None
+
+
+def _ratio(orm, new):
+    return round(orm / new, 2) if new else None
+
+
+def compare(orm_results, db_results, threshold):
+    """
+    Per operation: both measurements, the speed-up (ORM p50 / DB objects p50)
+    and whether the DB objects p50 is more than `threshold` slower.
+    """
+    report = {}
+    for name in harness.OPERATIONS:
+        orm, new = orm_results.get(name), db_results.get(name)
+        if not orm or not new:
+            continue
+        report[name] = {
+            "orm": orm,
+            "db_objects": new,
+            "speedup": _ratio(orm["p50_ms"], new["p50_ms"]),
+            "regressed": new["p50_ms"] > orm["p50_ms"] * (1 + threshold),
+        }
+    return report
+
+
+def _cpu(result):
+    return "-" if result["db_cpu_ms"] is None else f"{result['db_cpu_ms']:.2f}"
+
+
+def print_report(report):
+    print(f"{'operation':<20} {'ORM p50':>10} {'DB p50':>10} {'speedup':>8} "
+          f"{'queries':>13} {'DB CPU ms':>15}")
+    for name, row in report.items():
+        orm, new = row["orm"], row["db_objects"]
+        print(
+            f"{name:<20} {orm['p50_ms']:>10.3f} {new['p50_ms']:>10.3f} {row['speedup'] or 0:>7.2f}x "
+            f"{orm['queries']:>6g} -> {new['queries']:<4g} {_cpu(orm):>7} -> {_cpu(new):<6}"
+            + ("  REGRESSED" if row["regressed"] else "")
+        )
+    regressed = [name for name, row in report.items() if row["regressed"]]
+    print(f"Regressed: {', '.join(regressed)}" if regressed else "No regressions.")
+    return regressed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compares the Django ORM project with the DB objects project.")
+    parser.add_argument("--reset", action="store_true", help="Drop and reload both benchmark databases.")
+    parser.add_argument("--skip-setup", action="store_true", help="Use the databases as they are.")
+    parser.add_argument("--deliveries", type=int, default=200_000)
+    parser.add_argument("--invoices", type=int, default=60_000)
+    parser.add_argument("--iterations", type=int, default=100)
+    parser.add_argument("--warmup", type=int, default=5)
+    parser.add_argument("--import-rows", type=int, default=200)
+    parser.add_argument("--export-rows", type=int, default=10_000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--only", nargs="+", choices=harness.OPERATIONS)
+    parser.add_argument("--threshold", type=float, default=0.10,
+                        help="Relative p50 slowdown that counts as a regression (default 0.10 = 10%%).")
+    parser.add_argument("--output", help="JSON file (default: bench_results/compare_<timestamp>.json).")
+    parser.add_argument("--fail-on-regression", action="store_true")
+    args = parser.parse_args()
+
+    if not args.skip_setup:
+        reset = ["--reset"] if args.reset else []
+        # The ORM side copies the DB objects data set, so it loads second
+        _side("db_side.py", "setup", *reset, "--deliveries", str(args.deliveries),
+              "--invoices", str(args.invoices), "--seed", str(args.seed))
+        _side("orm_side.py", "setup", *reset)
+
+    run = ["--iterations", str(args.iterations), "--warmup", str(args.warmup),
+           "--import-rows", str(args.import_rows), "--export-rows", str(args.export_rows), "--seed", str(args.seed)]
+    if args.only:
+        run += ["--only", *args.only]
+    started_at = datetime.now(timezone.utc)
+    print("Django ORM:", file=sys.stderr)
+    orm_results = _side("orm_side.py", "run", *run)
+    print("DB objects:", file=sys.stderr)
+    db_results = _side("db_side.py", "run", *run)
+
+    report = compare(orm_results, db_results, args.threshold)
+    regressed = print_report(report)
+
+    output = Path(args.output or harness.PROJECT_DIR / "bench_results" / f"compare_{started_at:%Y%m%d_%H%M%S}.json")
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps({
+        "started_at": started_at.isoformat(),
+        "options": {k: v for k, v in vars(args).items() if k not in ("output", "only")},
+        "regressed": regressed,
+        "results": report,
+    }, indent=2), encoding="utf-8")
+    print(f"Results saved to {output}")
+
+    if regressed and args.fail_on_regression:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
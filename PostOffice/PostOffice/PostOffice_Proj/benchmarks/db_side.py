@@ -0,0 +1,114 @@
+import json
+import os
+import sys
+
+import harness
+
+# ==========================================================
+#  DB OBJECTS SIDE (this project: sp_* / fn_* / v_*)
+# ==========================================================
+# python benchmarks/db_side.py setup [--reset]   creates BENCH_DB_NAME and
+#     loads the schema (migrations, DDL.sql, *_objects.sql) and a synthetic
+#     data set (generate_data, scaled down)
+# python benchmarks/db_side.py run               measures the operations
+#
+# Usually run through compare.py.
+
+SQL_FILES = ("DDL.sql", "david_objects.sql", "diego_objects.sql", "rodrigo_objects.sql", "jobs_objects.sql")
+
+# Always the benchmark database on the primary, never the app's own data
+os.environ["DB_NAME"] = os.environ.get("BENCH_DB_NAME", "PostOffice_Bench")
+os.environ.pop("DB_REPLICA_HOST", None)
+harness.bootstrap(harness.PROJECT_DIR)
+
+from django.core.management import call_command  # noqa: E402
+from django.core.serializers.json import DjangoJSONEncoder  # noqa: E402
+from django.db import connection  # noqa: E402
+
+from PostOffice_App import db  # noqa: E402
+
+
+def setup(args):
+    created = harness.ensure_database(args.reset)
+    if not created and "delivery" in connection.introspection.table_names():
+        print(f"{connection.settings_dict['NAME']} is already loaded (use --reset to reload)", file=sys.stderr)
+        return
+
+    call_command("migrate", verbosity=0)
+    with connection.cursor() as cursor:
+        for name in SQL_FILES:
+            print(f"Running {name}...", file=sys.stderr)
+            cursor.execute((harness.REPO_DIR / name).read_text(encoding="utf-8"))
+
+    call_command(
+        "generate_data",
+        deliveries=args.deliveries,
+        invoices=args.invoices,
+        clients=max(args.deliveries // 50, 100),
+        routes=max(args.deliveries // 20, 100),
+        seed=args.seed,
+        stdout=sys.stderr,
+    )
+
+
+def operations(args):
+    registered = harness.scalar_list("SELECT id FROM delivery WHERE status = 'registered' ORDER BY id LIMIT 1000")
+    if not registered:
+        raise SystemExit("No data in the benchmark database: run 'setup' first")
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT driver_id, route_id, inv_id, client_id, war_id FROM delivery WHERE id = %s",
+                       [registered[0]])
+        driver_id, route_id, inv_id, client_id, war_id = cursor.fetchone()
+    staff_id = harness.scalar_list("SELECT id FROM employee_staff ORDER BY id LIMIT 1")[0]
+    runs = args.iterations + args.warmup
+    delivery_pages = harness.offsets(harness.scalar_list("SELECT COUNT(*) FROM delivery")[0], runs, args.seed)
+    invoice_pages = harness.offsets(harness.scalar_list("SELECT COUNT(*) FROM invoice")[0], runs, args.seed + 1)
+    refs = {"driver_id": driver_id, "route_id": route_id, "inv_id": inv_id, "client_id": client_id, "war_id": war_id}
+
+    def create_delivery(i):
+        fields = harness.new_delivery(i)
+        harness.rolled_back(lambda: db.call(
+            "sp_create_delivery",
+            [driver_id, route_id, inv_id, client_id, war_id, *fields.values(), "registered", "normal", None, None],
+        ))
+
+    def status_update(i):
+        harness.rolled_back(lambda: db.call(
+            "sp_update_delivery_status", [registered[i % len(registered)], "ready", staff_id, None, "benchmark"],
+        ))
+
+    def list_deliveries(i):
+        return len(db.fetch_all("deliveries_page", [harness.PAGE_SIZE, delivery_pages[i]]))
+
+    def invoice_list(i):
+        with db.read_connection().cursor() as cursor:
+            cursor.execute(
+                "SELECT * FROM v_invoices_with_items ORDER BY created_at DESC LIMIT %s OFFSET %s",
+                [harness.PAGE_SIZE, invoice_pages[i]],
+            )
+            return len(db.fetch_records(cursor))
+
+    def dashboard_admin(i):
+        db.fetch_value("dashboard_stats_json", [staff_id, "admin"])
+
+    def import_deliveries(i):
+        payload = json.dumps([dict(harness.new_delivery(i, n), **refs) for n in range(args.import_rows)])
+        harness.rolled_back(lambda: db.call("sp_import_deliveries", [payload]))
+
+    def export_deliveries(i):
+        sql = f"SELECT * FROM v_deliveries_export LIMIT {int(args.export_rows)}"
+        return len(json.dumps([record._asdict() for record in db.stream(sql)], cls=DjangoJSONEncoder))
+
+    return {
+        "create_delivery": create_delivery,
+        "status_update": status_update,
+        "list_deliveries": list_deliveries,
+        "invoice_list": invoice_list,
+        "dashboard_admin": dashboard_admin,
+        "import_deliveries": (import_deliveries, max(3, args.iterations // 10)),
+        "export_deliveries": (export_deliveries, max(3, args.iterations // 20)),
+    }
+
+
+if __name__ == "__main__":
+    harness.main(setup, operations)
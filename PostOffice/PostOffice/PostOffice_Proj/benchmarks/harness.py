@@ -0,0 +1,233 @@
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import time
+from pathlib import Path
+
+# ==========================================================
+#  ORM vs DB OBJECTS: SHARED HARNESS
+# ==========================================================
+# Both sides of the comparison (db_side.py: this project, orm_side.py: the
+# old Django ORM project in x.OLD_PROJECT_USING_DjangoORM) import this
+# module. Each side runs in its own process, because both projects are
+# called PostOffice_Proj / PostOffice_App and cannot share one interpreter.
+#
+# Every operation is measured for latency, the number of queries it sent
+# (CaptureQueriesContext) and the CPU time the PostgreSQL backend spent on
+# it (/proc/<backend pid>/stat, only when PostgreSQL runs on this host).
+# compare.py runs both sides and reports the regressions.
+
+PROJECT_DIR = Path(__file__).resolve().parent.parent
+REPO_DIR = PROJECT_DIR.parents[2]
+ORM_PROJECT_DIR = REPO_DIR / "x.OLD_PROJECT_USING_DjangoORM" / "PostOffice" / "PostOffice_Proj"
+
+# Operation names, in report order; both sides implement all of them
+OPERATIONS = (
+    "create_delivery", "status_update", "list_deliveries", "invoice_list",
+    "dashboard_admin", "import_deliveries", "export_deliveries",
+)
+
+# Same as the list pages of the app
+PAGE_SIZE = 25
+
+try:
+    CLOCK_TICKS = os.sysconf("SC_CLK_TCK")
+except (AttributeError, ValueError, OSError):
+    CLOCK_TICKS = None
+
+
+def bootstrap(project_dir, configure=None):
+    """
+    Sets up Django for one of the two projects. configure(settings_module)
+    may change the settings before the apps are loaded.
+    """
+    sys.path.insert(0, str(project_dir))
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "PostOffice_Proj.settings")
+    if configure:
+        import importlib
+
+        configure(importlib.import_module(os.environ["DJANGO_SETTINGS_MODULE"]))
+
+    import django
+
+    django.setup()
+
+
+def ensure_database(reset=False):
+    """
+    Creates the benchmark database of the default connection if missing
+    (dropping it first with reset). Returns True if it was created.
+    """
+    from django.db import connection
+
+    name = connection.settings_dict["NAME"]
+    quoted = connection.ops.quote_name(name)
+    with connection._nodb_cursor() as cursor:
+        if reset:
+            cursor.execute(f"DROP DATABASE IF EXISTS {quoted} WITH (FORCE)")
+        cursor.execute("SELECT 1 FROM pg_database WHERE datname = %s", [name])
+        if cursor.fetchone():
+            return False
+        cursor.execute(f"CREATE DATABASE {quoted}")
+    return True
+
+
+class Rollback(Exception):
+    """Raised inside a write operation so its changes are never committed."""
+
+
+def rolled_back(func):
+    """Runs func() in a transaction that is always rolled back."""
+    from django.db import transaction
+
+    try:
+        with transaction.atomic():
+            func()
+            raise Rollback
+    except Rollback:
+        pass
+
+
+def backend_cpu_seconds(connection):
+    """
+    CPU time (user + system) used so far by the connection's PostgreSQL
+    backend process, or None when it cannot be read from here.
+    """
+    if CLOCK_TICKS is None:
+        return None
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT pg_backend_pid()")
+        pid = cursor.fetchone()[0]
+    proc = Path(f"/proc/{pid}")
+    try:
+        # A pid of another host or container may belong to anything
+        if not proc.joinpath("comm").read_text().startswith("postgres"):
+            return None
+        fields = proc.joinpath("stat").read_text().rsplit(")", 1)[1].split()
+    except OSError:
+        return None
+    # utime and stime are fields 14 and 15 of /proc/<pid>/stat
+    return (int(fields[11]) + int(fields[12])) / CLOCK_TICKS
+
+
+def _percentile(ordered, pct):
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def measure(run, iterations, warmup):
+    """
+    Runs run(i) warmup + iterations times.
+
+    Returns:
+        dict: latency percentiles (ms), queries per run and DB CPU ms per run
+    """
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+
+    for i in range(warmup):
+        run(i)
+
+    latencies = []
+    queries = 0
+    cpu_before = backend_cpu_seconds(connection)
+    for i in range(iterations):
+        with CaptureQueriesContext(connection) as captured:
+            started = time.perf_counter()
+            run(warmup + i)
+            latencies.append((time.perf_counter() - started) * 1000)
+        queries += len(captured)
+    cpu_after = backend_cpu_seconds(connection)
+
+    latencies.sort()
+    return {
+        "iterations": iterations,
+        "p50_ms": round(_percentile(latencies, 50), 3),
+        "p95_ms": round(_percentile(latencies, 95), 3),
+        "p99_ms": round(_percentile(latencies, 99), 3),
+        "mean_ms": round(statistics.fmean(latencies), 3),
+        "queries": round(queries / iterations, 1),
+        "db_cpu_ms": (
+            round((cpu_after - cpu_before) * 1000 / iterations, 3)
+            if cpu_before is not None and cpu_after is not None else None
+        ),
+    }
+
+
+def offsets(total, count, seed):
+    """Page offsets to list: first pages plus deep pages, the same on both sides."""
+    rng = random.Random(seed)
+    last = max(total - PAGE_SIZE, 1)
+    return [rng.choice((0, PAGE_SIZE, rng.randrange(last))) for _ in range(count)]
+
+
+def new_delivery(i, n=0):
+    """
+    Fields of a delivery created or imported by a benchmark run, unique per
+    (i, n). Keys are in sp_create_delivery parameter order.
+    """
+    return {
+        "tracking_number": f"BENCH-{i}-{n}",
+        "description": "benchmark",
+        "sender_name": "Ana Silva",
+        "sender_address": "Rua das Flores 1, Lisboa",
+        "sender_phone": "912345678",
+        "sender_email": "ana.silva@example.com",
+        "recipient_name": "Bruno Santos",
+        "recipient_address": "Rua Augusta 2, Porto",
+        "recipient_phone": "923456789",
+        "recipient_email": "bruno.santos@example.com",
+        "item_type": "package",
+        "weight": 1200,
+        "dimensions": "30x20x10",
+    }
+
+
+def scalar_list(sql, params=None):
+    from django.db import connection
+
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return [row[0] for row in cursor.fetchall()]
+
+
+def main(setup, operations):
+    """
+    Command line of a side:
+        setup [--reset] ...   creates and loads its benchmark database
+        run ...               measures every operation, prints JSON to stdout
+
+    setup(args) and operations(args) -> {name: run(i) or (run(i), iterations)}
+    are provided by the side.
+    """
+    parser = argparse.ArgumentParser()
+    commands = parser.add_subparsers(dest="command", required=True)
+    load = commands.add_parser("setup")
+    load.add_argument("--reset", action="store_true", help="Drop and reload the benchmark database.")
+    load.add_argument("--deliveries", type=int, default=200_000)
+    load.add_argument("--invoices", type=int, default=60_000)
+    load.add_argument("--seed", type=int, default=42)
+    bench = commands.add_parser("run")
+    bench.add_argument("--iterations", type=int, default=100)
+    bench.add_argument("--warmup", type=int, default=5)
+    bench.add_argument("--import-rows", type=int, default=200)
+    bench.add_argument("--export-rows", type=int, default=10_000)
+    bench.add_argument("--seed", type=int, default=42)
+    bench.add_argument("--only", nargs="+", choices=OPERATIONS)
+    args = parser.parse_args()
+
+    if args.command == "setup":
+        setup(args)
+        return
+
+    results = {}
+    for name, op in operations(args).items():
+        if args.only and name not in args.only:
+            continue
+        run, iterations = op if isinstance(op, tuple) else (op, args.iterations)
+        results[name] = measure(run, iterations, args.warmup)
+        print(f"  {name:<20} p50 {results[name]['p50_ms']:9.3f} ms", file=sys.stderr)
+    json.dump(results, sys.stdout)
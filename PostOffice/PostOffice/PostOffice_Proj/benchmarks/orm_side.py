@@ -0,0 +1,295 @@
+import json
+import os
+import sys
+from datetime import datetime, timedelta
+
+import harness
+
+# ==========================================================
+#  DJANGO ORM SIDE (x.OLD_PROJECT_USING_DjangoORM)
+# ==========================================================
+# python benchmarks/orm_side.py setup [--reset]   creates BENCH_ORM_DB_NAME,
+#     migrates the old project and copies the data set of BENCH_DB_NAME
+#     (loaded by db_side.py) into its models, keeping the ids
+# python benchmarks/orm_side.py run               measures the operations,
+#     the way the old views did them (forms, querysets, Paginator)
+#
+# Usually run through compare.py.
+
+BATCH_SIZE = 5000
+
+# New status codes -> old Delivery.STATUS_CHOICES
+STATUSES = {
+    "registered": "Registered", "ready": "Ready", "pending": "Pending",
+    "in_transit": "In Transit", "completed": "Completed", "cancelled": "Cancelled",
+}
+
+
+def _configure(settings):
+    source = os.environ.get("BENCH_DB_NAME", "PostOffice_Bench")
+    settings.DATABASES["default"]["NAME"] = os.environ.get("BENCH_ORM_DB_NAME", "PostOffice_Bench_ORM")
+    # Read only, by setup(): the data set to copy
+    settings.DATABASES["source"] = dict(settings.DATABASES["default"], NAME=source)
+
+
+harness.bootstrap(harness.ORM_PROJECT_DIR, _configure)
+
+from django.core.management import call_command  # noqa: E402
+from django.core.management.color import no_style  # noqa: E402
+from django.core.paginator import Paginator  # noqa: E402
+from django.db import connection, connections, transaction  # noqa: E402
+from django.db.models import DecimalField, ExpressionWrapper, F, Sum  # noqa: E402
+from django.forms.models import model_to_dict  # noqa: E402
+from django.shortcuts import get_object_or_404  # noqa: E402
+
+from PostOffice_App.forms import DeliveryForm  # noqa: E402
+from PostOffice_App.models import (  # noqa: E402
+    Delivery, Employee, EmployeeDriver, EmployeeStaff, Invoice, InvoiceItem, Route, User, Vehicle, Warehouse,
+)
+
+MODELS = (User, Employee, EmployeeDriver, EmployeeStaff, Warehouse, Vehicle, Route, Invoice, InvoiceItem, Delivery)
+
+
+# ----------------------------------------------------------
+#  Setup: copy the DB objects data set into the old models
+# ----------------------------------------------------------
+
+def _copy(model, sql, build):
+    count = 0
+    source = connections["source"]
+    with transaction.atomic(using="source"), source.chunked_cursor() as cursor:
+        cursor.execute(sql)
+        while rows := cursor.fetchmany(BATCH_SIZE):
+            model.objects.bulk_create([build(*row) for row in rows])
+            count += len(rows)
+    print(f"  {model._meta.db_table:<40} {count:>10,} rows", file=sys.stderr)
+
+
+def _time(value):
+    return value.time() if isinstance(value, datetime) else value
+
+
+def _duration(value):
+    # TIME in DDL.sql, DurationField in the old model
+    if value is None or isinstance(value, timedelta):
+        return value
+    return timedelta(hours=value.hour, minutes=value.minute, seconds=value.second)
+
+
+def _routes():
+    # The old model has unique_together (driver, vehicle, delivery_date),
+    # which the new schema does not enforce: clashing routes lose the vehicle
+    seen = set()
+
+    def build(id, description, status, day, start, end, duration, kms, notes, driver_id, vehicle_id,
+              war_name, war_address, war_contact):
+        if (driver_id, vehicle_id, day) in seen:
+            vehicle_id = None
+        seen.add((driver_id, vehicle_id, day))
+        return Route(
+            id=id, description=description, delivery_status=status, delivery_date=day,
+            delivery_start_time=_time(start), delivery_end_time=_time(end), expected_duration=_duration(duration),
+            kms_travelled=kms or 0, driver_notes=notes or "", driver_id=driver_id, vehicle_id=vehicle_id,
+            origin_name=war_name, origin_address=war_address or "", origin_contact=war_contact or "",
+            destination_name=description, destination_address="",
+        )
+    return build
+
+
+def setup(args):
+    created = harness.ensure_database(args.reset)
+    if not created and "PostOffice_App_delivery" in connection.introspection.table_names():
+        print(f"{connection.settings_dict['NAME']} is already loaded (use --reset to reload)", file=sys.stderr)
+        return
+
+    call_command("migrate", verbosity=0)
+    print("Copying the data set:", file=sys.stderr)
+    with transaction.atomic():
+        _copy(User, (
+            'SELECT u.id, u.password, u.username, u.first_name, u.last_name, u.email, u.is_superuser, u.is_staff, '
+            'u.is_active, u.contact, u.address, c.tax_id, u.role, u.created_at '
+            'FROM "USER" u LEFT JOIN client c ON c.id = u.id ORDER BY u.id'
+        ), lambda id, password, username, first, last, email, superuser, staff, active, contact, address, tax_id,
+                  role, created: User(
+            id=id, password=password, username=username, first_name=first, last_name=last, email=email,
+            is_superuser=superuser, is_staff=staff, is_active=active, date_joined=created,
+            full_name=f"{first} {last}", contact=contact or "", address=address or "", tax_id=tax_id or "",
+            role=role,
+        ))
+        _copy(Employee, (
+            "SELECT id, emp_position, schedule, wage, is_active, hire_date FROM employee ORDER BY id"
+        ), lambda id, position, schedule, wage, active, hired: Employee(
+            id=id, user_id=id, position=position.capitalize(), schedule=schedule or "", wage=wage,
+            is_active=active, hire_date=hired,
+        ))
+        _copy(EmployeeDriver, (
+            "SELECT id, license_number, license_category, license_expiry_date, driving_experience_years, "
+            "driver_status FROM employee_driver ORDER BY id"
+        ), lambda id, number, category, expiry, years, status: EmployeeDriver(
+            id=id, employee_id=id, license_number=number, license_category=category,
+            license_expiry_date=expiry, driving_experience_years=years, driver_status=status,
+        ))
+        _copy(EmployeeStaff, "SELECT id, department FROM employee_staff ORDER BY id",
+              lambda id, department: EmployeeStaff(id=id, employee_id=id, department=department))
+        _copy(Warehouse, (
+            "SELECT id, name, address, contact, schedule_open, schedule_close, maximum_storage_capacity "
+            "FROM warehouse ORDER BY id"
+        ), lambda id, name, address, contact, opens, closes, capacity: Warehouse(
+            id=id, name=name, address=address, contact=contact, po_schedule_open=opens,
+            po_schedule_close=closes, maximum_storage_capacity=capacity,
+        ))
+        _copy(Vehicle, (
+            "SELECT id, vehicle_type, plate_number, capacity, brand, model, vehicle_status, year, fuel_type, "
+            "last_maintenance_date FROM vehicle ORDER BY id"
+        ), lambda id, kind, plate, capacity, brand, model, status, year, fuel, maintained: Vehicle(
+            id=id, vehicle_type=kind, plate_number=plate, capacity=capacity, brand=brand, model=model,
+            vehicle_status=status, year=year, fuel_type=fuel, last_maintenance_date=maintained,
+        ))
+        _copy(Route, (
+            "SELECT r.id, r.description, r.delivery_status, r.delivery_date, r.delivery_start_time, "
+            "r.delivery_end_time, r.expected_duration, r.kms_travelled, r.driver_notes, r.driver_id, "
+            "r.vehicle_id, w.name, w.address, w.contact FROM route r JOIN warehouse w ON w.id = r.war_id "
+            "ORDER BY r.id"
+        ), _routes())
+        _copy(Invoice, (
+            "SELECT id, client_id, status, type, quantity, created_at, cost, paid, pay_method, name, address, "
+            "contact FROM invoice ORDER BY id"
+        ), lambda id, client_id, status, kind, quantity, created, cost, paid, method, name, address, contact: Invoice(
+            id_invoice=id, user_id=client_id, invoice_status=status, invoice_type=kind, quantity=quantity,
+            invoice_datetime=created, cost=cost, paid=paid, payment_method=method, name=name or "",
+            address=address or "", contact=contact or "",
+        ))
+        _copy(InvoiceItem, (
+            "SELECT id, inv_id, shipment_type, weight, delivery_speed, quantity, unit_price, notes "
+            "FROM invoice_item ORDER BY id"
+        ), lambda id, inv_id, kind, weight, speed, quantity, price, notes: InvoiceItem(
+            id_item=id, invoice_id=inv_id, shipment_type=kind, weight=weight, delivery_speed=speed,
+            quantity=quantity, unit_price=price, notes=notes or "",
+        ))
+        _copy(Delivery, (
+            "SELECT id, inv_id, tracking_number, description, sender_name, sender_address, sender_phone, "
+            "sender_email, recipient_name, recipient_address, recipient_phone, recipient_email, item_type, "
+            "weight, dimensions, status, priority, created_at, updated_at, in_transition, "
+            "delivery_date::DATE, driver_id, client_id, route_id FROM delivery ORDER BY id"
+        ), lambda id, inv_id, tracking, description, s_name, s_address, s_phone, s_email, r_name, r_address,
+                  r_phone, r_email, item_type, weight, dimensions, status, priority, created, updated, moving,
+                  day, driver_id, client_id, route_id: Delivery(
+            id=id, invoice_id=inv_id, tracking_number=tracking, description=description or "",
+            sender_name=s_name, sender_address=s_address, sender_phone=s_phone or "",
+            sender_email=s_email or "", recipient_name=r_name, recipient_address=r_address,
+            recipient_phone=r_phone or "", recipient_email=r_email or "", item_type=item_type, weight=weight,
+            dimensions=dimensions or "", status=STATUSES[status], priority=priority, registered_at=created,
+            updated_at=updated, in_transition=moving, destination=r_address, delivery_date=day,
+            driver_id=driver_id, client_id=client_id, route_id=route_id,
+        ))
+
+        # Explicit ids: move the sequences past them
+        with connection.cursor() as cursor:
+            for sql in connection.ops.sequence_reset_sql(no_style(), MODELS):
+                cursor.execute(sql)
+            cursor.execute("ANALYZE")
+
+
+# ----------------------------------------------------------
+#  Operations, as the old views ran them
+# ----------------------------------------------------------
+
+def operations(args):
+    registered = list(
+        Delivery.objects.filter(status="Registered").order_by("id").values_list("id", flat=True)[:1000]
+    )
+    if not registered:
+        raise SystemExit("No data in the benchmark database: run 'setup' first")
+    refs = Delivery.objects.values("driver_id", "route_id", "invoice_id", "client_id").get(pk=registered[0])
+    runs = args.iterations + args.warmup
+    delivery_pages = harness.offsets(Delivery.objects.count(), runs, args.seed)
+    invoice_pages = harness.offsets(Invoice.objects.count(), runs, args.seed + 1)
+
+    def save(form):
+        if not form.is_valid():
+            raise ValueError(form.errors.as_json())
+        form.save()
+
+    def create_delivery(i):
+        # deliveries_create
+        data = dict(
+            harness.new_delivery(i), status="Registered", priority="normal", invoice=refs["invoice_id"],
+            driver=refs["driver_id"], client=refs["client_id"], route=refs["route_id"],
+        )
+        harness.rolled_back(lambda: save(DeliveryForm(data)))
+
+    def status_update(i):
+        # deliveries_edit
+        def edit():
+            delivery = get_object_or_404(Delivery, pk=registered[i % len(registered)])
+            save(DeliveryForm(dict(model_to_dict(delivery), status="Ready"), instance=delivery))
+        harness.rolled_back(edit)
+
+    def list_deliveries(i):
+        # deliveries_list (admin)
+        deliveries = Delivery.objects.select_related("driver", "client", "route").all()
+        page = Paginator(deliveries, harness.PAGE_SIZE).get_page(delivery_pages[i] // harness.PAGE_SIZE + 1)
+        return len(list(page))
+
+    def invoice_list(i):
+        # invoice_list (admin), one page of it: the view itself loaded every invoice
+        offset = invoice_pages[i]
+        invoices = Invoice.objects.prefetch_related("items").order_by("-invoice_datetime")[
+            offset:offset + harness.PAGE_SIZE
+        ]
+        rows = 0
+        for inv in invoices:
+            items = inv.items.annotate(
+                total_price=ExpressionWrapper(
+                    F("quantity") * F("unit_price"), output_field=DecimalField(max_digits=10, decimal_places=2)
+                )
+            )
+            inv.subtotal = items.aggregate(subtotal=Sum("total_price"))["subtotal"] or 0
+            rows += 1
+        return rows
+
+    def dashboard_admin(i):
+        # dashboard (admin): seven COUNT queries
+        stats = {
+            "total_vehicles": Vehicle.objects.count(),
+            "total_deliveries": Delivery.objects.count(),
+            "total_clients": User.objects.filter(role="client").count(),
+            "total_employees": Employee.objects.count(),
+            "active_routes": Route.objects.exclude(delivery_status__in=["Completed", "Cancelled"]).count(),
+            "pending_deliveries": Delivery.objects.filter(status="Pending").count(),
+            "total_invoices": Invoice.objects.count(),
+        }
+        return len(stats)
+
+    def import_deliveries(i):
+        # deliveries_import_json
+        def load():
+            for n in range(args.import_rows):
+                Delivery.objects.create(
+                    **harness.new_delivery(i, n), status="Registered", priority="normal",
+                    driver_id=refs["driver_id"], client_id=refs["client_id"], route_id=refs["route_id"],
+                    invoice_id=refs["invoice_id"],
+                )
+        harness.rolled_back(load)
+
+    def export_deliveries(i):
+        # deliveries_export_json
+        cleaned = []
+        for d in Delivery.objects.all().values()[:args.export_rows]:
+            cleaned.append({key: value.isoformat() if hasattr(value, "isoformat") else value
+                            for key, value in d.items()})
+        return len(json.dumps(cleaned))
+
+    return {
+        "create_delivery": create_delivery,
+        "status_update": status_update,
+        "list_deliveries": list_deliveries,
+        "invoice_list": invoice_list,
+        "dashboard_admin": dashboard_admin,
+        "import_deliveries": (import_deliveries, max(3, args.iterations // 10)),
+        "export_deliveries": (export_deliveries, max(3, args.iterations // 20)),
+    }
+
+
+if __name__ == "__main__":
+    harness.main(setup, operations)
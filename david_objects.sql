@@ -1,7 +1,7 @@
 /*==============================================================*/
 /* david_objects.sql                                            */
-/* Database Objects: Delivery (13) + DeliveryTracking (3)       */
-/*                                                = 16 objects  */
+/* Database Objects: Delivery (16) + DeliveryTracking (3)       */
+/*                                                = 19 objects  */
 /*                                                              */
 /* Run order: Execute top-to-bottom in pgAdmin Query Tool.      */
 /* All table/column names are unquoted lowercase except "USER". */
@@ -29,6 +29,9 @@
 /* 14  | Delivery         | Procedure | sp_update_delivery_status */
 /* 15  | Delivery         | Procedure | sp_delete_delivery     */
 /* 16  | Delivery         | Procedure | sp_import_deliveries   */
+/* 17  | Delivery         | Function  | fn_search_tsquery      */
+/* 18  | Delivery         | Function  | fn_search_deliveries   */
+/* 19  | Delivery         | Function  | fn_list_deliveries     */
 /*==============================================================*/
 
 
@@ -47,32 +50,35 @@
 --   in_transit -> completed, cancelled
 --   completed  -> (terminal, no transitions)
 --   cancelled  -> (terminal, no transitions)
+-- A single SQL expression (IMMUTABLE): the planner inlines it into the
+-- caller and folds it away when both statuses are constants.
 CREATE OR REPLACE FUNCTION fn_is_valid_status_transition(
     p_old_status VARCHAR(20),
     p_new_status VARCHAR(20)
 )
 RETURNS BOOLEAN
-LANGUAGE plpgsql
+LANGUAGE sql
+IMMUTABLE
+PARALLEL SAFE
 AS $$
-BEGIN
-    -- Same status is always allowed (no-op update)
-    IF p_old_status = p_new_status THEN
-        RETURN TRUE;
-    END IF;
-
-    RETURN CASE p_old_status
-        WHEN 'registered' THEN p_new_status IN ('ready', 'cancelled')
-        WHEN 'ready'      THEN p_new_status IN ('pending', 'cancelled')
-        WHEN 'pending'    THEN p_new_status IN ('in_transit', 'cancelled')
-        WHEN 'in_transit' THEN p_new_status IN ('completed', 'cancelled')
-        ELSE FALSE  -- completed and cancelled are terminal
+    SELECT CASE
+        -- Same status is always allowed (no-op update)
+        WHEN p_old_status = p_new_status THEN TRUE
+        ELSE CASE p_old_status
+            WHEN 'registered' THEN p_new_status IN ('ready', 'cancelled')
+            WHEN 'ready'      THEN p_new_status IN ('pending', 'cancelled')
+            WHEN 'pending'    THEN p_new_status IN ('in_transit', 'cancelled')
+            WHEN 'in_transit' THEN p_new_status IN ('completed', 'cancelled')
+            ELSE FALSE  -- completed and cancelled are terminal
+        END
     END;
-END;
 $$;
 
 
 -- 2. fn_get_client_deliveries  [Delivery]
 -- Return all deliveries for a specific client, with driver/route info.
+-- Plain SQL (STABLE): inlined into the calling query, so a WHERE or LIMIT
+-- on the result reaches the delivery scan.
 CREATE OR REPLACE FUNCTION fn_get_client_deliveries(p_client_id INT)
 RETURNS TABLE (
     id                INT,
@@ -94,10 +100,10 @@ RETURNS TABLE (
     created_at        TIMESTAMPTZ,
     updated_at        TIMESTAMPTZ
 )
-LANGUAGE plpgsql
+LANGUAGE sql
+STABLE
+PARALLEL SAFE
 AS $$
-BEGIN
-    RETURN QUERY
     SELECT
         d.id,
         d.tracking_number,
@@ -123,12 +129,13 @@ BEGIN
     LEFT JOIN warehouse w          ON w.id = d.war_id
     WHERE d.client_id = p_client_id
     ORDER BY d.created_at DESC;
-END;
 $$;
 
 
 -- 3. fn_get_driver_deliveries  [Delivery]
 -- Return all deliveries for a specific driver, with client/route info.
+-- Plain SQL (STABLE): inlined into the calling query, so a WHERE or LIMIT
+-- on the result reaches the delivery scan.
 CREATE OR REPLACE FUNCTION fn_get_driver_deliveries(p_driver_id INT)
 RETURNS TABLE (
     id                INT,
@@ -150,10 +157,10 @@ RETURNS TABLE (
     created_at        TIMESTAMPTZ,
     updated_at        TIMESTAMPTZ
 )
-LANGUAGE plpgsql
+LANGUAGE sql
+STABLE
+PARALLEL SAFE
 AS $$
-BEGIN
-    RETURN QUERY
     SELECT
         d.id,
         d.tracking_number,
@@ -179,7 +186,6 @@ BEGIN
     LEFT JOIN warehouse w          ON w.id = d.war_id
     WHERE d.driver_id = p_driver_id
     ORDER BY d.created_at DESC;
-END;
 $$;
 
 
@@ -197,10 +203,10 @@ RETURNS TABLE (
     warehouse_name    VARCHAR(100),
     event_timestamp   TIMESTAMPTZ
 )
-LANGUAGE plpgsql
+LANGUAGE sql
+STABLE
+PARALLEL SAFE
 AS $$
-BEGIN
-    RETURN QUERY
     SELECT
         dt.id              AS tracking_id,
         dt.del_id          AS delivery_id,
@@ -217,7 +223,6 @@ BEGIN
     LEFT JOIN warehouse w       ON w.id  = dt.war_id
     WHERE d.tracking_number = p_tracking_number
     ORDER BY dt.created_at ASC;
-END;
 $$;
 
 
@@ -765,9 +770,174 @@ END;
 $$;
 
 
+/* ============================================================ */
+/*                         S E A R C H                          */
+/* ============================================================ */
+/* Ranked search over the SEARCH_VECTOR / SEARCH_TEXT generated */
+/* columns (DDL.sql, "Search"). A row matches when:             */
+/*   - its tsvector has every word of the term as a prefix,     */
+/*   - or its text contains the term (LIKE, pg_trgm index),     */
+/*   - or the term is close to a word of its text (<%: typos).  */
+/* Rank = ts_rank (weighted fields) + word_similarity.          */
+/* The matching ids are collected first, each condition on its  */
+/* own GIN index (tsvector, gin_trgm_ops), into a MATERIALIZED  */
+/* CTE: the planner cannot turn it into an index walk filtered  */
+/* row by row. A very common term could match millions of rows: */
+/* only the 1000 closest to the term (word_similarity, ties by  */
+/* id) are ranked. The order is total (rank, then id): pages    */
+/* never repeat or skip rows.                                   */
+
+
+-- 17. fn_search_tsquery  [Delivery]
+-- Free text -> prefix tsquery: 'Ana  Sousa!' -> 'ana':* & 'sousa':*
+-- NULL when the term has no letters or digits (then @@ matches nothing).
+-- Shared by fn_search_deliveries, fn_search_clients and fn_search_invoices.
+CREATE OR REPLACE FUNCTION fn_search_tsquery(p_term TEXT)
+RETURNS tsquery
+LANGUAGE sql
+IMMUTABLE
+PARALLEL SAFE
+AS $$
+    SELECT to_tsquery('simple', string_agg(quote_literal(w) || ':*', ' & '))
+    FROM regexp_split_to_table(lower(p_term), '[^[:alnum:]]+') AS w
+    WHERE w <> '';
+$$;
+
+
+-- 18. fn_search_deliveries  [Delivery]
+-- Deliveries by sender / recipient name, e-mail, phone, address or description.
+CREATE OR REPLACE FUNCTION fn_search_deliveries(p_term TEXT, p_limit INT, p_offset INT)
+RETURNS TABLE (
+    id              INT,
+    tracking_number VARCHAR(50),
+    status          VARCHAR(20),
+    sender_name     VARCHAR(100),
+    recipient_name  VARCHAR(100),
+    description     TEXT,
+    created_at      TIMESTAMPTZ,
+    rank            REAL
+)
+LANGUAGE plpgsql
+STABLE
+AS $$
+DECLARE
+    v_term    TEXT    := lower(btrim(p_term));
+    v_query   tsquery := fn_search_tsquery(p_term);
+    v_pattern TEXT    := '%' || replace(replace(replace(lower(btrim(p_term)), '\', '\\'), '%', '\%'), '_', '\_') || '%';
+BEGIN
+    RETURN QUERY
+    WITH matches AS MATERIALIZED (
+        SELECT m.id FROM delivery m WHERE m.search_vector @@ v_query
+        UNION
+        SELECT m.id FROM delivery m WHERE m.search_text LIKE v_pattern
+        UNION
+        SELECT m.id FROM delivery m WHERE v_term <% m.search_text
+    ),
+    -- Candidates closest to the term: a fixed set for a given term
+    candidates AS MATERIALIZED (
+        SELECT m.id
+        FROM matches x
+        JOIN delivery m ON m.id = x.id
+        ORDER BY v_term <<-> m.search_text, m.id
+        LIMIT 1000
+    )
+    SELECT d.id, d.tracking_number, d.status, d.sender_name, d.recipient_name,
+           d.description, d.created_at,
+           COALESCE(ts_rank(d.search_vector, v_query), 0) + word_similarity(v_term, d.search_text) AS score
+    FROM candidates c
+    JOIN delivery d ON d.id = c.id
+    ORDER BY score DESC, d.id DESC
+    LIMIT p_limit OFFSET p_offset;
+END;
+$$;
+
+
+/* ============================================================ */
+/*                      L I S T   P A G E S                     */
+/* ============================================================ */
+/* One page of a *_full view, filtered and keyset-paginated.    */
+/* The filters and the cursor are applied to the base table     */
+/* alone (DDL.sql, "List pages" indexes): only the ids of the   */
+/* page are selected, then joined through the view. NULL        */
+/* filters are left out of the statement (dynamic SQL), so each */
+/* call is planned for the filters it actually has.             */
+/*   p_sort     'newest' (default) or 'oldest'                  */
+/*   p_after_id id of the last row of the previous page (an     */
+/*              error if that row was deleted meanwhile)        */
+/*   p_from/to  dates, both inclusive, as days in the           */
+/*              application time zone (fn_delivery_day)         */
+
+
+-- 19. fn_list_deliveries  [Delivery]
+-- v_deliveries_full by status, warehouse, driver, client and creation date.
+CREATE OR REPLACE FUNCTION fn_list_deliveries(
+    p_status    VARCHAR(20),
+    p_war_id    INT,
+    p_driver_id INT,
+    p_client_id INT,
+    p_from      DATE,
+    p_to        DATE,
+    p_sort      TEXT,
+    p_after_id  INT,
+    p_limit     INT
+)
+RETURNS SETOF v_deliveries_full
+LANGUAGE plpgsql
+STABLE
+AS $$
+DECLARE
+    v_dir      TEXT := CASE WHEN p_sort = 'oldest' THEN 'ASC' ELSE 'DESC' END;
+    v_where    TEXT := 'true';
+    v_after_at TIMESTAMPTZ;
+    v_ids      INT[];
+BEGIN
+    IF p_status IS NOT NULL THEN
+        v_where := v_where || ' AND d.status = $1';
+    END IF;
+    IF p_war_id IS NOT NULL THEN
+        v_where := v_where || ' AND d.war_id = $2';
+    END IF;
+    IF p_driver_id IS NOT NULL THEN
+        v_where := v_where || ' AND d.driver_id = $3';
+    END IF;
+    IF p_client_id IS NOT NULL THEN
+        v_where := v_where || ' AND d.client_id = $4';
+    END IF;
+    IF p_from IS NOT NULL THEN
+        v_where := v_where || ' AND d.created_at >= ($5::TIMESTAMP AT TIME ZONE ''Europe/Lisbon'')';
+    END IF;
+    IF p_to IS NOT NULL THEN
+        v_where := v_where || ' AND d.created_at < (($6 + 1)::TIMESTAMP AT TIME ZONE ''Europe/Lisbon'')';
+    END IF;
+    IF p_after_id IS NOT NULL THEN
+        -- Cursor as plain values: a row comparison with constants is an index range
+        SELECT d.created_at INTO v_after_at FROM delivery d WHERE d.id = p_after_id;
+        IF NOT FOUND THEN
+            RAISE EXCEPTION 'Delivery with id % not found (list cursor)', p_after_id;
+        END IF;
+        v_where := v_where || CASE v_dir WHEN 'ASC' THEN ' AND (d.created_at, d.id) > ($7, $8)'
+                                                    ELSE ' AND (d.created_at, d.id) < ($7, $8)' END;
+    END IF;
+
+    EXECUTE format(
+        'SELECT ARRAY(SELECT d.id FROM delivery d WHERE %s ORDER BY d.created_at %s, d.id %s LIMIT $9)',
+        v_where, v_dir, v_dir
+    )
+    INTO v_ids
+    USING p_status, p_war_id, p_driver_id, p_client_id, p_from, p_to, v_after_at, p_after_id, p_limit;
+
+    RETURN QUERY
+    SELECT v.*
+    FROM v_deliveries_full v
+    WHERE v.id = ANY(v_ids)
+    ORDER BY array_position(v_ids, v.id);
+END;
+$$;
+
+
 /*==============================================================*/
 /* END OF david_objects.sql                                      */
-/* Total: 16 objects                                            */
-/*   Delivery: 2 views + 3 triggers + 3 functions + 5 procs    */
+/* Total: 19 objects                                            */
+/*   Delivery: 2 views + 3 triggers + 6 functions + 5 procs    */
 /*   DeliveryTracking: 1 view + 1 trigger + 1 function         */
 /*==============================================================*/
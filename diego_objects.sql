@@ -34,11 +34,15 @@
 /* 16  | Warehouse      | Procedure | sp_update_warehouse      */
 /* 17  | Warehouse      | Procedure | sp_delete_warehouse      */
 /* 18  | Warehouse      | Procedure | sp_import_warehouses     */
+/* 19  | User           | Function  | fn_autocomplete_clients  */
+/* 20  | User           | Function  | fn_autocomplete_potential_employees */
+/* 21  | EmplDriver     | Function  | fn_autocomplete_drivers  */
+/* 22  | User           | Function  | fn_search_clients        */
 /*==============================================================*/
 /* Note: EmployeeDriver total=2 counts fn_is_license_valid (1) */
 /*       + driver logic inside sp_create_employee (1).          */
 /*       EmployeeStaff total=1 counts staff logic inside        */
-/*       sp_create_employee (1). Standalone SQL blocks = 18.    */
+/*       sp_create_employee (1). Standalone SQL blocks = 21.    */
 /*==============================================================*/
 
 
@@ -50,13 +54,14 @@
 
 -- 1. fn_is_license_valid  [EmployeeDriver]
 -- Check if a driver license has not expired.
+-- STABLE, not IMMUTABLE: the answer changes with CURRENT_DATE.
 CREATE OR REPLACE FUNCTION fn_is_license_valid(p_expiry_date DATE)
 RETURNS BOOLEAN
-LANGUAGE plpgsql
+LANGUAGE sql
+STABLE
+PARALLEL SAFE
 AS $$
-BEGIN
-    RETURN p_expiry_date IS NOT NULL AND p_expiry_date > CURRENT_DATE;
-END;
+    SELECT p_expiry_date IS NOT NULL AND p_expiry_date > CURRENT_DATE;
 $$;
 
 
@@ -761,8 +766,192 @@ END;
 $$;
 
 
+/* ============================================================ */
+/*                   A U T O C O M P L E T E                    */
+/* ============================================================ */
+/* Options for the form pickers (forms.AutocompleteField), at   */
+/* most p_limit rows matching a name prefix, served by the      */
+/* *_PREFIX_IDX indexes in DDL.sql. With p_ids the rows with    */
+/* those ids are returned instead: how a form checks the        */
+/* submitted ids (and labels the current values) in one query.  */
+/* The term is matched literally: LIKE wildcards are escaped.   */
+
+
+-- 19. fn_autocomplete_clients  [User]
+-- Active clients whose username or full name starts with p_term.
+CREATE OR REPLACE FUNCTION fn_autocomplete_clients(p_term TEXT, p_limit INT, p_ids INT[])
+RETURNS TABLE (id INT, label TEXT)
+LANGUAGE plpgsql
+STABLE
+AS $$
+DECLARE
+    v_pattern TEXT := replace(replace(replace(lower(p_term), '\', '\\'), '%', '\%'), '_', '\_') || '%';
+BEGIN
+    IF p_ids IS NOT NULL THEN
+        RETURN QUERY
+        SELECT u.id::INT, u.first_name || ' ' || u.last_name || ' (' || u.username || ')'
+        FROM "USER" u
+        JOIN client c ON c.id = u.id
+        WHERE u.id = ANY(p_ids)
+          AND u.role = 'client'
+          AND u.is_active = true;
+        RETURN;
+    END IF;
+
+    RETURN QUERY
+    SELECT u.id::INT, u.first_name || ' ' || u.last_name || ' (' || u.username || ')'
+    FROM "USER" u
+    JOIN client c ON c.id = u.id
+    WHERE (lower(u.username) LIKE v_pattern
+           OR lower(u.first_name || ' ' || u.last_name) LIKE v_pattern)
+      AND u.role = 'client'
+      AND u.is_active = true
+    ORDER BY 2
+    LIMIT p_limit;
+END;
+$$;
+
+
+-- 20. fn_autocomplete_potential_employees  [User]
+-- Same rule as v_potential_employees: not admin/client, not an employee yet.
+CREATE OR REPLACE FUNCTION fn_autocomplete_potential_employees(p_term TEXT, p_limit INT, p_ids INT[])
+RETURNS TABLE (id INT, label TEXT)
+LANGUAGE plpgsql
+STABLE
+AS $$
+DECLARE
+    v_pattern TEXT := replace(replace(replace(lower(p_term), '\', '\\'), '%', '\%'), '_', '\_') || '%';
+BEGIN
+    IF p_ids IS NOT NULL THEN
+        RETURN QUERY
+        SELECT u.id::INT, u.first_name || ' ' || u.last_name || ' (' || u.username || ')'
+        FROM "USER" u
+        WHERE u.id = ANY(p_ids)
+          AND u.role NOT IN ('admin', 'client')
+          AND u.is_active = true
+          AND NOT EXISTS (SELECT 1 FROM employee e WHERE e.id = u.id);
+        RETURN;
+    END IF;
+
+    RETURN QUERY
+    SELECT u.id::INT, u.first_name || ' ' || u.last_name || ' (' || u.username || ')'
+    FROM "USER" u
+    WHERE (lower(u.username) LIKE v_pattern
+           OR lower(u.first_name || ' ' || u.last_name) LIKE v_pattern)
+      AND u.role NOT IN ('admin', 'client')
+      AND u.is_active = true
+      AND NOT EXISTS (SELECT 1 FROM employee e WHERE e.id = u.id)
+    ORDER BY 2
+    LIMIT p_limit;
+END;
+$$;
+
+
+-- 21. fn_autocomplete_drivers  [EmployeeDriver]
+-- Active drivers whose username or full name starts with p_term.
+CREATE OR REPLACE FUNCTION fn_autocomplete_drivers(p_term TEXT, p_limit INT, p_ids INT[])
+RETURNS TABLE (id INT, label TEXT)
+LANGUAGE plpgsql
+STABLE
+AS $$
+DECLARE
+    v_pattern TEXT := replace(replace(replace(lower(p_term), '\', '\\'), '%', '\%'), '_', '\_') || '%';
+BEGIN
+    IF p_ids IS NOT NULL THEN
+        RETURN QUERY
+        SELECT u.id::INT, u.first_name || ' ' || u.last_name || ' (' || u.username || ')'
+        FROM employee_driver ed
+        JOIN employee e ON e.id = ed.id
+        JOIN "USER" u   ON u.id = ed.id
+        WHERE ed.id = ANY(p_ids)
+          AND e.is_active = true;
+        RETURN;
+    END IF;
+
+    RETURN QUERY
+    SELECT u.id::INT, u.first_name || ' ' || u.last_name || ' (' || u.username || ')'
+    FROM "USER" u
+    JOIN employee e         ON e.id = u.id
+    JOIN employee_driver ed ON ed.id = u.id
+    WHERE (lower(u.username) LIKE v_pattern
+           OR lower(u.first_name || ' ' || u.last_name) LIKE v_pattern)
+      AND e.is_active = true
+    ORDER BY 2
+    LIMIT p_limit;
+END;
+$$;
+
+
+/* ============================================================ */
+/*                         S E A R C H                          */
+/* ============================================================ */
+/* Ranked search over the SEARCH_VECTOR / SEARCH_TEXT generated */
+/* columns (DDL.sql, "Search"), with fn_search_tsquery from     */
+/* david_objects.sql. A row matches when:                       */
+/*   - its tsvector has every word of the term as a prefix,     */
+/*   - or its text contains the term (LIKE, pg_trgm index),     */
+/*   - or the term is close to a word of its text (<%: typos).  */
+/* Rank = ts_rank (weighted fields) + word_similarity.          */
+/* The matching ids are collected first, each condition on its  */
+/* own GIN index (tsvector, gin_trgm_ops), into a MATERIALIZED  */
+/* CTE: the planner cannot turn it into an index walk filtered  */
+/* row by row. A very common term could match millions of rows: */
+/* only the 1000 closest to the term (word_similarity, ties by  */
+/* id) are ranked. The order is total (rank, then id): pages    */
+/* never repeat or skip rows.                                   */
+
+
+-- 22. fn_search_clients  [User]
+-- Active clients by name, username, e-mail or contact.
+CREATE OR REPLACE FUNCTION fn_search_clients(p_term TEXT, p_limit INT, p_offset INT)
+RETURNS TABLE (
+    id         INT,
+    username   VARCHAR(150),
+    first_name VARCHAR(150),
+    last_name  VARCHAR(150),
+    email      VARCHAR(254),
+    contact    VARCHAR(20),
+    rank       REAL
+)
+LANGUAGE plpgsql
+STABLE
+AS $$
+DECLARE
+    v_term    TEXT    := lower(btrim(p_term));
+    v_query   tsquery := fn_search_tsquery(p_term);
+    v_pattern TEXT    := '%' || replace(replace(replace(lower(btrim(p_term)), '\', '\\'), '%', '\%'), '_', '\_') || '%';
+BEGIN
+    RETURN QUERY
+    WITH matches AS MATERIALIZED (
+        SELECT m.id FROM "USER" m WHERE m.search_vector @@ v_query
+        UNION
+        SELECT m.id FROM "USER" m WHERE m.search_text LIKE v_pattern
+        UNION
+        SELECT m.id FROM "USER" m WHERE v_term <% m.search_text
+    ),
+    -- Candidates closest to the term: a fixed set for a given term
+    candidates AS MATERIALIZED (
+        SELECT m.id
+        FROM matches x
+        JOIN "USER" m ON m.id = x.id
+        WHERE m.role = 'client'
+          AND m.is_active = true
+        ORDER BY v_term <<-> m.search_text, m.id
+        LIMIT 1000
+    )
+    SELECT u.id::INT, u.username, u.first_name, u.last_name, u.email, u.contact,
+           COALESCE(ts_rank(u.search_vector, v_query), 0) + word_similarity(v_term, u.search_text) AS score
+    FROM candidates c
+    JOIN "USER" u ON u.id = c.id
+    JOIN client cl ON cl.id = u.id
+    ORDER BY score DESC, u.id DESC
+    LIMIT p_limit OFFSET p_offset;
+END;
+$$;
+
+
 /*==============================================================*/
 /* END OF diego_objects.sql                                      */
-/* Total: 18 standalone SQL blocks (20 objects counting         */
+/* Total: 22 standalone SQL blocks (24 objects counting         */
 /*        driver/staff logic inside sp_create_employee)         */
 /*==============================================================*/
@@ -0,0 +1,214 @@
+/*==============================================================*/
+/* jobs_objects.sql                                             */
+/* Database Objects: BackgroundJob (6)                          */
+/*                                                = 6 objects   */
+/*                                                              */
+/* Run order: Execute top-to-bottom in pgAdmin Query Tool,      */
+/*            after DDL.sql (creates the background_job table). */
+/* All table/column names are unquoted lowercase except "USER". */
+/*==============================================================*/
+
+
+/*==============================================================*/
+/* Table of Contents                                            */
+/*--------------------------------------------------------------*/
+/*  #  | Entity        | Type      | Name                      */
+/*-----|---------------|-----------|--------------------------- */
+/*  1  | BackgroundJob | View      | v_background_jobs         */
+/*  2  | BackgroundJob | Function  | fn_dequeue_job            */
+/*  3  | BackgroundJob | Procedure | sp_enqueue_job            */
+/*  4  | BackgroundJob | Procedure | sp_update_job_progress    */
+/*  5  | BackgroundJob | Procedure | sp_finish_job             */
+/*  6  | BackgroundJob | Procedure | sp_requeue_stale_jobs     */
+/*==============================================================*/
+/* The worker ('python manage.py run_jobs') claims jobs with    */
+/* fn_dequeue_job, which uses FOR UPDATE SKIP LOCKED so several */
+/* workers can poll the same table without a broker and without */
+/* claiming the same job twice. Each claim is one attempt:      */
+/* progress and finish only apply to the current attempt, so a  */
+/* worker whose job was requeued under it stops there.          */
+/*==============================================================*/
+
+
+
+/* ============================================================ */
+/*                          V I E W S                           */
+/* ============================================================ */
+
+
+-- 1. v_background_jobs  [BackgroundJob]
+-- Job status for the status endpoint, with the requester's email.
+CREATE OR REPLACE VIEW v_background_jobs AS
+SELECT
+    j.id,
+    j.kind,
+    j.payload,
+    j.status,
+    j.progress_done,
+    j.progress_total,
+    j.result,
+    j.error_message,
+    j.attempts,
+    j.requested_by,
+    u.email             AS requested_by_email,
+    j.created_at,
+    j.started_at,
+    j.finished_at,
+    j.updated_at
+FROM background_job j
+LEFT JOIN "USER" u ON u.id = j.requested_by;
+
+
+
+/* ============================================================ */
+/*                       F U N C T I O N S                      */
+/* ============================================================ */
+
+
+-- 2. fn_dequeue_job  [BackgroundJob]
+-- Claim the oldest queued job and mark it running, as a new attempt.
+-- Returns no row when the queue is empty (or every queued job is claimed).
+CREATE OR REPLACE FUNCTION fn_dequeue_job()
+RETURNS SETOF background_job
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    RETURN QUERY
+    WITH claimed AS (
+        UPDATE background_job j
+        SET status     = 'running',
+            attempts   = j.attempts + 1,
+            started_at = NOW(),
+            updated_at = NOW()
+        WHERE j.id = (
+            SELECT q.id
+            FROM background_job q
+            WHERE q.status = 'queued'
+            ORDER BY q.created_at
+            FOR UPDATE SKIP LOCKED
+            LIMIT 1
+        )
+        RETURNING j.*
+    )
+    SELECT * FROM claimed;
+END;
+$$;
+
+
+
+/* ============================================================ */
+/*                     P R O C E D U R E S                      */
+/* ============================================================ */
+
+
+-- 3. sp_enqueue_job  [BackgroundJob]
+-- Queue a new job; the worker picks it up on its next poll.
+CREATE OR REPLACE PROCEDURE sp_enqueue_job(
+    p_kind          VARCHAR(50),
+    p_payload       JSONB,
+    p_requested_by  INT  DEFAULT NULL,
+    INOUT p_id      INT  DEFAULT NULL
+)
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    INSERT INTO background_job (
+        kind, payload, status,
+        requested_by, created_at, updated_at
+    ) VALUES (
+        p_kind, COALESCE(p_payload, '{}'::JSONB), 'queued',
+        p_requested_by, NOW(), NOW()
+    )
+    RETURNING id INTO p_id;
+END;
+$$;
+
+
+-- 4. sp_update_job_progress  [BackgroundJob]
+-- Record how much of a running job is done.
+-- Raises if the attempt is no longer the running one (requeued as stale).
+DROP PROCEDURE IF EXISTS sp_update_job_progress(INT, INT, INT);
+CREATE OR REPLACE PROCEDURE sp_update_job_progress(
+    p_id       INT,
+    p_attempt  INT,
+    p_done     INT,
+    p_total    INT DEFAULT NULL
+)
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    UPDATE background_job
+    SET progress_done  = p_done,
+        progress_total = COALESCE(p_total, progress_total),
+        updated_at     = NOW()
+    WHERE id = p_id
+      AND status = 'running'
+      AND attempts = p_attempt;
+
+    IF NOT FOUND THEN
+        RAISE EXCEPTION 'Job % attempt % is no longer running', p_id, p_attempt;
+    END IF;
+END;
+$$;
+
+
+-- 5. sp_finish_job  [BackgroundJob]
+-- Mark a running job as done (with its result) or failed (with the error).
+-- Raises if the attempt is no longer the running one (requeued as stale).
+DROP PROCEDURE IF EXISTS sp_finish_job(INT, VARCHAR, JSONB, TEXT);
+CREATE OR REPLACE PROCEDURE sp_finish_job(
+    p_id       INT,
+    p_attempt  INT,
+    p_status   VARCHAR(20),
+    p_result   JSONB DEFAULT NULL,
+    p_error    TEXT  DEFAULT NULL
+)
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    IF p_status NOT IN ('done', 'failed') THEN
+        RAISE EXCEPTION 'Invalid final job status: %', p_status;
+    END IF;
+
+    UPDATE background_job
+    SET status        = p_status,
+        result        = p_result,
+        error_message = p_error,
+        finished_at   = NOW(),
+        updated_at    = NOW()
+    WHERE id = p_id
+      AND status = 'running'
+      AND attempts = p_attempt;
+
+    IF NOT FOUND THEN
+        RAISE EXCEPTION 'Job % attempt % is no longer running', p_id, p_attempt;
+    END IF;
+END;
+$$;
+
+
+-- 6. sp_requeue_stale_jobs  [BackgroundJob]
+-- Put back jobs whose worker died mid-run (no progress for p_timeout).
+-- Jobs that already used p_max_attempts are failed instead.
+CREATE OR REPLACE PROCEDURE sp_requeue_stale_jobs(
+    p_timeout       INTERVAL DEFAULT '15 minutes',
+    p_max_attempts  INT      DEFAULT 3
+)
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    UPDATE background_job
+    SET status        = CASE WHEN attempts >= p_max_attempts THEN 'failed' ELSE 'queued' END,
+        error_message = CASE WHEN attempts >= p_max_attempts THEN 'Worker stopped responding' END,
+        finished_at   = CASE WHEN attempts >= p_max_attempts THEN NOW() END,
+        updated_at    = NOW()
+    WHERE status = 'running'
+      AND updated_at < NOW() - p_timeout;
+END;
+$$;
+
+
+/*==============================================================*/
+/* END OF jobs_objects.sql                                      */
+/* Total: 6 objects                                             */
+/*==============================================================*/
@@ -1,10 +1,11 @@
 /*==============================================================*/
 /* rodrigo_objects.sql                                          */
-/* Database Objects: Invoice (11) + InvoiceItem (4) +           */
-/*                   Dashboard (3) + Vehicle (7) + Route (7)    */
-/*                                                = 32 objects  */
+/* Database Objects: Invoice (16) + InvoiceItem (4) +           */
+/*                   Dashboard (15) + Vehicle (8) + Route (9)   */
+/*                                                = 52 objects  */
 /*                                                              */
 /* Run order: Execute top-to-bottom in pgAdmin Query Tool.      */
+/*            after DDL.sql (creates the dashboard tables).     */
 /* All table/column names are unquoted lowercase except "USER". */
 /*==============================================================*/
 
@@ -26,25 +27,46 @@
 /* 10  | Route       | View              | v_routes_full        */
 /* 11  | Route       | View              | v_routes_export      */
 /* 12  | Invoice     | Materialized View | mv_invoice_totals    */
-/* 13  | Dashboard   | Materialized View | mv_dashboard_stats   */
+/* 13  | Invoice     | Procedure         | sp_refresh_materialized_view */
 /* 14  | Dashboard   | Function          | fn_get_dashboard_stats*/
-/* 15  | InvoiceItem | Trigger           | trg_invoice_item_calc_total */
-/* 16  | InvoiceItem | Trigger           | trg_invoice_update_cost */
-/* 17  | Invoice     | Trigger           | trg_invoice_soft_delete */
-/* 18  | Route       | Trigger           | trg_route_time_check */
-/* 19  | Invoice     | Procedure         | sp_create_invoice    */
-/* 20  | Invoice     | Procedure         | sp_update_invoice    */
-/* 21  | Invoice     | Procedure         | sp_delete_invoice    */
-/* 22  | Invoice     | Procedure         | sp_import_invoices   */
-/* 23  | InvoiceItem | Procedure         | sp_add_invoice_item  */
-/* 24  | Vehicle     | Procedure         | sp_create_vehicle    */
-/* 25  | Vehicle     | Procedure         | sp_update_vehicle    */
-/* 26  | Vehicle     | Procedure         | sp_delete_vehicle    */
-/* 27  | Vehicle     | Procedure         | sp_import_vehicles   */
-/* 28  | Route       | Procedure         | sp_create_route      */
-/* 29  | Route       | Procedure         | sp_update_route      */
-/* 30  | Route       | Procedure         | sp_delete_route      */
-/* 31  | Route       | Procedure         | sp_import_routes     */
+/* 15  | Dashboard   | Function          | fn_get_dashboard_stats_json */
+/* 16  | InvoiceItem | Trigger           | trg_invoice_item_calc_total */
+/* 17  | InvoiceItem | Trigger           | trg_invoice_update_cost */
+/* 18  | Invoice     | Trigger           | trg_invoice_soft_delete */
+/* 19  | Route       | Trigger           | trg_route_time_check */
+/* 20  | Invoice     | Procedure         | sp_create_invoice    */
+/* 21  | Invoice     | Procedure         | sp_update_invoice    */
+/* 22  | Invoice     | Procedure         | sp_delete_invoice    */
+/* 23  | Invoice     | Procedure         | sp_import_invoices   */
+/* 24  | InvoiceItem | Procedure         | sp_add_invoice_item  */
+/* 25  | Vehicle     | Procedure         | sp_create_vehicle    */
+/* 26  | Vehicle     | Procedure         | sp_update_vehicle    */
+/* 27  | Vehicle     | Procedure         | sp_delete_vehicle    */
+/* 28  | Vehicle     | Procedure         | sp_import_vehicles   */
+/* 29  | Route       | Procedure         | sp_create_route      */
+/* 30  | Route       | Procedure         | sp_update_route      */
+/* 31  | Route       | Procedure         | sp_delete_route      */
+/* 32  | Route       | Procedure         | sp_import_routes     */
+/* 33  | Dashboard   | Function          | fn_dashboard_counter_add */
+/* 34  | Dashboard   | Function          | fn_delivery_day      */
+/* 35  | Dashboard   | Trigger           | trg_dashboard_delivery */
+/* 36  | Dashboard   | Trigger           | trg_dashboard_vehicle */
+/* 37  | Dashboard   | Trigger           | trg_dashboard_route  */
+/* 38  | Dashboard   | Trigger           | trg_dashboard_invoice */
+/* 39  | Dashboard   | Trigger           | trg_dashboard_employee */
+/* 40  | Dashboard   | Trigger           | trg_dashboard_user   */
+/* 41  | Dashboard   | Procedure         | sp_rebuild_dashboard_counters */
+/* 42  | Dashboard   | Trigger           | trg_rollup_delivery_tracking */
+/* 43  | Dashboard   | Trigger           | trg_rollup_invoice   */
+/* 44  | Dashboard   | Function          | fn_get_daily_series  */
+/* 45  | Dashboard   | Procedure         | sp_backfill_daily_rollups */
+/* 46  | Vehicle     | Function          | fn_autocomplete_vehicles */
+/* 47  | Route       | Function          | fn_autocomplete_routes */
+/* 48  | Invoice     | Function          | fn_autocomplete_invoices */
+/* 49  | Invoice     | Procedure         | sp_save_invoice      */
+/* 50  | Invoice     | Function          | fn_search_invoices   */
+/* 51  | Route       | Function          | fn_list_routes       */
+/* 52  | Invoice     | Function          | fn_list_invoices     */
 /*==============================================================*/
 
 
@@ -56,16 +78,19 @@
 
 -- 1. fn_calculate_tax
 -- Calculate tax amount for a given value. Default rate 23%.
+-- Functions 1, 2 and 5 are single SQL expressions: the planner inlines them
+-- into the calling query (no per-row call), folds them on constants, and
+-- 1 and 2 (IMMUTABLE) may be used in index expressions.
 CREATE OR REPLACE FUNCTION fn_calculate_tax(
     p_amount DECIMAL(10,2),
     p_rate   DECIMAL(5,4) DEFAULT 0.23
 )
 RETURNS DECIMAL(10,2)
-LANGUAGE plpgsql
+LANGUAGE sql
+IMMUTABLE
+PARALLEL SAFE
 AS $$
-BEGIN
-    RETURN ROUND(p_amount * p_rate, 2);
-END;
+    SELECT ROUND(p_amount * p_rate, 2);
 $$;
 
 
@@ -76,11 +101,11 @@ CREATE OR REPLACE FUNCTION fn_calculate_item_total(
     p_unit_price DECIMAL(10,2)
 )
 RETURNS DECIMAL(10,2)
-LANGUAGE plpgsql
+LANGUAGE sql
+IMMUTABLE
+PARALLEL SAFE
 AS $$
-BEGIN
-    RETURN COALESCE(p_quantity, 0) * COALESCE(p_unit_price, 0.00);
-END;
+    SELECT COALESCE(p_quantity, 0) * COALESCE(p_unit_price, 0.00);
 $$;
 
 
@@ -88,18 +113,13 @@ $$;
 -- Sum of all total_item_cost for a given invoice.
 CREATE OR REPLACE FUNCTION fn_invoice_subtotal(p_invoice_id INT)
 RETURNS DECIMAL(10,2)
-LANGUAGE plpgsql
+LANGUAGE sql
+STABLE
+PARALLEL SAFE
 AS $$
-DECLARE
-    v_subtotal DECIMAL(10,2);
-BEGIN
     SELECT COALESCE(SUM(total_item_cost), 0.00)
-    INTO v_subtotal
     FROM invoice_item
     WHERE inv_id = p_invoice_id;
-
-    RETURN v_subtotal;
-END;
 $$;
 
 
@@ -108,28 +128,27 @@ $$;
 -- Depends on: fn_invoice_subtotal, fn_calculate_tax
 CREATE OR REPLACE FUNCTION fn_invoice_total(p_invoice_id INT)
 RETURNS DECIMAL(10,2)
-LANGUAGE plpgsql
+LANGUAGE sql
+STABLE
+PARALLEL SAFE
 AS $$
-DECLARE
-    v_subtotal DECIMAL(10,2);
-BEGIN
-    v_subtotal := fn_invoice_subtotal(p_invoice_id);
-    RETURN ROUND(v_subtotal + fn_calculate_tax(v_subtotal), 2);
-END;
+    SELECT ROUND(s.subtotal + fn_calculate_tax(s.subtotal), 2)
+    FROM (SELECT fn_invoice_subtotal(p_invoice_id) AS subtotal) s;
 $$;
 
 
 -- 5. fn_is_valid_year
 -- Check that a vehicle year is between 1900 and current year + 1.
+-- STABLE, not IMMUTABLE: the upper bound moves with CURRENT_DATE.
 CREATE OR REPLACE FUNCTION fn_is_valid_year(p_year INT)
 RETURNS BOOLEAN
-LANGUAGE plpgsql
+LANGUAGE sql
+STABLE
+PARALLEL SAFE
 AS $$
-BEGIN
-    RETURN p_year IS NOT NULL
+    SELECT p_year IS NOT NULL
        AND p_year >= 1900
        AND p_year <= EXTRACT(YEAR FROM CURRENT_DATE)::INT + 1;
-END;
 $$;
 
 
@@ -327,81 +346,124 @@ CREATE UNIQUE INDEX IF NOT EXISTS idx_mv_invoice_totals_pk
     ON mv_invoice_totals (invoice_id);
 
 
--- 13. mv_dashboard_stats
--- Cached aggregate counts for the admin dashboard.
-CREATE MATERIALIZED VIEW IF NOT EXISTS mv_dashboard_stats AS
-SELECT
-    (SELECT COUNT(*) FROM vehicle WHERE is_active = true)                                   AS total_vehicles,
-    (SELECT COUNT(*) FROM delivery)                                                         AS total_deliveries,
-    (SELECT COUNT(*) FROM "USER" WHERE role = 'client')                                     AS total_clients,
-    (SELECT COUNT(*) FROM employee WHERE is_active = true)                                  AS total_employees,
-    (SELECT COUNT(*) FROM route WHERE delivery_status NOT IN ('finished', 'cancelled'))     AS active_routes,
-    (SELECT COUNT(*) FROM delivery WHERE status = 'pending')                                AS pending_deliveries,
-    (SELECT COUNT(*) FROM invoice)                                                          AS total_invoices;
-
--- Unique index (single-row view, use constant)
-CREATE UNIQUE INDEX IF NOT EXISTS idx_mv_dashboard_stats_pk
-    ON mv_dashboard_stats ((1));
+-- 13. sp_refresh_materialized_view
+-- REFRESH ... CONCURRENTLY a materialized view and record how long it took
+-- in mv_refresh_stats (exposed by the /metrics endpoint).
+CREATE OR REPLACE PROCEDURE sp_refresh_materialized_view(p_view TEXT)
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    v_started  TIMESTAMPTZ := clock_timestamp();
+    v_seconds  DOUBLE PRECISION;
+BEGIN
+    EXECUTE format('REFRESH MATERIALIZED VIEW CONCURRENTLY %I', p_view);
+    v_seconds := EXTRACT(EPOCH FROM clock_timestamp() - v_started);
+
+    INSERT INTO mv_refresh_stats AS s (mv_name, refreshes, total_seconds, last_seconds, max_seconds, last_refreshed_at)
+    VALUES (p_view, 1, v_seconds, v_seconds, v_seconds, NOW())
+    ON CONFLICT (mv_name) DO UPDATE
+    SET refreshes         = s.refreshes + 1,
+        total_seconds     = s.total_seconds + EXCLUDED.last_seconds,
+        last_seconds      = EXCLUDED.last_seconds,
+        max_seconds       = GREATEST(s.max_seconds, EXCLUDED.last_seconds),
+        last_refreshed_at = EXCLUDED.last_refreshed_at;
+END;
+$$;
 
 
 -- 14. fn_get_dashboard_stats
 -- Returns role-specific dashboard data as key-value pairs.
--- Depends on: mv_dashboard_stats
+-- Admin counts are summed from the dashboard_counter shards (live, no refresh).
+-- Drivers/clients get their totals by status and priority, plus today's
+-- workload by status, from delivery_party_stats / delivery_party_daily.
+-- last_refreshed_at is always NOW(): every count is current.
+-- Depends on: dashboard_counter, delivery_party_stats, delivery_party_daily
+DROP FUNCTION IF EXISTS fn_get_dashboard_stats(INT, VARCHAR);
+
 CREATE OR REPLACE FUNCTION fn_get_dashboard_stats(
     p_user_id INT,
     p_role    VARCHAR(20)
 )
 RETURNS TABLE (
-    stat_name  TEXT,
-    stat_value BIGINT
+    stat_name         TEXT,
+    stat_value        BIGINT,
+    last_refreshed_at TIMESTAMPTZ
 )
 LANGUAGE plpgsql
+STABLE
+PARALLEL SAFE
 AS $$
 BEGIN
     IF p_role IN ('admin', 'manager') THEN
         RETURN QUERY
-        SELECT 'total_vehicles'::TEXT,      ds.total_vehicles      FROM mv_dashboard_stats ds
-        UNION ALL
-        SELECT 'total_deliveries'::TEXT,    ds.total_deliveries    FROM mv_dashboard_stats ds
-        UNION ALL
-        SELECT 'total_clients'::TEXT,       ds.total_clients       FROM mv_dashboard_stats ds
+        SELECT c.stat_name::TEXT, SUM(c.value)::BIGINT, NOW()
+        FROM dashboard_counter c
+        GROUP BY c.stat_name;
+
+    ELSIF p_role IN ('driver', 'client') THEN
+        -- One primary key range scan per stats table, no delivery scan
+        RETURN QUERY
+        WITH mine AS (
+            SELECT s.status, s.priority, s.deliveries
+            FROM delivery_party_stats s
+            WHERE s.party_role = p_role
+              AND s.party_id   = p_user_id
+        ),
+        today AS (
+            SELECT t.status, t.deliveries
+            FROM delivery_party_daily t
+            WHERE t.party_role   = p_role
+              AND t.party_id     = p_user_id
+              AND t.delivery_day = fn_delivery_day(NOW())
+        )
+        SELECT 'my_deliveries'::TEXT,      COALESCE(SUM(m.deliveries), 0)::BIGINT, NOW() FROM mine m
         UNION ALL
-        SELECT 'total_employees'::TEXT,     ds.total_employees     FROM mv_dashboard_stats ds
+        SELECT 'status_' || m.status,      SUM(m.deliveries)::BIGINT,              NOW() FROM mine m GROUP BY m.status
         UNION ALL
-        SELECT 'active_routes'::TEXT,       ds.active_routes       FROM mv_dashboard_stats ds
+        SELECT 'priority_' || m.priority,  SUM(m.deliveries)::BIGINT,              NOW() FROM mine m GROUP BY m.priority
         UNION ALL
-        SELECT 'pending_deliveries'::TEXT,  ds.pending_deliveries  FROM mv_dashboard_stats ds
+        SELECT 'today_deliveries'::TEXT,   COALESCE(SUM(t.deliveries), 0)::BIGINT, NOW() FROM today t
         UNION ALL
-        SELECT 'total_invoices'::TEXT,      ds.total_invoices      FROM mv_dashboard_stats ds;
-
-    ELSIF p_role = 'driver' THEN
-        RETURN QUERY
-        SELECT 'my_deliveries'::TEXT, COUNT(*)::BIGINT
-        FROM delivery
-        WHERE driver_id = p_user_id;
-
-    ELSIF p_role = 'client' THEN
-        RETURN QUERY
-        SELECT 'my_deliveries'::TEXT, COUNT(*)::BIGINT
-        FROM delivery
-        WHERE client_id = p_user_id;
+        SELECT 'today_' || t.status,       t.deliveries::BIGINT,                   NOW() FROM today t;
 
     ELSE  -- staff or other
         RETURN QUERY
-        SELECT 'total_deliveries'::TEXT, COUNT(*)::BIGINT
-        FROM delivery;
+        SELECT 'total_deliveries'::TEXT, COALESCE(SUM(c.value), 0)::BIGINT, NOW()
+        FROM dashboard_counter c
+        WHERE c.stat_name = 'total_deliveries';
     END IF;
 END;
 $$;
 
 
+-- 15. fn_get_dashboard_stats_json
+-- Same stats as fn_get_dashboard_stats as one JSONB object, so callers get a
+-- single row instead of pivoting key/value rows:
+--   {"stats": {"total_vehicles": 12, ...}, "as_of": "2026-..."}
+CREATE OR REPLACE FUNCTION fn_get_dashboard_stats_json(
+    p_user_id INT,
+    p_role    VARCHAR(20)
+)
+RETURNS JSONB
+LANGUAGE sql
+STABLE
+PARALLEL SAFE
+AS $$
+    SELECT jsonb_build_object(
+        'stats', COALESCE(jsonb_object_agg(s.stat_name, s.stat_value), '{}'::JSONB),
+        'as_of', NOW()
+    )
+    FROM fn_get_dashboard_stats(p_user_id, p_role) s;
+$$;
+
+
 
 /* ============================================================ */
 /*                       T R I G G E R S                        */
 /* ============================================================ */
 
 
--- 15. trg_invoice_item_calc_total
+-- 16. trg_invoice_item_calc_total
 -- BEFORE INSERT/UPDATE on invoice_item: auto-calculate total_item_cost = quantity * unit_price.
 CREATE OR REPLACE FUNCTION fn_trg_invoice_item_calc_total()
 RETURNS TRIGGER
@@ -422,8 +484,10 @@ CREATE TRIGGER trg_invoice_item_calc_total
     EXECUTE FUNCTION fn_trg_invoice_item_calc_total();
 
 
--- 16. trg_invoice_update_cost
+-- 17. trg_invoice_update_cost
 -- AFTER INSERT/UPDATE/DELETE on invoice_item: recalculate the parent invoice cost and quantity.
+-- Skipped while postoffice.skip_invoice_cost = 'on': sp_save_invoice changes
+-- all the items of an invoice at once and recalculates it a single time.
 CREATE OR REPLACE FUNCTION fn_trg_invoice_update_cost()
 RETURNS TRIGGER
 LANGUAGE plpgsql
@@ -453,7 +517,7 @@ BEGIN
     WHERE invoice.id = v_inv_id;
 
     -- Refresh the materialized view
-    REFRESH MATERIALIZED VIEW CONCURRENTLY mv_invoice_totals;
+    CALL sp_refresh_materialized_view('mv_invoice_totals');
 
     RETURN NULL;  -- AFTER trigger, return value is ignored
 END;
@@ -464,10 +528,11 @@ DROP TRIGGER IF EXISTS trg_invoice_update_cost ON invoice_item;
 CREATE TRIGGER trg_invoice_update_cost
     AFTER INSERT OR UPDATE OR DELETE ON invoice_item
     FOR EACH ROW
+    WHEN (current_setting('postoffice.skip_invoice_cost', true) IS DISTINCT FROM 'on')
     EXECUTE FUNCTION fn_trg_invoice_update_cost();
 
 
--- 17. trg_invoice_soft_delete
+-- 18. trg_invoice_soft_delete
 -- BEFORE DELETE on invoice: set status='cancelled' instead of hard-deleting.
 CREATE OR REPLACE FUNCTION fn_trg_invoice_soft_delete()
 RETURNS TRIGGER
@@ -492,7 +557,7 @@ CREATE TRIGGER trg_invoice_soft_delete
     EXECUTE FUNCTION fn_trg_invoice_soft_delete();
 
 
--- 18. trg_route_time_check
+-- 19. trg_route_time_check
 -- BEFORE INSERT/UPDATE on route: ensure delivery_end_time > delivery_start_time (when both set).
 CREATE OR REPLACE FUNCTION fn_trg_route_time_check()
 RETURNS TRIGGER
@@ -527,7 +592,7 @@ CREATE TRIGGER trg_route_time_check
 
 /* ---------- INVOICE ---------- */
 
--- 19. sp_create_invoice
+-- 20. sp_create_invoice
 -- Create a new invoice header row.
 CREATE OR REPLACE PROCEDURE sp_create_invoice(
     p_war_id        INT,
@@ -565,7 +630,7 @@ END;
 $$;
 
 
--- 20. sp_update_invoice
+-- 21. sp_update_invoice
 -- Update an existing invoice's mutable fields.
 CREATE OR REPLACE PROCEDURE sp_update_invoice(
     p_id            INT,
@@ -608,7 +673,7 @@ END;
 $$;
 
 
--- 21. sp_delete_invoice
+-- 22. sp_delete_invoice
 -- Soft-delete an invoice (triggers trg_invoice_soft_delete).
 CREATE OR REPLACE PROCEDURE sp_delete_invoice(p_id INT)
 LANGUAGE plpgsql
@@ -625,7 +690,7 @@ END;
 $$;
 
 
--- 22. sp_import_invoices
+-- 23. sp_import_invoices
 -- Bulk-import invoices (with optional nested items) from a JSONB array.
 CREATE OR REPLACE PROCEDURE sp_import_invoices(p_data JSONB)
 LANGUAGE plpgsql
@@ -684,14 +749,14 @@ BEGIN
     END LOOP;
 
     -- Refresh the materialized view after bulk import
-    REFRESH MATERIALIZED VIEW CONCURRENTLY mv_invoice_totals;
+    CALL sp_refresh_materialized_view('mv_invoice_totals');
 END;
 $$;
 
 
 /* ---------- INVOICE ITEM ---------- */
 
--- 23. sp_add_invoice_item
+-- 24. sp_add_invoice_item
 -- Add a single item to an invoice.
 -- The trigger will auto-calculate total_item_cost and update the invoice cost.
 CREATE OR REPLACE PROCEDURE sp_add_invoice_item(
@@ -731,7 +796,7 @@ $$;
 
 /* ---------- VEHICLE ---------- */
 
--- 24. sp_create_vehicle
+-- 25. sp_create_vehicle
 -- Create a new vehicle with validation.
 CREATE OR REPLACE PROCEDURE sp_create_vehicle(
     p_vehicle_type          VARCHAR(50),
@@ -769,7 +834,7 @@ END;
 $$;
 
 
--- 25. sp_update_vehicle
+-- 26. sp_update_vehicle
 -- Update an existing vehicle's mutable fields.
 CREATE OR REPLACE PROCEDURE sp_update_vehicle(
     p_id                     INT,
@@ -813,7 +878,7 @@ END;
 $$;
 
 
--- 26. sp_delete_vehicle
+-- 27. sp_delete_vehicle
 -- Delete a vehicle. Prevents deletion if assigned to active routes.
 CREATE OR REPLACE PROCEDURE sp_delete_vehicle(p_id INT)
 LANGUAGE plpgsql
@@ -837,7 +902,7 @@ END;
 $$;
 
 
--- 27. sp_import_vehicles
+-- 28. sp_import_vehicles
 -- Bulk-import vehicles from a JSONB array.
 CREATE OR REPLACE PROCEDURE sp_import_vehicles(p_data JSONB)
 LANGUAGE plpgsql
@@ -872,7 +937,7 @@ $$;
 
 /* ---------- ROUTE ---------- */
 
--- 28. sp_create_route
+-- 29. sp_create_route
 -- Create a new route.
 CREATE OR REPLACE PROCEDURE sp_create_route(
     p_driver_id           INT,
@@ -911,7 +976,7 @@ END;
 $$;
 
 
--- 29. sp_update_route
+-- 30. sp_update_route
 -- Update an existing route's mutable fields.
 CREATE OR REPLACE PROCEDURE sp_update_route(
     p_id                   INT,
@@ -956,7 +1021,7 @@ END;
 $$;
 
 
--- 30. sp_delete_route
+-- 31. sp_delete_route
 -- Delete a route. Prevents deletion if it has active deliveries.
 CREATE OR REPLACE PROCEDURE sp_delete_route(p_id INT)
 LANGUAGE plpgsql
@@ -980,7 +1045,7 @@ END;
 $$;
 
 
--- 31. sp_import_routes
+-- 32. sp_import_routes
 -- Bulk-import routes from a JSONB array.
 CREATE OR REPLACE PROCEDURE sp_import_routes(p_data JSONB)
 LANGUAGE plpgsql
@@ -1016,7 +1081,1109 @@ END;
 $$;
 
 
+/* ============================================================ */
+/*             D A S H B O A R D   C O U N T E R S              */
+/* ============================================================ */
+/* Each admin dashboard count is kept in dashboard_counter as   */
+/* 16 shard rows (one per pg_backend_pid() % 16), so            */
+/* concurrent writers usually update different rows instead of  */
+/* queueing on one hot row. Readers SUM the shards.             */
+/* Statement-level triggers count the changed rows from their   */
+/* transition tables; PostgreSQL only allows transition tables  */
+/* on single-event triggers, hence one trigger per event.       */
+
+
+-- Replaced by dashboard_counter: mv_dashboard_stats and its refresh machinery
+DROP MATERIALIZED VIEW IF EXISTS mv_dashboard_stats;
+DROP FUNCTION IF EXISTS fn_trg_dashboard_changed() CASCADE;
+DROP PROCEDURE IF EXISTS sp_refresh_dashboard_stats(BOOL, BOOL);
+
+
+-- 33. fn_dashboard_counter_add
+-- Add p_delta to one shard of a dashboard counter (no-op when p_delta = 0).
+CREATE OR REPLACE FUNCTION fn_dashboard_counter_add(
+    p_stat  VARCHAR(50),
+    p_delta BIGINT
+)
+RETURNS VOID
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    IF p_delta = 0 THEN
+        RETURN;
+    END IF;
+
+    INSERT INTO dashboard_counter (stat_name, shard, value)
+    VALUES (p_stat, pg_backend_pid() % 16, p_delta)
+    ON CONFLICT (stat_name, shard)
+    DO UPDATE SET value = dashboard_counter.value + EXCLUDED.value;
+END;
+$$;
+
+
+-- 34. fn_delivery_day
+-- Calendar day of a delivery in the application time zone (settings.TIME_ZONE),
+-- independent of the session TimeZone.
+CREATE OR REPLACE FUNCTION fn_delivery_day(p_ts TIMESTAMPTZ)
+RETURNS DATE
+LANGUAGE sql
+IMMUTABLE
+PARALLEL SAFE
+AS $$
+    SELECT (p_ts AT TIME ZONE 'Europe/Lisbon')::DATE;
+$$;
+
+
+-- 35. trg_dashboard_delivery
+-- AFTER INSERT/UPDATE/DELETE on delivery: maintain total_deliveries, pending_deliveries,
+-- and the per-driver / per-client rows of delivery_party_stats and delivery_party_daily.
+CREATE OR REPLACE FUNCTION fn_trg_dashboard_delivery()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    v_total_deliveries    BIGINT := 0;
+    v_pending_deliveries  BIGINT := 0;
+    v_changes             TEXT;
+BEGIN
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        SELECT COUNT(*),
+               COUNT(*) FILTER (WHERE status = 'pending')
+        INTO v_total_deliveries, v_pending_deliveries
+        FROM new_rows;
+    END IF;
+
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        SELECT v_total_deliveries - COUNT(*),
+               v_pending_deliveries - COUNT(*) FILTER (WHERE status = 'pending')
+        INTO v_total_deliveries, v_pending_deliveries
+        FROM old_rows;
+    END IF;
+
+    PERFORM fn_dashboard_counter_add('total_deliveries', v_total_deliveries);
+    PERFORM fn_dashboard_counter_add('pending_deliveries', v_pending_deliveries);
+
+    -- Rows entering (+1) and leaving (-1) each driver/client bucket. An UPDATE
+    -- that changes none of the grouped columns nets to 0 and writes nothing.
+    -- Dynamic SQL because an INSERT/DELETE trigger only has one transition table.
+    v_changes := CASE TG_OP
+        WHEN 'INSERT' THEN
+            'SELECT driver_id, client_id, status, priority, delivery_date, 1 AS delta FROM new_rows'
+        WHEN 'DELETE' THEN
+            'SELECT driver_id, client_id, status, priority, delivery_date, -1 AS delta FROM old_rows'
+        ELSE
+            'SELECT driver_id, client_id, status, priority, delivery_date, 1 AS delta FROM new_rows
+             UNION ALL
+             SELECT driver_id, client_id, status, priority, delivery_date, -1 AS delta FROM old_rows'
+    END;
+
+    EXECUTE format($sql$
+        WITH changes AS (%s),
+        party AS (
+            SELECT 'driver' AS party_role, driver_id AS party_id,
+                   COALESCE(status, 'unknown') AS status, COALESCE(priority, 'normal') AS priority,
+                   fn_delivery_day(delivery_date) AS delivery_day, delta
+            FROM changes
+            WHERE driver_id IS NOT NULL
+            UNION ALL
+            SELECT 'client', client_id,
+                   COALESCE(status, 'unknown'), COALESCE(priority, 'normal'),
+                   fn_delivery_day(delivery_date), delta
+            FROM changes
+            WHERE client_id IS NOT NULL
+        ),
+        totals AS (
+            INSERT INTO delivery_party_stats (party_role, party_id, status, priority, deliveries)
+            SELECT party_role, party_id, status, priority, SUM(delta)
+            FROM party
+            GROUP BY party_role, party_id, status, priority
+            HAVING SUM(delta) <> 0
+            ON CONFLICT (party_role, party_id, status, priority)
+            DO UPDATE SET deliveries = delivery_party_stats.deliveries + EXCLUDED.deliveries
+        )
+        INSERT INTO delivery_party_daily (party_role, party_id, delivery_day, status, deliveries)
+        SELECT party_role, party_id, delivery_day, status, SUM(delta)
+        FROM party
+        WHERE delivery_day IS NOT NULL
+        GROUP BY party_role, party_id, delivery_day, status
+        HAVING SUM(delta) <> 0
+        ON CONFLICT (party_role, party_id, delivery_day, status)
+        DO UPDATE SET deliveries = delivery_party_daily.deliveries + EXCLUDED.deliveries
+    $sql$, v_changes);
+
+    RETURN NULL;  -- AFTER trigger, return value is ignored
+END;
+$$;
+
+DROP TRIGGER IF EXISTS trg_dashboard_delivery_insert ON delivery;
+DROP TRIGGER IF EXISTS trg_dashboard_delivery_update ON delivery;
+DROP TRIGGER IF EXISTS trg_dashboard_delivery_delete ON delivery;
+
+CREATE TRIGGER trg_dashboard_delivery_insert
+    AFTER INSERT ON delivery
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION fn_trg_dashboard_delivery();
+
+CREATE TRIGGER trg_dashboard_delivery_update
+    AFTER UPDATE ON delivery
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION fn_trg_dashboard_delivery();
+
+CREATE TRIGGER trg_dashboard_delivery_delete
+    AFTER DELETE ON delivery
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION fn_trg_dashboard_delivery();
+
+
+-- 36. trg_dashboard_vehicle
+-- AFTER INSERT/UPDATE/DELETE on vehicle: maintain total_vehicles.
+CREATE OR REPLACE FUNCTION fn_trg_dashboard_vehicle()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    v_total_vehicles      BIGINT := 0;
+BEGIN
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        SELECT COUNT(*) FILTER (WHERE is_active = true)
+        INTO v_total_vehicles
+        FROM new_rows;
+    END IF;
+
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        SELECT v_total_vehicles - COUNT(*) FILTER (WHERE is_active = true)
+        INTO v_total_vehicles
+        FROM old_rows;
+    END IF;
+
+    PERFORM fn_dashboard_counter_add('total_vehicles', v_total_vehicles);
+    RETURN NULL;  -- AFTER trigger, return value is ignored
+END;
+$$;
+
+DROP TRIGGER IF EXISTS trg_dashboard_vehicle_insert ON vehicle;
+DROP TRIGGER IF EXISTS trg_dashboard_vehicle_update ON vehicle;
+DROP TRIGGER IF EXISTS trg_dashboard_vehicle_delete ON vehicle;
+
+CREATE TRIGGER trg_dashboard_vehicle_insert
+    AFTER INSERT ON vehicle
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION fn_trg_dashboard_vehicle();
+
+CREATE TRIGGER trg_dashboard_vehicle_update
+    AFTER UPDATE ON vehicle
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION fn_trg_dashboard_vehicle();
+
+CREATE TRIGGER trg_dashboard_vehicle_delete
+    AFTER DELETE ON vehicle
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION fn_trg_dashboard_vehicle();
+
+
+-- 37. trg_dashboard_route
+-- AFTER INSERT/UPDATE/DELETE on route: maintain active_routes.
+CREATE OR REPLACE FUNCTION fn_trg_dashboard_route()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    v_active_routes       BIGINT := 0;
+BEGIN
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        SELECT COUNT(*) FILTER (WHERE delivery_status NOT IN ('finished', 'cancelled'))
+        INTO v_active_routes
+        FROM new_rows;
+    END IF;
+
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        SELECT v_active_routes - COUNT(*) FILTER (WHERE delivery_status NOT IN ('finished', 'cancelled'))
+        INTO v_active_routes
+        FROM old_rows;
+    END IF;
+
+    PERFORM fn_dashboard_counter_add('active_routes', v_active_routes);
+    RETURN NULL;  -- AFTER trigger, return value is ignored
+END;
+$$;
+
+DROP TRIGGER IF EXISTS trg_dashboard_route_insert ON route;
+DROP TRIGGER IF EXISTS trg_dashboard_route_update ON route;
+DROP TRIGGER IF EXISTS trg_dashboard_route_delete ON route;
+
+CREATE TRIGGER trg_dashboard_route_insert
+    AFTER INSERT ON route
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION fn_trg_dashboard_route();
+
+CREATE TRIGGER trg_dashboard_route_update
+    AFTER UPDATE ON route
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION fn_trg_dashboard_route();
+
+CREATE TRIGGER trg_dashboard_route_delete
+    AFTER DELETE ON route
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION fn_trg_dashboard_route();
+
+
+-- 38. trg_dashboard_invoice
+-- AFTER INSERT/UPDATE/DELETE on invoice: maintain total_invoices.
+CREATE OR REPLACE FUNCTION fn_trg_dashboard_invoice()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    v_total_invoices      BIGINT := 0;
+BEGIN
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        SELECT COUNT(*)
+        INTO v_total_invoices
+        FROM new_rows;
+    END IF;
+
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        SELECT v_total_invoices - COUNT(*)
+        INTO v_total_invoices
+        FROM old_rows;
+    END IF;
+
+    PERFORM fn_dashboard_counter_add('total_invoices', v_total_invoices);
+    RETURN NULL;  -- AFTER trigger, return value is ignored
+END;
+$$;
+
+DROP TRIGGER IF EXISTS trg_dashboard_invoice_insert ON invoice;
+DROP TRIGGER IF EXISTS trg_dashboard_invoice_update ON invoice;
+DROP TRIGGER IF EXISTS trg_dashboard_invoice_delete ON invoice;
+
+CREATE TRIGGER trg_dashboard_invoice_insert
+    AFTER INSERT ON invoice
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION fn_trg_dashboard_invoice();
+
+CREATE TRIGGER trg_dashboard_invoice_update
+    AFTER UPDATE ON invoice
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION fn_trg_dashboard_invoice();
+
+CREATE TRIGGER trg_dashboard_invoice_delete
+    AFTER DELETE ON invoice
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION fn_trg_dashboard_invoice();
+
+
+-- 39. trg_dashboard_employee
+-- AFTER INSERT/UPDATE/DELETE on employee: maintain total_employees.
+CREATE OR REPLACE FUNCTION fn_trg_dashboard_employee()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    v_total_employees     BIGINT := 0;
+BEGIN
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        SELECT COUNT(*) FILTER (WHERE is_active = true)
+        INTO v_total_employees
+        FROM new_rows;
+    END IF;
+
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        SELECT v_total_employees - COUNT(*) FILTER (WHERE is_active = true)
+        INTO v_total_employees
+        FROM old_rows;
+    END IF;
+
+    PERFORM fn_dashboard_counter_add('total_employees', v_total_employees);
+    RETURN NULL;  -- AFTER trigger, return value is ignored
+END;
+$$;
+
+DROP TRIGGER IF EXISTS trg_dashboard_employee_insert ON employee;
+DROP TRIGGER IF EXISTS trg_dashboard_employee_update ON employee;
+DROP TRIGGER IF EXISTS trg_dashboard_employee_delete ON employee;
+
+CREATE TRIGGER trg_dashboard_employee_insert
+    AFTER INSERT ON employee
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION fn_trg_dashboard_employee();
+
+CREATE TRIGGER trg_dashboard_employee_update
+    AFTER UPDATE ON employee
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION fn_trg_dashboard_employee();
+
+CREATE TRIGGER trg_dashboard_employee_delete
+    AFTER DELETE ON employee
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION fn_trg_dashboard_employee();
+
+
+-- 40. trg_dashboard_user
+-- AFTER INSERT/UPDATE/DELETE on "USER": maintain total_clients.
+CREATE OR REPLACE FUNCTION fn_trg_dashboard_user()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    v_total_clients       BIGINT := 0;
+BEGIN
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        SELECT COUNT(*) FILTER (WHERE role = 'client')
+        INTO v_total_clients
+        FROM new_rows;
+    END IF;
+
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        SELECT v_total_clients - COUNT(*) FILTER (WHERE role = 'client')
+        INTO v_total_clients
+        FROM old_rows;
+    END IF;
+
+    PERFORM fn_dashboard_counter_add('total_clients', v_total_clients);
+    RETURN NULL;  -- AFTER trigger, return value is ignored
+END;
+$$;
+
+DROP TRIGGER IF EXISTS trg_dashboard_user_insert ON "USER";
+DROP TRIGGER IF EXISTS trg_dashboard_user_update ON "USER";
+DROP TRIGGER IF EXISTS trg_dashboard_user_delete ON "USER";
+
+CREATE TRIGGER trg_dashboard_user_insert
+    AFTER INSERT ON "USER"
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION fn_trg_dashboard_user();
+
+CREATE TRIGGER trg_dashboard_user_update
+    AFTER UPDATE ON "USER"
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION fn_trg_dashboard_user();
+
+CREATE TRIGGER trg_dashboard_user_delete
+    AFTER DELETE ON "USER"
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION fn_trg_dashboard_user();
+
+
+-- 41. sp_rebuild_dashboard_counters
+-- Recount every dashboard counter from the base tables into shard 0,
+-- and rebuild the per-driver / per-client delivery stats.
+-- Run once after install, and after TRUNCATE or loads with triggers disabled.
+-- The table locks block writes while counting, so the result is exact.
+CREATE OR REPLACE PROCEDURE sp_rebuild_dashboard_counters()
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    LOCK TABLE delivery, vehicle, route, invoice, employee, "USER",
+               dashboard_counter, delivery_party_stats, delivery_party_daily
+        IN SHARE ROW EXCLUSIVE MODE;
+
+    DELETE FROM dashboard_counter;
+
+    INSERT INTO dashboard_counter (stat_name, shard, value)
+    SELECT v.stat_name, 0, v.value
+    FROM (VALUES
+        ('total_vehicles',     (SELECT COUNT(*) FROM vehicle WHERE is_active = true)),
+        ('total_deliveries',   (SELECT COUNT(*) FROM delivery)),
+        ('total_clients',      (SELECT COUNT(*) FROM "USER" WHERE role = 'client')),
+        ('total_employees',    (SELECT COUNT(*) FROM employee WHERE is_active = true)),
+        ('active_routes',      (SELECT COUNT(*) FROM route WHERE delivery_status NOT IN ('finished', 'cancelled'))),
+        ('pending_deliveries', (SELECT COUNT(*) FROM delivery WHERE status = 'pending')),
+        ('total_invoices',     (SELECT COUNT(*) FROM invoice))
+    ) AS v(stat_name, value);
+
+    DELETE FROM delivery_party_stats;
+    DELETE FROM delivery_party_daily;
+
+    INSERT INTO delivery_party_stats (party_role, party_id, status, priority, deliveries)
+    SELECT p.party_role, p.party_id, COALESCE(d.status, 'unknown'), COALESCE(d.priority, 'normal'), COUNT(*)
+    FROM delivery d
+    CROSS JOIN LATERAL (VALUES ('driver', d.driver_id), ('client', d.client_id)) AS p(party_role, party_id)
+    WHERE p.party_id IS NOT NULL
+    GROUP BY 1, 2, 3, 4;
+
+    INSERT INTO delivery_party_daily (party_role, party_id, delivery_day, status, deliveries)
+    SELECT p.party_role, p.party_id, fn_delivery_day(d.delivery_date), COALESCE(d.status, 'unknown'), COUNT(*)
+    FROM delivery d
+    CROSS JOIN LATERAL (VALUES ('driver', d.driver_id), ('client', d.client_id)) AS p(party_role, party_id)
+    WHERE p.party_id IS NOT NULL
+      AND d.delivery_date IS NOT NULL
+    GROUP BY 1, 2, 3, 4;
+END;
+$$;
+
+CALL sp_rebuild_dashboard_counters();
+
+
+
+/* ============================================================ */
+/*             D A S H B O A R D   T I M E   S E R I E S        */
+/* ============================================================ */
+/* Daily rollups for the dashboard charts, kept incrementally:  */
+/*   delivery_daily_rollup: tracking events per day, warehouse  */
+/*                          and status (delivery_tracking)      */
+/*   revenue_daily_rollup:  invoices and revenue per day and    */
+/*                          warehouse (invoice writes)          */
+/* war_id 0 stands for "no warehouse" (primary key column).     */
+
+
+-- 42. trg_rollup_delivery_tracking
+-- AFTER INSERT on delivery_tracking: count the new events per day / warehouse / status.
+-- delivery_tracking is append-only, so only INSERT is tracked.
+CREATE OR REPLACE FUNCTION fn_trg_rollup_delivery_tracking()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    INSERT INTO delivery_daily_rollup (day, war_id, status, deliveries)
+    SELECT fn_delivery_day(COALESCE(n.created_at, NOW())), COALESCE(n.war_id, 0), n.status, COUNT(*)
+    FROM new_rows n
+    WHERE n.status IS NOT NULL
+    GROUP BY 1, 2, 3
+    ON CONFLICT (day, war_id, status)
+    DO UPDATE SET deliveries = delivery_daily_rollup.deliveries + EXCLUDED.deliveries;
+
+    RETURN NULL;  -- AFTER trigger, return value is ignored
+END;
+$$;
+
+DROP TRIGGER IF EXISTS trg_rollup_delivery_tracking ON delivery_tracking;
+
+CREATE TRIGGER trg_rollup_delivery_tracking
+    AFTER INSERT ON delivery_tracking
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION fn_trg_rollup_delivery_tracking();
+
+
+-- 43. trg_rollup_invoice
+-- AFTER INSERT/UPDATE/DELETE on invoice: keep invoices and revenue per creation day
+-- and warehouse. Cancelled and refunded invoices do not count as revenue.
+CREATE OR REPLACE FUNCTION fn_trg_rollup_invoice()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    v_changes TEXT;
+BEGIN
+    -- Same +1/-1 delta scheme as fn_trg_dashboard_delivery
+    v_changes := CASE TG_OP
+        WHEN 'INSERT' THEN
+            'SELECT created_at, war_id, status, cost, 1 AS sign FROM new_rows'
+        WHEN 'DELETE' THEN
+            'SELECT created_at, war_id, status, cost, -1 AS sign FROM old_rows'
+        ELSE
+            'SELECT created_at, war_id, status, cost, 1 AS sign FROM new_rows
+             UNION ALL
+             SELECT created_at, war_id, status, cost, -1 AS sign FROM old_rows'
+    END;
+
+    EXECUTE format($sql$
+        INSERT INTO revenue_daily_rollup (day, war_id, invoices, revenue)
+        SELECT fn_delivery_day(c.created_at), COALESCE(c.war_id, 0),
+               SUM(c.sign), SUM(c.sign * COALESCE(c.cost, 0.00))
+        FROM (%s) c
+        WHERE COALESCE(c.status, 'pending') NOT IN ('cancelled', 'refunded')
+        GROUP BY 1, 2
+        HAVING SUM(c.sign) <> 0 OR SUM(c.sign * COALESCE(c.cost, 0.00)) <> 0
+        ON CONFLICT (day, war_id)
+        DO UPDATE SET invoices = revenue_daily_rollup.invoices + EXCLUDED.invoices,
+                      revenue  = revenue_daily_rollup.revenue  + EXCLUDED.revenue
+    $sql$, v_changes);
+
+    RETURN NULL;  -- AFTER trigger, return value is ignored
+END;
+$$;
+
+DROP TRIGGER IF EXISTS trg_rollup_invoice_insert ON invoice;
+DROP TRIGGER IF EXISTS trg_rollup_invoice_update ON invoice;
+DROP TRIGGER IF EXISTS trg_rollup_invoice_delete ON invoice;
+
+CREATE TRIGGER trg_rollup_invoice_insert
+    AFTER INSERT ON invoice
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION fn_trg_rollup_invoice();
+
+CREATE TRIGGER trg_rollup_invoice_update
+    AFTER UPDATE ON invoice
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION fn_trg_rollup_invoice();
+
+CREATE TRIGGER trg_rollup_invoice_delete
+    AFTER DELETE ON invoice
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION fn_trg_rollup_invoice();
+
+
+-- 44. fn_get_daily_series
+-- One row per day for the last p_days days (today included), zero-filled,
+-- ready to chart: tracking events per status plus invoices and revenue.
+-- p_war_id limits everything to one warehouse (NULL = all warehouses).
+CREATE OR REPLACE FUNCTION fn_get_daily_series(
+    p_days   INT DEFAULT 90,
+    p_war_id INT DEFAULT NULL
+)
+RETURNS TABLE (
+    day         DATE,
+    registered  BIGINT,
+    ready       BIGINT,
+    pending     BIGINT,
+    in_transit  BIGINT,
+    completed   BIGINT,
+    cancelled   BIGINT,
+    invoices    BIGINT,
+    revenue     DECIMAL(14,2)
+)
+LANGUAGE sql
+STABLE
+PARALLEL SAFE
+AS $$
+    WITH days AS (
+        SELECT generate_series(
+            fn_delivery_day(NOW()) - (p_days - 1),
+            fn_delivery_day(NOW()),
+            INTERVAL '1 day'
+        )::DATE AS day
+    ),
+    deliveries AS (
+        SELECT r.day,
+               SUM(r.deliveries) FILTER (WHERE r.status = 'registered') AS registered,
+               SUM(r.deliveries) FILTER (WHERE r.status = 'ready')      AS ready,
+               SUM(r.deliveries) FILTER (WHERE r.status = 'pending')    AS pending,
+               SUM(r.deliveries) FILTER (WHERE r.status = 'in_transit') AS in_transit,
+               SUM(r.deliveries) FILTER (WHERE r.status = 'completed')  AS completed,
+               SUM(r.deliveries) FILTER (WHERE r.status = 'cancelled')  AS cancelled
+        FROM delivery_daily_rollup r
+        WHERE r.day >= fn_delivery_day(NOW()) - (p_days - 1)
+          AND (p_war_id IS NULL OR r.war_id = p_war_id)
+        GROUP BY r.day
+    ),
+    revenue AS (
+        SELECT r.day, SUM(r.invoices) AS invoices, SUM(r.revenue) AS revenue
+        FROM revenue_daily_rollup r
+        WHERE r.day >= fn_delivery_day(NOW()) - (p_days - 1)
+          AND (p_war_id IS NULL OR r.war_id = p_war_id)
+        GROUP BY r.day
+    )
+    SELECT
+        d.day,
+        COALESCE(dl.registered, 0)::BIGINT,
+        COALESCE(dl.ready, 0)::BIGINT,
+        COALESCE(dl.pending, 0)::BIGINT,
+        COALESCE(dl.in_transit, 0)::BIGINT,
+        COALESCE(dl.completed, 0)::BIGINT,
+        COALESCE(dl.cancelled, 0)::BIGINT,
+        COALESCE(rv.invoices, 0)::BIGINT,
+        COALESCE(rv.revenue, 0.00)::DECIMAL(14,2)
+    FROM days d
+    LEFT JOIN deliveries dl ON dl.day = d.day
+    LEFT JOIN revenue rv    ON rv.day = d.day
+    ORDER BY d.day;
+$$;
+
+
+-- 45. sp_backfill_daily_rollups
+-- Recompute both rollups from delivery_tracking and invoice for every day
+-- from p_from on (NULL = all history). Writes are blocked while it runs.
+CREATE OR REPLACE PROCEDURE sp_backfill_daily_rollups(
+    p_from DATE DEFAULT NULL
+)
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    LOCK TABLE delivery_tracking, invoice, delivery_daily_rollup, revenue_daily_rollup
+        IN SHARE ROW EXCLUSIVE MODE;
+
+    DELETE FROM delivery_daily_rollup WHERE p_from IS NULL OR day >= p_from;
+    DELETE FROM revenue_daily_rollup  WHERE p_from IS NULL OR day >= p_from;
+
+    INSERT INTO delivery_daily_rollup (day, war_id, status, deliveries)
+    SELECT fn_delivery_day(t.created_at), COALESCE(t.war_id, 0), t.status, COUNT(*)
+    FROM delivery_tracking t
+    WHERE t.status IS NOT NULL
+      AND t.created_at IS NOT NULL
+      AND (p_from IS NULL OR fn_delivery_day(t.created_at) >= p_from)
+    GROUP BY 1, 2, 3;
+
+    INSERT INTO revenue_daily_rollup (day, war_id, invoices, revenue)
+    SELECT fn_delivery_day(i.created_at), COALESCE(i.war_id, 0), COUNT(*), SUM(COALESCE(i.cost, 0.00))
+    FROM invoice i
+    WHERE COALESCE(i.status, 'pending') NOT IN ('cancelled', 'refunded')
+      AND (p_from IS NULL OR fn_delivery_day(i.created_at) >= p_from)
+    GROUP BY 1, 2;
+END;
+$$;
+
+/* ============================================================ */
+/*                   A U T O C O M P L E T E                    */
+/* ============================================================ */
+/* Options for the form pickers, as in diego_objects.sql: at    */
+/* most p_limit rows matching a prefix (served by the           */
+/* *_PREFIX_IDX indexes in DDL.sql), or with p_ids the rows     */
+/* with those ids. Routes and invoices are also found by their  */
+/* number: an all-digits term is matched against the id.        */
+
+
+-- 46. fn_autocomplete_vehicles  [Vehicle]
+-- Active vehicles whose plate starts with p_term (case-insensitive).
+CREATE OR REPLACE FUNCTION fn_autocomplete_vehicles(p_term TEXT, p_limit INT, p_ids INT[])
+RETURNS TABLE (id INT, label TEXT)
+LANGUAGE plpgsql
+STABLE
+AS $$
+DECLARE
+    v_pattern TEXT := upper(replace(replace(replace(p_term, '\', '\\'), '%', '\%'), '_', '\_')) || '%';
+BEGIN
+    IF p_ids IS NOT NULL THEN
+        RETURN QUERY
+        SELECT v.id, concat_ws(' ', v.plate_number, '-', v.brand, v.model)
+        FROM vehicle v
+        WHERE v.id = ANY(p_ids)
+          AND v.is_active = true;
+        RETURN;
+    END IF;
+
+    RETURN QUERY
+    SELECT v.id, concat_ws(' ', v.plate_number, '-', v.brand, v.model)
+    FROM vehicle v
+    WHERE upper(v.plate_number) LIKE v_pattern
+      AND v.is_active = true
+    ORDER BY upper(v.plate_number)
+    LIMIT p_limit;
+END;
+$$;
+
+
+-- 47. fn_autocomplete_routes  [Route]
+-- Active routes by number, or whose description starts with p_term.
+CREATE OR REPLACE FUNCTION fn_autocomplete_routes(p_term TEXT, p_limit INT, p_ids INT[])
+RETURNS TABLE (id INT, label TEXT)
+LANGUAGE plpgsql
+STABLE
+AS $$
+DECLARE
+    v_pattern TEXT := replace(replace(replace(lower(p_term), '\', '\\'), '%', '\%'), '_', '\_') || '%';
+BEGIN
+    IF p_ids IS NOT NULL OR p_term ~ '^\d{1,9}$' THEN
+        RETURN QUERY
+        SELECT r.id, '#' || r.id || ' ' || COALESCE(r.description, '')
+        FROM route r
+        WHERE r.id = ANY(COALESCE(p_ids, ARRAY[p_term::INT]))
+          AND r.is_active = true;
+        RETURN;
+    END IF;
+
+    RETURN QUERY
+    SELECT r.id, '#' || r.id || ' ' || r.description
+    FROM route r
+    WHERE lower(r.description) LIKE v_pattern
+      AND r.is_active = true
+    ORDER BY lower(r.description)
+    LIMIT p_limit;
+END;
+$$;
+
+
+-- 48. fn_autocomplete_invoices  [Invoice]
+-- Invoices that are not cancelled, by number or billing name prefix.
+CREATE OR REPLACE FUNCTION fn_autocomplete_invoices(p_term TEXT, p_limit INT, p_ids INT[])
+RETURNS TABLE (id INT, label TEXT)
+LANGUAGE plpgsql
+STABLE
+AS $$
+DECLARE
+    v_pattern TEXT := replace(replace(replace(lower(p_term), '\', '\\'), '%', '\%'), '_', '\_') || '%';
+BEGIN
+    IF p_ids IS NOT NULL OR p_term ~ '^\d{1,9}$' THEN
+        RETURN QUERY
+        SELECT i.id, '#' || i.id || ' ' || COALESCE(i.name, '')
+        FROM invoice i
+        WHERE i.id = ANY(COALESCE(p_ids, ARRAY[p_term::INT]))
+          AND COALESCE(i.status, 'pending') <> 'cancelled';
+        RETURN;
+    END IF;
+
+    RETURN QUERY
+    SELECT i.id, '#' || i.id || ' ' || i.name
+    FROM invoice i
+    WHERE lower(i.name) LIKE v_pattern
+      AND COALESCE(i.status, 'pending') <> 'cancelled'
+    ORDER BY lower(i.name)
+    LIMIT p_limit;
+END;
+$$;
+
+
+/* ---------- INVOICE: SINGLE-CALL SAVE ---------- */
+
+-- 49. sp_save_invoice
+-- Create (p_id NULL) or update an invoice together with its items, in one call.
+-- p_items is a JSONB array of item changes, applied set-wise:
+--   {"shipment_type": ..., "weight": ..., "delivery_speed": ...,
+--    "quantity": ..., "unit_price": ..., "notes": ...}   new item
+--   {"id": 7, <same keys>}                               update of item 7
+--   {"id": 7, "delete": true}                            delete item 7
+-- Items not listed are kept. Instead of trg_invoice_update_cost running per
+-- item, the invoice cost / quantity are recalculated and mv_invoice_totals is
+-- refreshed once, and the invoice row is written once.
+CREATE OR REPLACE PROCEDURE sp_save_invoice(
+    p_war_id        INT,
+    p_staff_id      INT,
+    p_client_id     INT,
+    p_status        VARCHAR(30),
+    p_type          VARCHAR(30),
+    p_paid          BOOL,
+    p_pay_method    VARCHAR(30),
+    p_name          TEXT,
+    p_address       TEXT,
+    p_contact       TEXT,
+    p_items         JSONB,
+    INOUT p_id      INT DEFAULT NULL
+)
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    v_items     JSONB := COALESCE(p_items, '[]'::JSONB);
+    v_new       BOOL  := p_id IS NULL;
+    v_named     INT;
+    v_found     INT;
+BEGIN
+    IF jsonb_typeof(v_items) <> 'array' THEN
+        RAISE EXCEPTION 'Invoice items must be a JSON array';
+    END IF;
+
+    IF v_new THEN
+        -- New invoice: every item is new, so the totals come from p_items
+        INSERT INTO invoice (
+            war_id, staff_id, client_id,
+            status, type, quantity, cost,
+            paid, pay_method,
+            name, address, contact,
+            created_at, updated_at
+        )
+        SELECT
+            p_war_id, p_staff_id, p_client_id,
+            COALESCE(p_status, 'pending'), p_type,
+            COALESCE(SUM(x.quantity), 0),
+            COALESCE(SUM(COALESCE(x.quantity, 0) * COALESCE(x.unit_price, 0.00)), 0.00),
+            COALESCE(p_paid, false), p_pay_method,
+            p_name, p_address, p_contact,
+            NOW(), NOW()
+        FROM jsonb_to_recordset(v_items) AS x(id INT, quantity INT, unit_price DECIMAL(10,2), "delete" BOOL)
+        WHERE x.id IS NULL AND NOT COALESCE(x."delete", false)
+        RETURNING id INTO p_id;
+    ELSIF NOT EXISTS (SELECT 1 FROM invoice WHERE id = p_id) THEN
+        RAISE EXCEPTION 'Invoice with id % not found', p_id;
+    END IF;
+
+    -- Items named by id must belong to this invoice
+    SELECT COUNT(x.id), COUNT(ii.id) INTO v_named, v_found
+    FROM jsonb_to_recordset(v_items) AS x(id INT)
+    LEFT JOIN invoice_item ii ON ii.id = x.id AND ii.inv_id = p_id
+    WHERE x.id IS NOT NULL;
+    IF v_named <> v_found THEN
+        RAISE EXCEPTION 'Invoice % has no item with some of the given ids', p_id;
+    END IF;
+
+    PERFORM set_config('postoffice.skip_invoice_cost', 'on', true);
+
+    DELETE FROM invoice_item ii
+    USING jsonb_to_recordset(v_items) AS x(id INT, "delete" BOOL)
+    WHERE ii.id = x.id
+      AND ii.inv_id = p_id
+      AND COALESCE(x."delete", false);
+
+    -- total_item_cost and updated_at are set by trg_invoice_item_calc_total
+    UPDATE invoice_item ii
+    SET shipment_type  = x.shipment_type,
+        weight         = x.weight,
+        delivery_speed = x.delivery_speed,
+        quantity       = x.quantity,
+        unit_price     = x.unit_price,
+        notes          = x.notes
+    FROM jsonb_to_recordset(v_items) AS x(id INT, shipment_type VARCHAR(50), weight DECIMAL(10,2), delivery_speed VARCHAR(50),
+                                   quantity INT, unit_price DECIMAL(10,2), notes TEXT, "delete" BOOL)
+    WHERE ii.id = x.id
+      AND ii.inv_id = p_id
+      AND NOT COALESCE(x."delete", false);
+
+    INSERT INTO invoice_item (
+        inv_id, shipment_type, weight, delivery_speed,
+        quantity, unit_price,
+        notes, created_at, updated_at
+    )
+    SELECT
+        p_id, x.shipment_type, x.weight, x.delivery_speed,
+        x.quantity, x.unit_price,
+        x.notes, NOW(), NOW()
+    FROM jsonb_to_recordset(v_items) AS x(id INT, shipment_type VARCHAR(50), weight DECIMAL(10,2), delivery_speed VARCHAR(50),
+                                   quantity INT, unit_price DECIMAL(10,2), notes TEXT, "delete" BOOL)
+    WHERE x.id IS NULL
+      AND NOT COALESCE(x."delete", false);
+
+    PERFORM set_config('postoffice.skip_invoice_cost', 'off', true);
+
+    -- Existing invoice: header and recalculated totals in one write
+    -- (a new invoice already got both from its INSERT)
+    IF NOT v_new THEN
+        UPDATE invoice i
+        SET war_id      = p_war_id,
+            staff_id    = p_staff_id,
+            client_id   = p_client_id,
+            status      = COALESCE(p_status, i.status),
+            type        = p_type,
+            quantity    = COALESCE(t.total_qty, 0),
+            cost        = COALESCE(t.total_cost, 0.00),
+            paid        = COALESCE(p_paid, i.paid),
+            pay_method  = p_pay_method,
+            name        = p_name,
+            address     = p_address,
+            contact     = p_contact,
+            updated_at  = NOW()
+        FROM (
+            SELECT
+                SUM(total_item_cost) AS total_cost,
+                SUM(quantity)        AS total_qty
+            FROM invoice_item
+            WHERE inv_id = p_id
+        ) t
+        WHERE i.id = p_id;
+    END IF;
+
+    CALL sp_refresh_materialized_view('mv_invoice_totals');
+END;
+$$;
+
+
+/* ============================================================ */
+/*                         S E A R C H                          */
+/* ============================================================ */
+/* Ranked search over the SEARCH_VECTOR / SEARCH_TEXT generated */
+/* columns (DDL.sql, "Search"), with fn_search_tsquery from     */
+/* david_objects.sql. A row matches when:                       */
+/*   - its tsvector has every word of the term as a prefix,     */
+/*   - or its text contains the term (LIKE, pg_trgm index),     */
+/*   - or the term is close to a word of its text (<%: typos).  */
+/* Rank = ts_rank (weighted fields) + word_similarity.          */
+/* The matching ids are collected first, each condition on its  */
+/* own GIN index (tsvector, gin_trgm_ops), into a MATERIALIZED  */
+/* CTE: the planner cannot turn it into an index walk filtered  */
+/* row by row. A very common term could match millions of rows: */
+/* only the 1000 closest to the term (word_similarity, ties by  */
+/* id) are ranked. The order is total (rank, then id): pages    */
+/* never repeat or skip rows.                                   */
+
+
+-- 50. fn_search_invoices  [Invoice]
+-- Invoices by billing name or contact.
+CREATE OR REPLACE FUNCTION fn_search_invoices(p_term TEXT, p_limit INT, p_offset INT)
+RETURNS TABLE (
+    id         INT,
+    name       TEXT,
+    contact    TEXT,
+    status     VARCHAR(30),
+    cost       DECIMAL(10,2),
+    created_at TIMESTAMPTZ,
+    rank       REAL
+)
+LANGUAGE plpgsql
+STABLE
+AS $$
+DECLARE
+    v_term    TEXT    := lower(btrim(p_term));
+    v_query   tsquery := fn_search_tsquery(p_term);
+    v_pattern TEXT    := '%' || replace(replace(replace(lower(btrim(p_term)), '\', '\\'), '%', '\%'), '_', '\_') || '%';
+BEGIN
+    RETURN QUERY
+    WITH matches AS MATERIALIZED (
+        SELECT m.id FROM invoice m WHERE m.search_vector @@ v_query
+        UNION
+        SELECT m.id FROM invoice m WHERE m.search_text LIKE v_pattern
+        UNION
+        SELECT m.id FROM invoice m WHERE v_term <% m.search_text
+    ),
+    -- Candidates closest to the term: a fixed set for a given term
+    candidates AS MATERIALIZED (
+        SELECT m.id
+        FROM matches x
+        JOIN invoice m ON m.id = x.id
+        ORDER BY v_term <<-> m.search_text, m.id
+        LIMIT 1000
+    )
+    SELECT i.id, i.name, i.contact, i.status, i.cost, i.created_at,
+           COALESCE(ts_rank(i.search_vector, v_query), 0) + word_similarity(v_term, i.search_text) AS score
+    FROM candidates c
+    JOIN invoice i ON i.id = c.id
+    ORDER BY score DESC, i.id DESC
+    LIMIT p_limit OFFSET p_offset;
+END;
+$$;
+
+
+/* ============================================================ */
+/*                      L I S T   P A G E S                     */
+/* ============================================================ */
+/* One page of v_routes_full / v_invoices_with_items, filtered  */
+/* and keyset-paginated, as fn_list_deliveries.                 */
+/* The filters and the cursor are applied to the base table     */
+/* alone (DDL.sql, "List pages" indexes): only the ids of the   */
+/* page are selected, then joined through the view. NULL        */
+/* filters are left out of the statement (dynamic SQL), so each */
+/* call is planned for the filters it actually has.             */
+/*   p_sort     'newest' (default) or 'oldest'                  */
+/*   p_after_id id of the last row of the previous page (an     */
+/*              error if that row was deleted meanwhile)        */
+/*   p_from/to  dates, both inclusive, as days in the           */
+/*              application time zone (fn_delivery_day)         */
+
+
+-- 51. fn_list_routes  [Route]
+-- v_routes_full by status, warehouse, driver and delivery date.
+CREATE OR REPLACE FUNCTION fn_list_routes(
+    p_status    VARCHAR(20),
+    p_war_id    INT,
+    p_driver_id INT,
+    p_from      DATE,
+    p_to        DATE,
+    p_sort      TEXT,
+    p_after_id  INT,
+    p_limit     INT
+)
+RETURNS SETOF v_routes_full
+LANGUAGE plpgsql
+STABLE
+AS $$
+DECLARE
+    -- Same expression as the ROUTE_LIST_* indexes
+    v_key        TEXT := 'COALESCE(r.delivery_date, ''-infinity''::DATE)';
+    v_dir        TEXT := CASE WHEN p_sort = 'oldest' THEN 'ASC' ELSE 'DESC' END;
+    v_where      TEXT := 'true';
+    v_after_date DATE;
+    v_ids        INT[];
+BEGIN
+    IF p_status IS NOT NULL THEN
+        v_where := v_where || ' AND r.delivery_status = $1';
+    END IF;
+    IF p_war_id IS NOT NULL THEN
+        v_where := v_where || ' AND r.war_id = $2';
+    END IF;
+    IF p_driver_id IS NOT NULL THEN
+        v_where := v_where || ' AND r.driver_id = $3';
+    END IF;
+    IF p_from IS NOT NULL THEN
+        v_where := v_where || format(' AND %s >= $4', v_key);
+    END IF;
+    IF p_to IS NOT NULL THEN
+        v_where := v_where || format(' AND %s <= $5 AND r.delivery_date IS NOT NULL', v_key);
+    END IF;
+    IF p_after_id IS NOT NULL THEN
+        SELECT COALESCE(r.delivery_date, '-infinity'::DATE) INTO v_after_date FROM route r WHERE r.id = p_after_id;
+        IF NOT FOUND THEN
+            RAISE EXCEPTION 'Route with id % not found (list cursor)', p_after_id;
+        END IF;
+        v_where := v_where || format(' AND (%s, r.id) %s ($6, $7)', v_key, CASE v_dir WHEN 'ASC' THEN '>' ELSE '<' END);
+    END IF;
+
+    EXECUTE format(
+        'SELECT ARRAY(SELECT r.id FROM route r WHERE %s ORDER BY %s %s, r.id %s LIMIT $8)',
+        v_where, v_key, v_dir, v_dir
+    )
+    INTO v_ids
+    USING p_status, p_war_id, p_driver_id, p_from, p_to, v_after_date, p_after_id, p_limit;
+
+    RETURN QUERY
+    SELECT v.*
+    FROM v_routes_full v
+    WHERE v.id = ANY(v_ids)
+    ORDER BY array_position(v_ids, v.id);
+END;
+$$;
+
+
+-- 52. fn_list_invoices  [Invoice]
+-- v_invoices_with_items by status, warehouse, client and creation date.
+CREATE OR REPLACE FUNCTION fn_list_invoices(
+    p_status    VARCHAR(30),
+    p_war_id    INT,
+    p_client_id INT,
+    p_from      DATE,
+    p_to        DATE,
+    p_sort      TEXT,
+    p_after_id  INT,
+    p_limit     INT
+)
+RETURNS SETOF v_invoices_with_items
+LANGUAGE plpgsql
+STABLE
+AS $$
+DECLARE
+    v_dir      TEXT := CASE WHEN p_sort = 'oldest' THEN 'ASC' ELSE 'DESC' END;
+    v_where    TEXT := 'true';
+    v_after_at TIMESTAMPTZ;
+    v_ids      INT[];
+BEGIN
+    IF p_status IS NOT NULL THEN
+        v_where := v_where || ' AND i.status = $1';
+    END IF;
+    IF p_war_id IS NOT NULL THEN
+        v_where := v_where || ' AND i.war_id = $2';
+    END IF;
+    IF p_client_id IS NOT NULL THEN
+        v_where := v_where || ' AND i.client_id = $3';
+    END IF;
+    IF p_from IS NOT NULL THEN
+        v_where := v_where || ' AND i.created_at >= ($4::TIMESTAMP AT TIME ZONE ''Europe/Lisbon'')';
+    END IF;
+    IF p_to IS NOT NULL THEN
+        v_where := v_where || ' AND i.created_at < (($5 + 1)::TIMESTAMP AT TIME ZONE ''Europe/Lisbon'')';
+    END IF;
+    IF p_after_id IS NOT NULL THEN
+        SELECT i.created_at INTO v_after_at FROM invoice i WHERE i.id = p_after_id;
+        IF NOT FOUND THEN
+            RAISE EXCEPTION 'Invoice with id % not found (list cursor)', p_after_id;
+        END IF;
+        v_where := v_where || CASE v_dir WHEN 'ASC' THEN ' AND (i.created_at, i.id) > ($6, $7)'
+                                                    ELSE ' AND (i.created_at, i.id) < ($6, $7)' END;
+    END IF;
+
+    EXECUTE format(
+        'SELECT ARRAY(SELECT i.id FROM invoice i WHERE %s ORDER BY i.created_at %s, i.id %s LIMIT $8)',
+        v_where, v_dir, v_dir
+    )
+    INTO v_ids
+    USING p_status, p_war_id, p_client_id, p_from, p_to, v_after_at, p_after_id, p_limit;
+
+    RETURN QUERY
+    SELECT v.*
+    FROM v_invoices_with_items v
+    WHERE v.id = ANY(v_ids)
+    ORDER BY array_position(v_ids, v.id);
+END;
+$$;
+
+
 /*==============================================================*/
 /* END OF rodrigo_objects.sql                                    */
-/* Total: 31 SQL blocks (32 objects including unique indexes)   */
+/* Total: 52 SQL blocks (53 objects including unique indexes)   */
 /*==============================================================*/